@@ -6,6 +6,8 @@ import glob
 import re
 import sys
 
+from ..drivers.remote import is_remote, remote_browser_name
+
 
 def find_plugin_ids(
     src_glob: str = "./src/**/*Plugin.vue",
@@ -53,7 +55,8 @@ def filter_plugin_ids(
 
     Currently removes:
       - 'simplemsg', 'testplugin', 'redo' from all browsers.
-      - 'documentation' when Safari is in the browser list.
+      - 'documentation' when Safari (local, or a remote spec whose
+        template is Safari) is in the browser list.
     """
     excluded_always = {"simplemsg", "testplugin", "redo"}
 
@@ -62,7 +65,10 @@ def filter_plugin_ids(
         if not any(ex in p[0] for ex in excluded_always)
     ]
 
-    if "safari" in browsers:
+    if any(
+        (remote_browser_name(b) if is_remote(b) else b) == "safari"
+        for b in browsers
+    ):
         filtered = [p for p in filtered if "documentation" not in p[0]]
 
     return filtered
@@ -1 +1,10 @@
-from .factory import make_driver, make_chrome_driver, allowed_threads
\ No newline at end of file
+from .factory import (
+    make_driver,
+    make_chrome_driver,
+    allowed_threads,
+    threads_for,
+    quit_driver,
+)
+from .chromedriver_pool import print_session_latency
+from .profiles import print_driver_readiness
+from .remote import is_remote
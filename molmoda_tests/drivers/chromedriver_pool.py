@@ -0,0 +1,251 @@
+"""
+Long-lived chromedriver processes shared by every Chrome session.
+
+``webdriver.Chrome(service=Service(...))`` starts a chromedriver for each
+driver and stops it again on quit, so every worker pays for a chromedriver
+launch, and pays again after every quit_all_drivers round.  With
+SHARED_SERVICES on, POOL_SIZE chromedrivers are started once and kept
+running; sessions are created on the least-loaded one and quitting a
+driver only ends its session.
+
+A monitor thread checks each chromedriver's /status every
+HEALTH_INTERVAL_SECS and restarts any that died or stopped answering.  A
+restarted chromedriver has lost its sessions, so the drivers bound to it
+are invalidated: their next command raises InvalidSessionIdException,
+the test using one fails and is retried as usual, and the worker's health
+check (executor.get_or_create_driver) starts a fresh session.  The same
+check runs before a session is placed on a service.
+
+Session-creation latency is recorded for shared and per-driver services
+alike, so print_session_latency can compare the two modes.
+"""
+
+import atexit
+import contextlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import weakref
+from typing import Any, Callable
+
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException
+from selenium.webdriver.chrome.service import Service
+
+# Set False to give every Chrome driver its own chromedriver, as before.
+SHARED_SERVICES = True
+
+# Chromedrivers to share; sessions are spread over them.
+POOL_SIZE = 2
+
+# Seconds between health checks by the monitor thread.
+HEALTH_INTERVAL_SECS = 10.0
+
+# Seconds a chromedriver has to answer /status.
+STATUS_TIMEOUT_SECS = 5
+
+CHROMEDRIVER_PATH = "utils/chromedriver_wrapper.sh"
+
+# "shared" / "own" -> session creation times (secs)
+_latency: dict[str, list[float]] = {"shared": [], "own": []}
+_latency_lock = threading.Lock()
+
+
+class _SharedServiceChrome(webdriver.Remote):
+    """A Chrome session on an already-running chromedriver it doesn't own.
+
+    Quitting ends only the session; the chromedriver keeps running.
+    """
+
+    def __init__(
+        self,
+        service_url: str,
+        options: webdriver.ChromeOptions,
+        on_quit: Callable[[Any], None],
+    ):
+        self._on_quit = on_quit
+        self._lost = False
+        super().__init__(command_executor=service_url, options=options)
+
+    def execute(self, driver_command: str, params: dict | None = None) -> dict:
+        if self._lost:
+            raise InvalidSessionIdException(
+                "This session's chromedriver was restarted; the session is gone."
+            )
+        return super().execute(driver_command, params)
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        """Run a Chrome DevTools Protocol command, as webdriver.Chrome does."""
+        return self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})["value"]
+
+    def invalidate(self) -> None:
+        """Mark the session lost; every later command fails at once."""
+        self._lost = True
+
+    def quit(self) -> None:
+        try:
+            if not self._lost:
+                super().quit()
+        finally:
+            self._on_quit(self)
+
+
+class _ManagedService:
+    """One shared chromedriver, restarted when it crashes."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.lock = threading.Lock()
+        # Sessions being created here, and live drivers bound to it.
+        self.pending = 0
+        self.drivers: "weakref.WeakSet[_SharedServiceChrome]" = weakref.WeakSet()
+        self.restarts = 0
+        self.service = self._start()
+
+    @staticmethod
+    def _start() -> Service:
+        service = Service(executable_path=CHROMEDRIVER_PATH)
+        service.start()
+        return service
+
+    def healthy(self) -> bool:
+        """Whether the process is running and answers /status as ready."""
+        if self.service.process is None or self.service.process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(
+                f"{self.service.service_url}/status", timeout=STATUS_TIMEOUT_SECS
+            ) as r:
+                return bool(json.load(r).get("value", {}).get("ready", False))
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+
+    def ensure_healthy(self) -> bool:
+        """Restart the chromedriver if it isn't healthy; True if it was."""
+        with self.lock:
+            if self.healthy():
+                return False
+            print(f"chromedriver #{self.index} is unhealthy; restarting it.")
+            with contextlib.suppress(Exception):
+                self.service.stop()
+            self.service = self._start()
+            self.restarts += 1
+            return True
+
+    def stop(self) -> None:
+        with self.lock, contextlib.suppress(Exception):
+            self.service.stop()
+
+
+class _ServicePool:
+    def __init__(self, size: int):
+        self.services = [_ManagedService(i) for i in range(size)]
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        threading.Thread(target=self._monitor, name="chromedriver-monitor", daemon=True).start()
+
+    def _monitor(self) -> None:
+        while not self.stopped.wait(HEALTH_INTERVAL_SECS):
+            for managed in self.services:
+                with contextlib.suppress(Exception):
+                    self._ensure_healthy(managed)
+
+    def _ensure_healthy(self, managed: _ManagedService) -> None:
+        """Restart an unhealthy chromedriver and invalidate its old sessions."""
+        if not managed.ensure_healthy():
+            return
+        with self.lock:
+            stranded = list(managed.drivers)
+            managed.drivers.clear()
+        if stranded:
+            print(
+                f"Invalidated {len(stranded)} session(s) of chromedriver "
+                f"#{managed.index}; their workers will start new ones."
+            )
+        for driver in stranded:
+            driver.invalidate()
+
+    def _release(self, managed: _ManagedService, driver: Any) -> None:
+        with self.lock:
+            managed.drivers.discard(driver)
+
+    def new_session(self, options: webdriver.ChromeOptions) -> webdriver.Remote:
+        """Start a session on the least-loaded healthy chromedriver."""
+        with self.lock:
+            managed = min(self.services, key=lambda m: m.pending + len(m.drivers))
+            managed.pending += 1
+        try:
+            self._ensure_healthy(managed)
+            restarts = managed.restarts
+            driver = _SharedServiceChrome(
+                managed.service.service_url,
+                options,
+                lambda d: self._release(managed, d),
+            )
+        finally:
+            with self.lock:
+                managed.pending -= 1
+        with self.lock:
+            # A restart while the session was being created stranded it.
+            current = managed.restarts == restarts
+            if current:
+                managed.drivers.add(driver)
+        if not current:
+            driver.invalidate()
+        return driver
+
+    def stop(self) -> None:
+        self.stopped.set()
+        for managed in self.services:
+            managed.stop()
+        restarts = sum(m.restarts for m in self.services)
+        if restarts:
+            print(f"Shared chromedrivers were restarted {restarts} time(s).")
+
+
+_pool: _ServicePool | None = None
+_pool_lock = threading.Lock()
+
+
+def new_chrome_session(options: webdriver.ChromeOptions) -> webdriver.Remote:
+    """Start a Chrome session, on a shared chromedriver when SHARED_SERVICES.
+
+    The session-creation time is recorded for print_session_latency.
+    """
+    global _pool
+    start = time.monotonic()
+    if SHARED_SERVICES:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _ServicePool(POOL_SIZE)
+        driver = _pool.new_session(options)
+    else:
+        driver = webdriver.Chrome(
+            service=Service(executable_path=CHROMEDRIVER_PATH), options=options
+        )
+    with _latency_lock:
+        _latency["shared" if SHARED_SERVICES else "own"].append(time.monotonic() - start)
+    return driver
+
+
+def print_session_latency() -> None:
+    """Print mean Chrome session-creation time per chromedriver mode."""
+    with _latency_lock:
+        times = {mode: list(secs) for mode, secs in _latency.items() if secs}
+    for mode, secs in times.items():
+        print(
+            f"Chrome session creation ({mode} chromedriver): mean "
+            f"{sum(secs) / len(secs):.2f}s over {len(secs)} session(s)"
+        )
+
+
+@atexit.register
+def stop_chromedrivers() -> None:
+    """Stop the shared chromedrivers."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop()
@@ -0,0 +1,208 @@
+"""
+Chrome workers as isolated browser contexts in shared Chrome processes.
+
+Normally every worker thread owns a whole Chrome (browser, GPU, network
+and renderer processes, several hundred MB).  With SHARED_CONTEXTS on,
+Chrome workers are instead browser contexts (``Target.createBrowserContext``)
+inside a few host Chromes, CONTEXTS_PER_HOST to each.  A context has its
+own cookies, storage, cache and service workers, just like a separate
+profile, but shares the host's browser and GPU processes, so a worker
+costs little more than its renderer and allowed_threads can be scaled by
+CONTEXT_THREAD_FACTOR (run_tests.py --contexts=FACTOR) on the same
+machine.  With --adaptive the total still stays within its bounds.
+
+Each worker still gets its own WebDriver session: a chromedriver attached
+to the host through its debugger address, switched to the window of the
+worker's context.  Quitting the worker disposes of its context (and
+everything stored in it); hosts are kept for the next worker and closed
+at exit.
+
+Limitations of attaching to a shared host:
+
+- ``driver.window_handles`` lists every window in the host, other
+  workers' contexts included.  Tests must only switch to windows they
+  opened themselves (a page's popups open in its own context), never to
+  "the other handle".
+- The session has no BiDi socket (chromedriver can't add one to a
+  browser it didn't launch), and its ``get_log`` returns the console
+  entries of every page in the host.  Console errors are therefore
+  collected by a hook in the worker's own page (log_collector.py,
+  ``page_hook``), so one worker's errors never fail another's test.
+
+Contexts are in-memory, so primed profile templates (profiles.py) don't
+apply to them.  Chrome only.
+"""
+
+import atexit
+import contextlib
+import threading
+import weakref
+from typing import Any, Callable
+
+from selenium import webdriver
+
+from .chromedriver_pool import new_chrome_session
+from .log_collector import attach_log_collector
+
+# Set True (run_tests.py --contexts) to run Chrome workers as browser
+# contexts in shared Chrome processes.
+SHARED_CONTEXTS = False
+
+# Contexts (workers) per host Chrome before another host is started.
+CONTEXTS_PER_HOST = 8
+
+# allowed_threads multiplier for Chrome when workers are contexts
+# (run_tests.py --contexts=FACTOR).
+CONTEXT_THREAD_FACTOR = 3
+
+# Extra arguments for host Chromes: contexts live in background windows,
+# which Chrome would otherwise throttle.
+HOST_ARGS = (
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+)
+
+WINDOW_SIZE = (1920, 1080)
+
+_CONTEXT_BROWSERS = ("chrome", "chrome-headless")
+
+
+def supports_contexts(browser: str) -> bool:
+    """Whether ``browser`` runs as shared-process contexts in this run."""
+    return SHARED_CONTEXTS and browser in _CONTEXT_BROWSERS
+
+
+class _Host:
+    """One shared Chrome process and the contexts it hosts."""
+
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.address = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        self.contexts: set[str] = set()
+        self.lock = threading.Lock()
+
+    def alive(self) -> bool:
+        try:
+            with self.lock:
+                self.driver.execute_cdp_cmd("Browser.getVersion", {})
+            return True
+        except Exception:
+            return False
+
+    def new_context(self) -> tuple[str, str]:
+        """Create a context with one window; returns (context id, target id)."""
+        with self.lock:
+            context_id = self.driver.execute_cdp_cmd(
+                "Target.createBrowserContext", {"disposeOnDetach": False}
+            )["browserContextId"]
+            target_id = self.driver.execute_cdp_cmd(
+                "Target.createTarget",
+                {"url": "about:blank", "browserContextId": context_id, "newWindow": True},
+            )["targetId"]
+            self.contexts.add(context_id)
+        return context_id, target_id
+
+    def dispose(self, context_id: str) -> None:
+        """Close a context's windows and drop its storage."""
+        with self.lock:
+            self.contexts.discard(context_id)
+            with contextlib.suppress(Exception):
+                self.driver.execute_cdp_cmd(
+                    "Target.disposeBrowserContext", {"browserContextId": context_id}
+                )
+
+    def close(self) -> None:
+        with contextlib.suppress(Exception):
+            self.driver.quit()
+
+
+# (browser, device scale factor) -> hosts
+_hosts: dict[tuple[str, float | None], list[_Host]] = {}
+_hosts_lock = threading.Lock()
+
+# worker driver -> (host, context id)
+_contexts: "weakref.WeakKeyDictionary[Any, tuple[_Host, str]]" = weakref.WeakKeyDictionary()
+
+
+def _host_for(
+    browser: str, device_scale_factor: float | None, launch: Callable[[], Any]
+) -> tuple[_Host, str, str]:
+    """Create a context on a host with room, starting a host if none has.
+
+    Returns:
+        (host, context id, target id).
+    """
+    with _hosts_lock:
+        hosts = _hosts.setdefault((browser, device_scale_factor), [])
+        for dead in [h for h in hosts if not h.alive()]:
+            print(f"Shared {browser} host at {dead.address} is gone; dropping it.")
+            hosts.remove(dead)
+            dead.close()
+        host = next((h for h in hosts if len(h.contexts) < CONTEXTS_PER_HOST), None)
+        if host is None:
+            host = _Host(launch())
+            hosts.append(host)
+            print(f"Started shared {browser} host #{len(hosts)} at {host.address}")
+        # Reserve the slot before releasing the lock.
+        context_id, target_id = host.new_context()
+    return host, context_id, target_id
+
+
+def make_context_driver(
+    browser: str,
+    root_url: str,
+    device_scale_factor: float | None,
+    launch: Callable[[], Any],
+) -> webdriver.Remote:
+    """A WebDriver session confined to a new context in a shared host.
+
+    Args:
+        browser: "chrome" or "chrome-headless".
+        root_url: The root URL being tested (CDP Network is enabled for
+            localhost, as for a normal Chrome driver).
+        device_scale_factor: Chrome device-pixel ratio override, or None;
+            hosts are kept apart per value.
+        launch: Starts a host Chrome (with HOST_ARGS) and returns its driver.
+    """
+    host, context_id, target_id = _host_for(browser, device_scale_factor, launch)
+    try:
+        options = webdriver.ChromeOptions()
+        options.debugger_address = host.address
+        options.set_capability("goog:loggingPrefs", {"browser": "ALL"})
+        driver = new_chrome_session(options)
+        driver.switch_to.window(target_id)
+        driver.set_window_size(*WINDOW_SIZE)
+        if "localhost" in root_url or "127.0.0.1" in root_url:
+            driver.execute_cdp_cmd("Network.enable", {})
+        # No BiDi on attached sessions, and get_log covers the whole host.
+        attach_log_collector(driver, browser, streaming=False, page_hook=True)
+    except BaseException:
+        host.dispose(context_id)
+        raise
+    _contexts[driver] = (host, context_id)
+    return driver
+
+
+def is_context_driver(driver: Any) -> bool:
+    """Whether ``driver`` came from make_context_driver."""
+    return driver in _contexts
+
+
+def quit_context_driver(driver: Any) -> None:
+    """End a worker's session and dispose of its context; the host stays up."""
+    host, context_id = _contexts.pop(driver)
+    # An attached chromedriver leaves the host running when it quits.
+    with contextlib.suppress(Exception):
+        driver.quit()
+    host.dispose(context_id)
+
+
+@atexit.register
+def close_context_hosts() -> None:
+    """Quit every host Chrome."""
+    with _hosts_lock:
+        hosts = [h for hs in _hosts.values() for h in hs]
+        _hosts.clear()
+    for host in hosts:
+        host.close()
@@ -1,12 +1,18 @@
 """
 Browser driver creation utilities.
 
-Supports chrome, chrome-headless, firefox, firefox-headless, and safari.
+Supports chrome, chrome-headless, firefox, firefox-headless, and safari,
+plus sessions on a WebDriver hub via ``remote:<template>@<hub url>`` specs
+(see remote.py).
 """
 
 import os
+import time
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+
+from . import profiles
+from . import chromedriver_pool, contexts, remote
+from .log_collector import attach_log_collector
 
 # DEVTOOLS flag: when True, Chrome opens DevTools automatically in non-headless mode.
 DEVTOOLS = True
@@ -21,17 +27,46 @@ allowed_threads: dict[str, int] = {
 }
 
 
-def make_chrome_driver(options: webdriver.ChromeOptions, root_url: str) -> webdriver.Chrome:
+def threads_for(browser: str) -> int:
+    """Max concurrent drivers for a browser spec.
+
+    Local browsers use allowed_threads (scaled up for Chrome when workers
+    are shared-process contexts); remote ones use what their hub reports it
+    can host.
+    """
+    if remote.is_remote(browser):
+        return remote.remote_pool(browser).capacity
+    if contexts.supports_contexts(browser):
+        return allowed_threads[browser] * contexts.CONTEXT_THREAD_FACTOR
+    return allowed_threads[browser]
+
+
+def quit_driver(browser: str, driver: webdriver.Remote) -> None:
+    """Quit a driver from make_driver.
+
+    Remote sessions go back to their pool, and context workers dispose of
+    their context while the shared Chrome stays up.
+    """
+    if remote.is_remote(browser):
+        remote.release_remote_driver(browser, driver)
+    elif contexts.is_context_driver(driver):
+        contexts.quit_context_driver(driver)
+    else:
+        driver.quit()
+
+
+def make_chrome_driver(options: webdriver.ChromeOptions, root_url: str) -> webdriver.Remote:
     """
     Build a Chrome WebDriver from the given options, with optional DevTools
-    and CDP Network setup for localhost targets.
+    and CDP Network setup for localhost targets.  The session runs on a
+    shared chromedriver (see chromedriver_pool.py).
     """
     if DEVTOOLS:
         options.add_argument("--auto-open-devtools-for-tabs")
 
-    service = Service(executable_path="utils/chromedriver_wrapper.sh")
+    # get_log fallback for when console streaming (BiDi) is unavailable.
     options.set_capability("goog:loggingPrefs", {"browser": "ALL"})
-    driver = webdriver.Chrome(service=service, options=options)
+    driver = chromedriver_pool.new_chrome_session(options)
 
     if "localhost" in root_url or "127.0.0.1" in root_url:
         driver.execute_cdp_cmd("Network.enable", {})
@@ -47,9 +82,18 @@ def make_driver(
     """
     Create and return a WebDriver for the specified browser string.
 
+    When profile templates are enabled (profiles.PROFILE_TEMPLATES), Chrome
+    and Firefox start from a private clone of a primed profile for this
+    root URL and app build, so the app's HTTP, code and service-worker
+    caches are already hot.  The template is built on first use.
+
+    Remote specs (``remote:...``) get a pooled hub session instead, and with
+    contexts.SHARED_CONTEXTS Chrome workers get a browser context in a
+    shared Chrome; end either with quit_driver rather than driver.quit().
+
     Args:
         browser:  One of 'chrome', 'chrome-headless', 'firefox',
-                  'firefox-headless', 'safari'.
+                  'firefox-headless', 'safari', or a 'remote:' spec.
         root_url: The root URL being tested (used for CDP setup on Chrome).
         device_scale_factor: Optional Chrome device-pixel ratio override.
             When set (e.g. 2.0), Chrome renders and screenshots at that
@@ -61,20 +105,71 @@ def make_driver(
     Returns:
         A configured WebDriver instance.
     """
+    if remote.is_remote(browser):
+        return remote.remote_pool(browser, device_scale_factor).acquire()
+    if contexts.supports_contexts(browser):
+        return contexts.make_context_driver(
+            browser, root_url, device_scale_factor,
+            lambda: _launch_driver(
+                browser, root_url, device_scale_factor, extra_args=contexts.HOST_ARGS
+            ),
+        )
+    if not (profiles.PROFILE_TEMPLATES and profiles.supports_profiles(browser)):
+        return _launch_driver(browser, root_url, device_scale_factor)
+
+    template = profiles.ensure_template(
+        browser,
+        root_url,
+        lambda path: _launch_driver(browser, root_url, device_scale_factor, path),
+    )
+    if template is None:
+        return _launch_driver(browser, root_url, device_scale_factor)
+
+    clone = profiles.clone_template(template, browser)
+    start = time.monotonic()
+    driver = _launch_driver(browser, root_url, device_scale_factor, clone)
+    profiles.remove_with(driver, clone)
+    if profiles.wait_until_ready(driver, root_url):
+        profiles.record_readiness(browser, "warm", time.monotonic() - start)
+    return driver
+
+
+def _launch_driver(
+    browser: str,
+    root_url: str,
+    device_scale_factor: float | None = None,
+    profile_dir: str | None = None,
+    extra_args: tuple[str, ...] = (),
+) -> webdriver.Remote:
+    """Start a driver, using ``profile_dir`` as its profile when given.
+
+    ``extra_args`` are added to Chrome's command line.
+
+    Chrome and Firefox are asked for a WebDriver BiDi connection so their
+    console output can be streamed (see log_collector.py).
+    """
     if browser == "firefox":
         options = webdriver.FirefoxOptions()
+        options.set_capability("webSocketUrl", True)
+        if profile_dir is not None:
+            options.add_argument("-profile")
+            options.add_argument(profile_dir)
         driver = webdriver.Firefox(options=options)
         driver.maximize_window()
 
     elif browser == "firefox-headless":
-        input(
-            "Could get an error here (untested). Involving e.php. If so, it's because "
-            "firefox-headless doesn't send the Origin header with 'localhost' in it..."
+        print(
+            "Warning: firefox-headless is untested and may fail on e.php, because "
+            "it doesn't send the Origin header with 'localhost' in it."
         )
         options = webdriver.FirefoxOptions()
         options.add_argument("-headless")
         options.add_argument("--width=1920")
         options.add_argument("--height=1080")
+        options.set_capability("webSocketUrl", True)
+        if profile_dir is not None:
+            options.add_argument("-profile")
+            options.add_argument(profile_dir)
         driver = webdriver.Firefox(options=options)
 
     elif browser == "safari":
@@ -90,6 +185,11 @@ def make_driver(
             options.add_argument(
                 f"--force-device-scale-factor={device_scale_factor}"
             )
+        options.set_capability("webSocketUrl", True)
+        if profile_dir is not None:
+            options.add_argument(f"--user-data-dir={profile_dir}")
+        for arg in extra_args:
+            options.add_argument(arg)
         driver = make_chrome_driver(options, root_url)
 
     elif browser == "chrome-headless":
@@ -105,9 +205,15 @@ def make_driver(
             options.add_argument(
                 f"--force-device-scale-factor={device_scale_factor}"
             )
+        options.set_capability("webSocketUrl", True)
+        if profile_dir is not None:
+            options.add_argument(f"--user-data-dir={profile_dir}")
+        for arg in extra_args:
+            options.add_argument(arg)
         driver = make_chrome_driver(options, root_url)
 
     else:
         raise ValueError(f"Unknown browser: {browser!r}")
 
+    attach_log_collector(driver, browser)
     return driver
@@ -0,0 +1,213 @@
+"""
+Streaming browser console collection.
+
+``driver.get_log("browser")`` drains the whole log over HTTP on every call
+and does not exist on Firefox.  Where the driver speaks WebDriver BiDi
+(Chrome and Firefox started with the ``webSocketUrl`` capability, see
+factory.py), a LogCollector subscribes to ``log.entryAdded`` instead:
+console messages and uncaught exceptions are pushed to it as they happen,
+and error-level entries are buffered per driver.  Checking for errors is
+then a cheap in-process buffer read.
+
+Chrome drivers without BiDi fall back to draining ``get_log``; other
+drivers without BiDi report nothing, as before.  BiDi's console and
+JavaScript-error events don't carry Chrome's network-level entries
+("Failed to load resource: ... 404"), so streaming Chrome drivers also
+sweep ``get_log`` when asked to (``drain(sweep=True)``, once at the end
+of each test), keeping only the entries BiDi missed.  Those errors are
+therefore reported at the end of the test rather than after the command
+that caused them.
+
+Sessions attached to a shared Chrome (contexts.py) can neither stream nor
+use ``get_log``, which would return every context's entries in the host.
+Their collector instead hooks the session's own page (``page_hook``):
+a script registered on that target with
+``Page.addScriptToEvaluateOnNewDocument`` buffers console.error calls,
+uncaught errors and rejections, failed element loads and non-OK fetch
+responses on ``window``, and each drain reads that buffer.  It can't see
+failed XHRs or entries from a page that navigated away since the last
+drain.
+"""
+
+import threading
+import weakref
+from typing import Any, TypedDict
+
+# get_log levels (and the BiDi levels mapped onto them) worth reporting.
+ERROR_LEVELS = {"SEVERE", "ERROR"}
+
+_BIDI_LEVELS = {"error": "SEVERE", "warn": "WARNING", "info": "INFO", "debug": "DEBUG"}
+
+# get_log sources that BiDi's handlers already report.
+_BIDI_SOURCES = {"console-api", "javascript"}
+
+# Buffers the page's error-level console output on window (page_hook).
+# Messages follow Chrome's wording so console_rules.json still applies.
+_PAGE_HOOK_JS = r"""
+if (!window.__molmodaConsoleErrors) {
+    const buf = window.__molmodaConsoleErrors = [];
+    const text = v => {
+        if (v instanceof Error) return v.stack || String(v);
+        if (typeof v === 'string') return v;
+        try { return JSON.stringify(v); } catch (e) { return String(v); }
+    };
+    const consoleError = console.error;
+    console.error = function (...args) {
+        buf.push(args.map(text).join(' '));
+        return consoleError.apply(this, args);
+    };
+    window.addEventListener('error', e => {
+        const t = e.target;
+        if (t && t !== window && (t.src || t.href)) {
+            buf.push(`Failed to load resource: ${t.src || t.href}`);
+        } else {
+            buf.push(`Uncaught ${e.error ? text(e.error) : e.message}`);
+        }
+    }, true);
+    window.addEventListener('unhandledrejection', e => {
+        buf.push(`Uncaught (in promise) ${text(e.reason)}`);
+    });
+    const fetch = window.fetch;
+    window.fetch = function (...args) {
+        return fetch.apply(this, args).then(r => {
+            if (!r.ok) {
+                buf.push(
+                    `${r.url} Failed to load resource: the server responded ` +
+                    `with a status of ${r.status}`
+                );
+            }
+            return r;
+        });
+    };
+}
+"""
+
+_PAGE_READ_JS = "return (window.__molmodaConsoleErrors || []).splice(0);"
+
+
+class ILogEntry(TypedDict):
+    """A console entry, in the same shape ``get_log("browser")`` returns."""
+    level: str
+    message: str
+
+
+class LogCollector:
+    """Buffers one driver's error-level console entries as they arrive."""
+
+    def __init__(
+        self,
+        driver: Any,
+        browser: str,
+        streaming: bool = True,
+        page_hook: bool = False,
+    ):
+        self._driver = weakref.ref(driver)
+        self._browser = browser
+        self._lock = threading.Lock()
+        self._entries: list[ILogEntry] = []
+        self.page_hook = page_hook
+        if page_hook:
+            self._install_page_hook(driver)
+        self.streaming = streaming and not page_hook and self._subscribe(driver)
+
+    @staticmethod
+    def _install_page_hook(driver: Any) -> None:
+        """Hook the session's current target, now and after every navigation."""
+        driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": _PAGE_HOOK_JS}
+        )
+        driver.execute_script(_PAGE_HOOK_JS)
+
+    def _read_page_hook(self) -> list[ILogEntry]:
+        driver = self._driver()
+        if driver is None:
+            return []
+        return [
+            {"level": "SEVERE", "message": message}
+            for message in driver.execute_script(_PAGE_READ_JS) or []
+        ]
+
+    def _subscribe(self, driver: Any) -> bool:
+        """Register BiDi handlers; False if the driver can't stream."""
+        if not driver.capabilities.get("webSocketUrl"):
+            return False
+        try:
+            driver.script.add_console_message_handler(self._on_console)
+            driver.script.add_javascript_error_handler(self._on_exception)
+        except Exception as e:
+            # Older Selenium without the script module, or no BiDi support.
+            print(f"Console streaming unavailable for {self._browser}: {e}")
+            return False
+        return True
+
+    def _push(self, level: str, message: str) -> None:
+        if level in ERROR_LEVELS:
+            with self._lock:
+                self._entries.append({"level": level, "message": message})
+
+    def _on_console(self, entry: Any) -> None:
+        # Runs on Selenium's websocket thread.
+        level = _BIDI_LEVELS.get(getattr(entry, "level", ""), "INFO")
+        self._push(level, getattr(entry, "text", "") or "")
+
+    def _on_exception(self, entry: Any) -> None:
+        self._push("SEVERE", getattr(entry, "text", "") or "")
+
+    def _sweep_get_log(self, skip_sources: set[str]) -> list[ILogEntry]:
+        """Error-level get_log entries (Chrome only), minus ``skip_sources``."""
+        driver = self._driver()
+        if driver is None or not self._browser.startswith("chrome"):
+            return []
+        # Through execute: plain Remote sessions (shared chromedriver, hub)
+        # have no get_log method, but chromedriver serves the command.
+        entries = driver.execute("getLog", {"type": "browser"})["value"]
+        return [
+            {"level": e["level"], "message": e.get("message", "")}
+            for e in entries
+            if e["level"] in ERROR_LEVELS and e.get("source") not in skip_sources
+        ]
+
+    def drain(self, sweep: bool = False) -> list[ILogEntry]:
+        """Return (and forget) error-level entries seen since the last drain.
+
+        Args:
+            sweep: Also drain Chrome's get_log for the network errors BiDi
+                doesn't stream (one HTTP round trip).  Drivers without
+                BiDi always sweep, as get_log is all they have.
+        """
+        if self.page_hook:
+            return self._read_page_hook()
+        if not self.streaming:
+            return self._sweep_get_log(set())
+        # Network errors only show up in get_log.
+        swept = self._sweep_get_log(_BIDI_SOURCES) if sweep else []
+        with self._lock:
+            entries, self._entries = self._entries, []
+        return entries + swept
+
+
+_collectors: "weakref.WeakKeyDictionary[Any, LogCollector]" = weakref.WeakKeyDictionary()
+_collectors_lock = threading.Lock()
+
+
+def attach_log_collector(
+    driver: Any, browser: str, streaming: bool = True, page_hook: bool = False
+) -> LogCollector:
+    """Start collecting a driver's console errors (idempotent).
+
+    Call right after the driver is created so nothing logged during the
+    first page load is missed.
+
+    Args:
+        driver: The driver to collect from.
+        browser: Browser name, for messages and the get_log fallback.
+        streaming: False never subscribes over BiDi, only sweeping get_log
+            (for sessions that can't have a BiDi socket of their own).
+        page_hook: Collect from a script in the session's own page instead
+            of BiDi or get_log (Chrome; for sessions attached to a shared
+            browser, whose get_log mixes in other sessions' pages).
+    """
+    with _collectors_lock:
+        if driver not in _collectors:
+            _collectors[driver] = LogCollector(driver, browser, streaming, page_hook)
+        return _collectors[driver]
@@ -0,0 +1,281 @@
+"""
+Primed browser-profile templates, cloned once per driver.
+
+A fresh throwaway profile makes every worker download and compile the app
+bundle, the WASM modules and the service-worker cache from nothing.
+Instead, one template profile is built per (browser, root URL, app build)
+by loading the app once, and each new driver gets its own copy of it through
+``--user-data-dir`` (Chrome) or ``-profile`` (Firefox).  Copies are
+copy-on-write where the filesystem supports it (APFS clones, reflinks),
+plain copies otherwise.  The build is identified by a hash of the root
+page (build_fingerprint), so a rebuilt or redeployed app gets a fresh
+template rather than a stale bundle or service-worker cache.  Off unless
+PROFILE_TEMPLATES is set.
+
+Readiness (launch until the app's root page has loaded) is recorded for
+the cold template build and for every warm clone, so the two can be
+compared with print_driver_readiness.
+"""
+
+import contextlib
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import weakref
+from typing import Any, Callable
+
+# Set True (run_tests.py --profile-templates) to start drivers from a
+# primed profile; off by default, so every driver gets a fresh profile.
+PROFILE_TEMPLATES = False
+
+# Where templates are kept between runs, relative to the repo root.
+PROFILES_DIR = "./.browser_profiles"
+
+# Seconds to wait for the app (and its service worker) while priming or
+# checking readiness.
+READY_TIMEOUT_SECS = 60
+
+# Lock files Chrome leaves in a profile; a copy that still has them refuses
+# to start ("profile in use").
+_LOCK_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lock", ".parentlock")
+
+# Marks a template as completely primed (a half-built one is rebuilt).
+_PRIMED_MARKER = ".primed"
+
+# Seconds to fetch the root page when fingerprinting the deployed build.
+FINGERPRINT_TIMEOUT_SECS = 10
+
+# arguments: timeout secs.  Resolves once the page has loaded and, where
+# the app has registered one, its service worker is active.  The app only
+# registers a worker in production builds, so with no registration (the
+# dev server) or no worker at all it resolves at once; waiting on
+# serviceWorker.ready there would never finish.
+_READY_JS = r"""
+const done = arguments[arguments.length - 1];
+const deadline = Date.now() + arguments[0] * 1000;
+function poll() {
+    if (document.readyState === 'complete') {
+        if (!navigator.serviceWorker) { done(true); return; }
+        navigator.serviceWorker.getRegistration().then(reg => {
+            if (!reg || (!navigator.serviceWorker.controller
+                         && !reg.installing && !reg.waiting && !reg.active)) {
+                done(true);
+                return;
+            }
+            Promise.race([
+                navigator.serviceWorker.ready,
+                new Promise(r => setTimeout(r, Math.max(deadline - Date.now(), 0))),
+            ]).then(() => done(true));
+        }, () => done(true));
+        return;
+    }
+    if (Date.now() > deadline) { done(false); return; }
+    setTimeout(poll, 50);
+}
+poll();
+"""
+
+# root URL -> build fingerprint (None if the root page couldn't be read)
+_fingerprints: dict[str, str | None] = {}
+_fingerprints_lock = threading.Lock()
+
+_template_locks: dict[str, threading.Lock] = {}
+_template_locks_lock = threading.Lock()
+
+# browser -> {"cold": [secs], "warm": [secs]}
+_readiness: dict[str, dict[str, list[float]]] = {}
+_readiness_lock = threading.Lock()
+
+
+def supports_profiles(browser: str) -> bool:
+    """Whether the browser's profile directory can be chosen (not Safari)."""
+    return browser.startswith("chrome") or browser.startswith("firefox")
+
+
+def build_fingerprint(root_url: str) -> str | None:
+    """Hash of the root page the app serves, or None if it can't be fetched.
+
+    A production build's index.html names its content-hashed bundles, so
+    the hash changes whenever the app is rebuilt or redeployed.  Fetched
+    once per root URL per run.
+    """
+    with _fingerprints_lock:
+        if root_url not in _fingerprints:
+            try:
+                with urllib.request.urlopen(
+                    root_url, timeout=FINGERPRINT_TIMEOUT_SECS
+                ) as r:
+                    body = r.read()
+                _fingerprints[root_url] = hashlib.sha1(body).hexdigest()[:12]
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                print(f"Could not fingerprint the build at {root_url}: {e}")
+                _fingerprints[root_url] = None
+        return _fingerprints[root_url]
+
+
+def template_dir(browser: str, root_url: str) -> str | None:
+    """Path of the template profile for a browser, root URL and app build.
+
+    Returns:
+        The path, or None when the build can't be fingerprinted (a template
+        then can't be trusted to match what the server serves).
+    """
+    build = build_fingerprint(root_url)
+    if build is None:
+        return None
+    return os.path.join(PROFILES_DIR, f"{_template_prefix(browser, root_url)}{build}")
+
+
+def _template_prefix(browser: str, root_url: str) -> str:
+    url_hash = hashlib.sha1(root_url.encode()).hexdigest()[:12]
+    return f"{browser}-{url_hash}-"
+
+
+def _remove_stale_templates(browser: str, root_url: str, keep: str) -> None:
+    """Delete templates primed for earlier builds of the same app."""
+    prefix = _template_prefix(browser, root_url)
+    with contextlib.suppress(OSError):
+        for name in os.listdir(PROFILES_DIR):
+            path = os.path.join(PROFILES_DIR, name)
+            if name.startswith(prefix) and path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def wait_until_ready(driver: Any, root_url: str) -> bool:
+    """Load the app's root page and wait until it (and its cache) is ready."""
+    driver.get(root_url)
+    driver.set_script_timeout(READY_TIMEOUT_SECS + 5)
+    return bool(driver.execute_async_script(_READY_JS, READY_TIMEOUT_SECS))
+
+
+def record_readiness(browser: str, mode: str, secs: float) -> None:
+    """Record one driver's readiness time ("cold" or "warm")."""
+    with _readiness_lock:
+        _readiness.setdefault(browser, {"cold": [], "warm": []})[mode].append(secs)
+
+
+def print_driver_readiness(browser: str) -> None:
+    """Print mean cold-start versus warm-start readiness for a browser."""
+    with _readiness_lock:
+        times = _readiness.get(browser)
+    if not times:
+        return
+    for mode in ("cold", "warm"):
+        if times[mode]:
+            mean = sum(times[mode]) / len(times[mode])
+            print(
+                f"{browser} {mode}-profile driver readiness: mean {mean:.2f}s "
+                f"over {len(times[mode])} driver(s)"
+            )
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _template_locks_lock:
+        return _template_locks.setdefault(path, threading.Lock())
+
+
+def _copy_tree(src: str, dst: str) -> None:
+    """Copy a directory, copy-on-write where the platform supports it."""
+    if sys.platform == "darwin":
+        cmd = ["cp", "-c", "-R", src, dst]
+    elif sys.platform.startswith("linux"):
+        cmd = ["cp", "-a", "--reflink=auto", src, dst]
+    else:
+        cmd = []
+    if cmd and subprocess.run(cmd, capture_output=True).returncode == 0:
+        return
+    shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst, symlinks=True)
+
+
+def _remove_lock_files(profile: str) -> None:
+    for root, _, files in os.walk(profile):
+        for name in files:
+            if name in _LOCK_FILES:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(root, name))
+    # SingletonLock is a dangling symlink, which os.walk lists as a file
+    # only on some platforms.
+    for name in _LOCK_FILES:
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(profile, name))
+
+
+def ensure_template(
+    browser: str,
+    root_url: str,
+    launch: Callable[[str], Any],
+) -> str | None:
+    """Return the primed template for a browser and URL, building it once.
+
+    Concurrent callers for the same template wait for a single build.
+
+    Args:
+        browser: Browser string.
+        root_url: Root URL of the app to prime the cache with.
+        launch: Starts a driver using the given profile directory.
+
+    Returns:
+        The template's path, or None if it could not be built (callers then
+        use a fresh profile).
+    """
+    path = template_dir(browser, root_url)
+    if path is None:
+        return None
+    with _lock_for(path):
+        if os.path.exists(os.path.join(path, _PRIMED_MARKER)):
+            return path
+
+        _remove_stale_templates(browser, root_url, path)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        print(f"Priming {browser} profile template for {root_url}...")
+        driver = None
+        try:
+            start = time.monotonic()
+            driver = launch(os.path.abspath(path))
+            ready = wait_until_ready(driver, root_url)
+            record_readiness(browser, "cold", time.monotonic() - start)
+        except Exception as e:
+            print(f"Could not prime {browser} profile template: {e}")
+            ready = False
+        finally:
+            if driver is not None:
+                with contextlib.suppress(Exception):
+                    driver.quit()
+        if not ready:
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        _remove_lock_files(path)
+        with open(os.path.join(path, _PRIMED_MARKER), "w"):
+            pass
+        return path
+
+
+def clone_template(template: str, browser: str) -> str:
+    """Make a private, writable copy of a template profile.
+
+    Returns:
+        The clone's path.  It is deleted when the driver using it is garbage
+        collected (see remove_with).
+    """
+    parent = tempfile.mkdtemp(prefix=f"molmoda-{browser}-profile-")
+    clone = os.path.join(parent, "profile")
+    _copy_tree(template, clone)
+    _remove_lock_files(clone)
+    with contextlib.suppress(OSError):
+        os.remove(os.path.join(clone, _PRIMED_MARKER))
+    return clone
+
+
+def remove_with(driver: Any, clone: str) -> None:
+    """Delete a cloned profile once its driver is gone."""
+    weakref.finalize(driver, shutil.rmtree, os.path.dirname(clone), True)
@@ -0,0 +1,278 @@
+"""
+Browsers on a remote WebDriver hub (Selenium Grid, or a standalone server).
+
+A browser spec ``remote:<template>@<hub url>`` (or ``remote:<template>``
+with the hub in $MOLMODA_HUB_URL) runs tests in sessions on that hub, e.g.
+
+    remote:chrome-headless@http://localhost:4444
+
+Templates are capability sets in remote_capabilities.json (override the
+file with $MOLMODA_REMOTE_CAPABILITIES); they mirror the local drivers'
+options.
+
+Sessions come from a RemoteSessionPool per spec.  Creating a Grid session
+takes seconds, so the pool starts sessions in parallel up front
+(``prestart``), hands out idle ones first and takes them back on release
+instead of quitting them; they are quit when the process exits.  The
+pool's capacity is what the hub's /status reports for the template's
+browser (free plus busy slots on nodes that are up), so the orchestrators
+never ask for more sessions than the grid can host.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any
+
+from selenium import webdriver
+from selenium.webdriver.common.options import ArgOptions
+
+from .log_collector import attach_log_collector
+
+REMOTE_PREFIX = "remote:"
+
+# Capability templates shipped with the harness.
+CAPABILITIES_PATH = os.path.join(os.path.dirname(__file__), "remote_capabilities.json")
+
+# Capacity assumed when the hub's /status can't be read or has no slots.
+DEFAULT_CAPACITY = 1
+
+# Seconds to wait for the hub's /status.
+STATUS_TIMEOUT_SECS = 10
+
+# Vendor option keys whose "args" get the device-scale-factor flag.
+_CHROMIUM_OPTION_KEYS = ("goog:chromeOptions", "ms:edgeOptions")
+
+
+def is_remote(browser: str) -> bool:
+    """Whether a browser spec refers to a hub session."""
+    return browser.startswith(REMOTE_PREFIX)
+
+
+def parse_remote_spec(browser: str) -> tuple[str, str]:
+    """Split ``remote:<template>[@<hub url>]`` into (template, hub url).
+
+    Raises:
+        ValueError: No hub URL is given or set in $MOLMODA_HUB_URL.
+    """
+    template, _, hub_url = browser[len(REMOTE_PREFIX):].partition("@")
+    hub_url = hub_url or os.environ.get("MOLMODA_HUB_URL", "")
+    if not template or not hub_url:
+        raise ValueError(
+            f"Invalid remote browser {browser!r}; expected "
+            "remote:<template>@<hub url> (or set $MOLMODA_HUB_URL)."
+        )
+    return template, hub_url.rstrip("/")
+
+
+def remote_browser_name(browser: str) -> str:
+    """The browserName (lower case) a remote spec's template asks the hub for.
+
+    Falls back to the template name when the template isn't known.
+    """
+    template = browser[len(REMOTE_PREFIX):].partition("@")[0]
+    try:
+        name = load_capability_templates().get(template, {}).get("browserName")
+    except (OSError, ValueError):
+        name = None
+    return (name or template).lower()
+
+
+def load_capability_templates() -> dict[str, dict[str, Any]]:
+    """Capability templates by name, from $MOLMODA_REMOTE_CAPABILITIES or the default file."""
+    path = os.environ.get("MOLMODA_REMOTE_CAPABILITIES", CAPABILITIES_PATH)
+    with open(path) as f:
+        return json.load(f)
+
+
+def hub_capacity(hub_url: str, browser_name: str) -> int | None:
+    """Sessions the hub can host for ``browser_name``, from its /status.
+
+    Per node that is up, the matching slots, limited by the node's
+    maxSessions.  Returns None when the status can't be read or lists no
+    nodes (e.g. a plain driver server).
+    """
+    try:
+        with urllib.request.urlopen(f"{hub_url}/status", timeout=STATUS_TIMEOUT_SECS) as r:
+            status = json.load(r).get("value", {})
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        print(f"Could not read hub status from {hub_url}: {e}")
+        return None
+    nodes = status.get("nodes")
+    if not nodes:
+        return None
+    capacity = 0
+    for node in nodes:
+        if node.get("availability", "UP") != "UP":
+            continue
+        slots = sum(
+            1 for slot in node.get("slots", [])
+            if slot.get("stereotype", {}).get("browserName", "").lower()
+            == browser_name.lower()
+        )
+        capacity += min(slots, node.get("maxSessions", slots))
+    return capacity
+
+
+class RemoteSessionPool:
+    """Reusable hub sessions for one remote browser spec."""
+
+    def __init__(self, browser: str, device_scale_factor: float | None = None):
+        self.browser = browser
+        template_name, self.hub_url = parse_remote_spec(browser)
+        templates = load_capability_templates()
+        if template_name not in templates:
+            raise ValueError(
+                f"Unknown capability template {template_name!r}; "
+                f"known: {', '.join(sorted(templates))}."
+            )
+        self.capabilities = json.loads(json.dumps(templates[template_name]))
+        if device_scale_factor is not None:
+            for key in _CHROMIUM_OPTION_KEYS:
+                if key in self.capabilities:
+                    self.capabilities[key].setdefault("args", []).append(
+                        f"--force-device-scale-factor={device_scale_factor}"
+                    )
+        browser_name = self.capabilities.get("browserName", "")
+        capacity = hub_capacity(self.hub_url, browser_name)
+        self.capacity = max(capacity or DEFAULT_CAPACITY, 1)
+        print(
+            f"Hub {self.hub_url}: capacity {self.capacity} {browser_name} "
+            f"session(s){'' if capacity else ' (assumed)'}"
+        )
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._idle: list[Any] = []
+        self._all: list[Any] = []
+        self.created = 0
+        self.create_secs = 0.0
+
+    def _create(self) -> Any:
+        options = ArgOptions()
+        for key, value in self.capabilities.items():
+            options.set_capability(key, value)
+        start = time.monotonic()
+        driver = webdriver.Remote(command_executor=self.hub_url, options=options)
+        secs = time.monotonic() - start
+        with self._lock:
+            self.created += 1
+            self.create_secs += secs
+            self._all.append(driver)
+        print(f"Started {self.browser} session in {secs:.1f}s")
+        attach_log_collector(driver, self.browser)
+        return driver
+
+    def acquire(self) -> Any:
+        """Return an idle session, or start one; blocks while at capacity."""
+        self._slots.acquire()
+        while True:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                break
+            try:
+                driver.current_url  # The hub may have timed the session out.
+                return driver
+            except Exception:
+                self._discard(driver)
+        try:
+            return self._create()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver: Any) -> None:
+        """Take a session back for reuse, with its page cleared."""
+        try:
+            driver.delete_all_cookies()
+            driver.get("about:blank")
+        except Exception:
+            self._discard(driver)
+        else:
+            with self._lock:
+                self._idle.append(driver)
+        self._slots.release()
+
+    def prestart(self, count: int) -> None:
+        """Start up to ``count`` sessions in parallel and leave them idle."""
+        count = min(count, self.capacity)
+        started: list[Any] = []
+
+        def start_one() -> None:
+            # Hold the session until all are up, so no thread reuses another's.
+            try:
+                started.append(self.acquire())
+            except Exception as e:
+                print(f"Could not start a {self.browser} session: {e}")
+
+        threads = [threading.Thread(target=start_one) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self._idle.extend(started)
+        for _ in started:
+            self._slots.release()
+
+    def _discard(self, driver: Any) -> None:
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """Quit every session the pool started."""
+        with self._lock:
+            drivers, self._all, self._idle = self._all, [], []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+_pools: dict[tuple[str, float | None], RemoteSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def remote_pool(browser: str, device_scale_factor: float | None = None) -> RemoteSessionPool:
+    """The shared session pool for a remote spec (created on first use)."""
+    with _pools_lock:
+        key = (browser, device_scale_factor)
+        if key not in _pools:
+            _pools[key] = RemoteSessionPool(browser, device_scale_factor)
+        return _pools[key]
+
+
+def release_remote_driver(browser: str, driver: Any) -> None:
+    """Return a session to whichever pool handed it out."""
+    with _pools_lock:
+        pools = [p for (b, _), p in _pools.items() if b == browser]
+    for pool in pools:
+        if driver in pool._all:
+            pool.release(driver)
+            return
+    driver.quit()
+
+
+@atexit.register
+def close_remote_pools() -> None:
+    """Quit all pooled sessions and print how long sessions took to start."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if pool.created:
+            print(
+                f"{pool.browser}: {pool.created} session(s) started, "
+                f"{pool.create_secs / pool.created:.1f}s each on average"
+            )
+        pool.close()
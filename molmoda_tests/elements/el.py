@@ -3,6 +3,7 @@ Selenium element wrapper with built-in waits, error checking, and convenience me
 """
 
 import contextlib
+import functools
 import html
 import re
 import time
@@ -14,22 +15,55 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
+from .error_channel import read_page_errors
+from .page_wait import (
+    MATCHES,
+    NOT_MATCHES,
+    TEXT_IS_NOT,
+    InPageWaitUnavailable,
+    find_in_page,
+    read_text,
+    wait_in_page,
+)
+from ..tracing import span
+
+
+def _traced(phase: str):
+    """Record calls of an el method as spans named after the selector."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            selector = getattr(self, "selector", None) or (args[0] if args else "")
+            with span(str(selector), phase, op=method.__name__):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
 
 class el:
     """
     Wraps a Selenium WebElement located by CSS selector, with:
-      - Automatic polling until the element appears (up to `timeout` seconds).
+      - Automatic waiting until the element appears (up to `timeout` seconds),
+        evaluated inside the page so it returns as soon as the DOM changes.
+        Falls back to WebDriver polling on browsers that can't do that.
       - Convenience properties for reading/writing text and values.
       - Built-in error checking against the #test-error element after each action.
       - Regex-based wait helpers.
     """
 
+    @_traced("el")
     def __init__(self, selector: str, drvr, timeout: int = 50):
         self.selector = selector
         self.timeout = timeout
         self.driver = drvr
         self.poll_frequency_secs = 2
 
+        with contextlib.suppress(InPageWaitUnavailable):
+            self.el = find_in_page(drvr, selector, self.timeout)
+            if self.el is None:
+                self.throw_error(f"{self.selector} not found after {self.timeout} seconds")
+            return
+
         try:
             self.el = WebDriverWait(
                 drvr, self.timeout, poll_frequency=self.poll_frequency_secs
@@ -37,16 +71,22 @@ class el:
         except TimeoutException:
             self.throw_error(f"{self.selector} not found after {self.timeout} seconds")
 
+    def _wait_in_page(
+        self, mode: str, target, pattern: str = "", timeout: int | None = None,
+    ) -> bool:
+        """Run an in-page wait; raises InPageWaitUnavailable to request polling."""
+        return wait_in_page(
+            self.driver, mode, target,
+            self.timeout if timeout is None else timeout, pattern,
+        )
+
     # ------------------------------------------------------------------
     # Text / value properties
     # ------------------------------------------------------------------
 
     @property
     def text(self) -> str:
-        txt = self.el.get_attribute("value")
-        if txt in [None, ""]:
-            txt = self.el.get_attribute("innerHTML")
-        return txt
+        return read_text(self.driver, self.el)
 
     @text.setter
     def text(self, value: str):
@@ -72,10 +112,17 @@ class el:
     # Wait helpers
     # ------------------------------------------------------------------
 
+    @_traced("el")
     def wait_until_text_is_not(self, text: str = "", timeout: int | None = None):
         """Block until the element's text differs from `text`."""
         if timeout is None:
             timeout = self.timeout
+        with contextlib.suppress(InPageWaitUnavailable):
+            if not self._wait_in_page(TEXT_IS_NOT, self.el, text, timeout):
+                self.throw_error(
+                    f"{self.selector} still [[{text}]] after {timeout} seconds"
+                )
+            return
         try:
             WebDriverWait(
                 self.driver, timeout, poll_frequency=self.poll_frequency_secs
@@ -85,10 +132,18 @@ class el:
                 f"{self.selector} still [[{text}]] after {timeout} seconds"
             )
 
+    @_traced("el")
     def wait_until_contains_regex(self, regex: str):
         """Block until the element's text matches `regex`."""
+        regex = html.unescape(regex)
+        with contextlib.suppress(InPageWaitUnavailable):
+            if not self._wait_in_page(MATCHES, self.el, regex):
+                self.throw_error(
+                    f"{self.selector} does not contain [[{regex}]] after {self.timeout} seconds; "
+                    f"Actual text: [[{self.text}]]"
+                )
+            return
         try:
-            regex = html.unescape(regex)
             WebDriverWait(
                 self.driver, self.timeout, poll_frequency=self.poll_frequency_secs
             ).until(lambda d: re.search(regex, self.text))
@@ -98,10 +153,17 @@ class el:
                 f"Actual text: [[{self.text}]]"
             )
 
+    @_traced("el")
     def wait_until_does_not_contain_regex(self, regex: str):
         """Block until the element's text no longer matches `regex`."""
+        regex = html.unescape(regex)
+        with contextlib.suppress(InPageWaitUnavailable):
+            if not self._wait_in_page(NOT_MATCHES, self.el, regex):
+                self.throw_error(
+                    f"{self.selector} still contains [[{regex}]] after {self.timeout} seconds"
+                )
+            return
         try:
-            regex = html.unescape(regex)
             WebDriverWait(
                 self.driver, self.timeout, poll_frequency=self.poll_frequency_secs
             ).until_not(lambda d: re.search(regex, self.text))
@@ -147,15 +209,23 @@ class el:
     # Error checking
     # ------------------------------------------------------------------
 
+    @_traced("check_errors")
     def check_errors(self):
         """
-        Wait briefly, then inspect #test-error. Raises if non-empty.
+        Read the page-side #test-error channel. Raises if it holds an error.
         Called automatically after every mutating action.
+
+        Falls back to the old sleep-then-inspect check if the channel
+        script can't run on this page.
         """
-        time.sleep(0.5)
-        err = el("#test-error", self.driver)
-        if err.text != "":
-            self.throw_error(err.text)
+        try:
+            errors = read_page_errors(self.driver)
+        except Exception:
+            time.sleep(0.5)
+            err = el("#test-error", self.driver)
+            errors = [err.text] if err.text != "" else []
+        if errors:
+            self.throw_error(errors[-1])
 
     def throw_error(self, msg: str):
         """Raise an exception with the given message (appending '.' if missing)."""
@@ -0,0 +1,99 @@
+"""
+Page-side channel for errors the app writes to #test-error.
+
+A MutationObserver on #test-error pushes every new error message into a
+buffer on ``window``.  Checking for errors is then a single cheap script
+call at each command boundary, instead of a fixed sleep followed by a
+fresh element lookup.
+"""
+
+from typing import Any
+
+# Seconds to keep listening for a late error after an action.  0 means a
+# single non-blocking read; errors surfacing later are still caught at the
+# next command boundary because the buffer keeps them.
+ERROR_QUIET_SECS = 0.0
+
+# Installs the observer (idempotently) and defines the read helper.  If
+# #test-error isn't rendered yet, a one-shot observer on the document
+# waits for it.  The observed node is re-resolved whenever Vue replaces it.
+_INSTALL_JS = r"""
+if (!window.__molmodaErrorChannel) {
+    const ch = window.__molmodaErrorChannel = {
+        errors: [], last: '', target: null, waiters: [],
+    };
+    ch.check = function () {
+        const t = ((ch.target && ch.target.textContent) || '').trim();
+        const isNew = t !== '' && t !== ch.last;
+        ch.last = t;
+        if (isNew) {
+            ch.errors.push(t);
+            ch.waiters.splice(0).forEach(w => w());
+        }
+    };
+    ch.attach = function () {
+        const target = document.querySelector('#test-error');
+        if (!target || target === ch.target) return !!target;
+        ch.target = target;
+        new MutationObserver(ch.check).observe(
+            target, {childList: true, characterData: true, subtree: true}
+        );
+        ch.check();
+        return true;
+    };
+    ch.read = function () {
+        if (!ch.target || !ch.target.isConnected) ch.attach();
+        ch.check();
+        const out = ch.errors.splice(0);
+        // The app never clears #test-error, so an error that is still
+        // showing keeps failing every later check, as it always has.
+        if (out.length === 0 && ch.last !== '') out.push(ch.last);
+        return out;
+    };
+    if (!ch.attach()) {
+        const waitForTarget = new MutationObserver(() => {
+            if (ch.attach()) waitForTarget.disconnect();
+        });
+        waitForTarget.observe(
+            document.documentElement, {childList: true, subtree: true}
+        );
+    }
+}
+"""
+
+_READ_JS = _INSTALL_JS + "return window.__molmodaErrorChannel.read();"
+
+_WAIT_JS = _INSTALL_JS + r"""
+const done = arguments[arguments.length - 1];
+const ch = window.__molmodaErrorChannel;
+const errors = ch.read();
+if (errors.length) { done(errors); return; }
+const finish = () => done(ch.read());
+const timer = setTimeout(finish, arguments[0] * 1000);
+ch.waiters.push(() => { clearTimeout(timer); finish(); });
+"""
+
+
+def install_error_channel(driver: Any) -> None:
+    """Start collecting #test-error messages on the current page.
+
+    Call right after navigation.  Reading installs the channel lazily too,
+    so this only makes sure errors raised before the first read are kept.
+    """
+    driver.execute_script(_INSTALL_JS)
+
+
+def read_page_errors(driver: Any, quiet_secs: float = ERROR_QUIET_SECS) -> list[str]:
+    """Return error messages the app has shown since the last read.
+
+    Args:
+        driver: The active WebDriver.
+        quiet_secs: When > 0 and no error is buffered yet, wait up to this
+            long for one to appear (resolving as soon as it does).
+
+    Returns:
+        The new error messages, oldest first; empty when there are none.
+    """
+    if quiet_secs > 0:
+        return driver.execute_async_script(_WAIT_JS, quiet_secs) or []
+    return driver.execute_script(_READ_JS) or []
@@ -0,0 +1,207 @@
+"""
+In-page wait engine for ``el``.
+
+Instead of polling over WebDriver every couple of seconds, a single
+``execute_async_script`` call waits inside the page and resolves as soon
+as the condition holds.  The condition is re-checked on every DOM mutation
+and every animation frame (the latter catches input ``.value`` changes,
+which don't produce mutations).
+
+Browsers where async scripts can't be used fall back to the original
+WebDriverWait polling, decided once per driver.  Waits the page can't
+evaluate (a Python-only regex, a navigation mid-wait) fall back for that
+call only.
+"""
+
+import weakref
+from typing import Any
+
+from selenium.common.exceptions import (
+    JavascriptException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+
+# Extra seconds the WebDriver script timeout allows beyond the in-page
+# timeout, so the page always gets to report its own timeout first.
+SCRIPT_TIMEOUT_MARGIN_SECS = 5
+
+# Modes understood by _WAIT_JS.
+PRESENT = "present"
+MATCHES = "matches"
+NOT_MATCHES = "not_matches"
+TEXT_IS_NOT = "text_is_not"
+
+# arguments: mode, selector (PRESENT) or element, pattern/text, timeout secs.
+# Resolves with {ok: bool, element?, text?: string} or {unsupported: true}
+# when the pattern isn't valid JavaScript regex syntax.  PRESENT resolves
+# with the element found, which arrives in Python as a WebElement.
+_WAIT_JS = r"""
+const [mode, target, pattern, timeoutSecs] = arguments;
+const done = arguments[arguments.length - 1];
+let regex = null;
+if (mode === 'matches' || mode === 'not_matches') {
+    try { regex = new RegExp(pattern); }
+    catch (e) { done({unsupported: true}); return; }
+}
+// Same precedence as el.text: the value if non-empty, else innerHTML.
+function text(elem) {
+    const v = elem.value;
+    return (v === undefined || v === null || v === '') ? elem.innerHTML : String(v);
+}
+let found = null;
+function holds() {
+    if (mode === 'present') return (found = document.querySelector(target)) !== null;
+    if (!target.isConnected) throw new Error('stale element');
+    const t = text(target);
+    if (mode === 'matches') return regex.test(t);
+    if (mode === 'not_matches') return !regex.test(t);
+    return t !== pattern;  // text_is_not
+}
+let finished = false;
+let observer = null;
+let timer = null;
+function finish(result) {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearTimeout(timer);
+    done(result);
+}
+function check() {
+    if (finished) return;
+    try {
+        if (holds()) finish({ok: true, element: found});
+    } catch (e) {
+        finish({ok: false, stale: true});
+    }
+}
+check();
+if (!finished) {
+    observer = new MutationObserver(check);
+    observer.observe(document.documentElement, {
+        childList: true, subtree: true, characterData: true, attributes: true,
+    });
+    const frame = () => { check(); if (!finished) requestAnimationFrame(frame); };
+    requestAnimationFrame(frame);
+    timer = setTimeout(() => {
+        finish({ok: false, text: mode === 'present' ? null : text(target)});
+    }, timeoutSecs * 1000);
+}
+"""
+
+# Same precedence as the in-page text() helper above, in one round trip.
+_TEXT_JS = r"""
+const v = arguments[0].value;
+return (v === undefined || v === null || v === '') ? arguments[0].innerHTML : String(v);
+"""
+
+# Drivers on which async scripts proved unusable, and the script timeout
+# last set on each driver (to skip redundant round trips).
+_unsupported: "weakref.WeakSet[Any]" = weakref.WeakSet()
+_script_timeouts: "weakref.WeakKeyDictionary[Any, float]" = weakref.WeakKeyDictionary()
+
+
+def read_text(driver: Any, element: Any) -> str:
+    """Return an element's value if non-empty, else its innerHTML.
+
+    Equivalent to reading the ``value`` then ``innerHTML`` attributes, but
+    costs a single WebDriver round trip instead of two.
+    """
+    return driver.execute_script(_TEXT_JS, element)
+
+
+def ensure_script_timeout(driver: Any, secs: float) -> None:
+    """Raise the driver's async-script timeout to at least ``secs``.
+
+    Remembers the last value per driver so repeated waits don't each pay
+    a round trip to set it.
+    """
+    if _script_timeouts.get(driver, 0) < secs:
+        driver.set_script_timeout(secs)
+        _script_timeouts[driver] = secs
+
+
+class InPageWaitUnavailable(Exception):
+    """The in-page engine can't evaluate this wait; poll instead."""
+
+
+def find_in_page(driver: Any, selector: str, timeout: float) -> Any | None:
+    """Wait in the page for ``selector`` and return the first match.
+
+    The element comes back with the wait's own result, so finding it costs
+    no further round trip.
+
+    Returns:
+        The WebElement, or None if nothing matched before the timeout.
+
+    Raises:
+        InPageWaitUnavailable: The browser can't run the wait script; the
+            caller should poll instead.
+    """
+    result = _run_wait(driver, PRESENT, selector, timeout)
+    return result.get("element") if result.get("ok") else None
+
+
+def wait_in_page(
+    driver: Any,
+    mode: str,
+    target: Any,
+    timeout: float,
+    pattern: str = "",
+) -> bool:
+    """Block until a condition holds in the page, or the timeout passes.
+
+    Args:
+        driver: The active WebDriver.
+        mode: One of PRESENT, MATCHES, NOT_MATCHES, TEXT_IS_NOT.
+        target: CSS selector for PRESENT, otherwise the WebElement to read.
+        timeout: Seconds to wait.
+        pattern: Regex for MATCHES/NOT_MATCHES, text for TEXT_IS_NOT.
+
+    Returns:
+        True if the condition held before the timeout, else False.
+
+    Raises:
+        InPageWaitUnavailable: The browser can't run the wait script or the
+            pattern isn't valid JavaScript; the caller should poll instead.
+        StaleElementReferenceException: The element left the DOM.
+    """
+    return bool(_run_wait(driver, mode, target, timeout, pattern).get("ok"))
+
+
+def _run_wait(
+    driver: Any,
+    mode: str,
+    target: Any,
+    timeout: float,
+    pattern: str = "",
+) -> dict[str, Any]:
+    """Run _WAIT_JS and return its result (see wait_in_page for errors)."""
+    if driver in _unsupported:
+        raise InPageWaitUnavailable()
+
+    try:
+        ensure_script_timeout(driver, timeout + SCRIPT_TIMEOUT_MARGIN_SECS)
+        result = driver.execute_async_script(_WAIT_JS, mode, target, pattern, timeout)
+    except StaleElementReferenceException:
+        raise
+    except TimeoutException:
+        # The page-side timer should always fire first; if it didn't, the
+        # page is too busy to trust and the caller reports a timeout.
+        return {"ok": False}
+    except JavascriptException as e:
+        # E.g. the page navigated mid-wait.  Poll this once; keep using the
+        # in-page engine for later waits.
+        raise InPageWaitUnavailable() from e
+    except WebDriverException as e:
+        print(f"In-page waits unavailable, falling back to polling: {e.msg}")
+        _unsupported.add(driver)
+        raise InPageWaitUnavailable() from e
+
+    if not isinstance(result, dict) or result.get("unsupported"):
+        raise InPageWaitUnavailable()
+    if result.get("stale"):
+        raise StaleElementReferenceException("Element is no longer attached to the DOM")
+    return result
@@ -1,5 +1,12 @@
 from .executor import run_test, check_errors, do_logs_have_errors
-from .orchestrator import run_browser_suite, print_report
+from .orchestrator import (
+    run_browser_suite,
+    run_multi_browser_suite,
+    print_report,
+    final_failures,
+    save_report,
+    merge_reports,
+)
 from .tour_executor import run_tour
 from .tour_orchestrator import run_tour_suite, print_tour_report
 from .docs_orchestrator import run_docs_capture_suite, print_docs_capture_report
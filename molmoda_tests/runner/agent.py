@@ -0,0 +1,213 @@
+"""
+Worker agent for the HTTP coordinator (see coordinator.py).
+
+An agent runs ``workers`` threads per browser it offers.  Each thread
+leases a task, runs it with ``run_test`` on its own driver, heartbeats the
+lease while the test runs, and posts the outcome back.  If the coordinator
+says the lease is gone (it expired and the task went to another agent),
+the test's session is ended so the worker moves on rather than finishing
+a test nobody is waiting for.  Slow hosts simply
+lease less often, and an agent that dies takes only its leased tasks with
+it: the coordinator requeues them once their leases expire.
+"""
+
+import json
+import os
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any
+
+from ..drivers import is_remote, threads_for
+from .artifact_store import ARTIFACTS_DIR, ArtifactStore, RunManifest
+from .coordinator import TOKEN_HEADER, task_from_json
+from .executor import abandon_test, quit_all_drivers, run_test
+from .screenshots import ScreenshotPipeline, parse_policy, print_screenshot_stats
+
+# Seconds to back off after the coordinator can't be reached.
+RETRY_SECS = 5.0
+
+# Consecutive connection failures after which a worker gives up.
+MAX_CONNECT_FAILURES = 12
+
+
+class _Client:
+    def __init__(self, url: str, token: str | None):
+        self.url = url.rstrip("/")
+        self.token = token
+
+    def get(self, path: str) -> tuple[int, dict[str, Any]]:
+        """GET JSON; returns (status, body).  Raises URLError if unreachable."""
+        return self._send(urllib.request.Request(self.url + path))
+
+    def post(self, path: str, body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        """POST JSON; returns (status, body).  Raises URLError if unreachable."""
+        return self._send(urllib.request.Request(
+            self.url + path,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        ))
+
+    def _send(self, request: urllib.request.Request) -> tuple[int, dict[str, Any]]:
+        if self.token is not None:
+            request.add_header(TOKEN_HEADER, self.token)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, {}
+
+
+def _safe_name(browser: str) -> str:
+    """A browser spec made safe for run ids (remote specs contain URLs)."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", browser)
+
+
+def _heartbeat(client: _Client, lease_id: str, interval: float,
+               stop: threading.Event, lost: threading.Event,
+               worker: int, browser: str) -> None:
+    """Extend a lease until ``stop``; if it is lost, set ``lost`` and end the test."""
+    while not stop.wait(interval):
+        try:
+            status, _ = client.post("/heartbeat", {"lease_id": lease_id})
+        except (urllib.error.URLError, OSError):
+            continue
+        if status == 410:
+            print(f"Lease {lease_id} was lost; abandoning its test.")
+            lost.set()
+            abandon_test(worker, browser)
+            return
+
+
+def _worker(
+    client: _Client,
+    agent: str,
+    browser: str,
+    batched: bool,
+    warm: bool,
+    screenshots: ScreenshotPipeline,
+) -> None:
+    failures = 0
+    while True:
+        try:
+            _, reply = client.post("/lease", {"agent": agent, "browsers": [browser]})
+            failures = 0
+        except (urllib.error.URLError, OSError) as e:
+            failures += 1
+            if failures >= MAX_CONNECT_FAILURES:
+                print(f"[{agent}] Coordinator unreachable ({e}); stopping worker.")
+                return
+            time.sleep(RETRY_SECS)
+            continue
+        if reply.get("done"):
+            return
+        if reply.get("task") is None:
+            time.sleep(reply.get("wait", RETRY_SECS))
+            continue
+
+        lease_id = reply["lease_id"]
+        _, test = task_from_json(reply["task"])
+        stop = threading.Event()
+        lost = threading.Event()
+        threading.Thread(
+            target=_heartbeat,
+            args=(
+                client, lease_id, reply["lease_secs"] / 3, stop, lost,
+                threading.get_ident(), browser,
+            ),
+            daemon=True,
+        ).start()
+        body: dict[str, Any] = {"lease_id": lease_id}
+        start = time.monotonic()
+        try:
+            result = run_test(
+                test, browser, reply["root_url"], False, batched, warm, screenshots
+            )
+            if isinstance(result, list):
+                body["add_tests"] = [list(t) for t in result]
+            else:
+                body["result"] = result
+        except Exception as e:
+            body["error"] = str(e)
+        finally:
+            stop.set()
+        if lost.is_set():
+            # The task is another agent's now; the coordinator would
+            # ignore this result anyway.
+            continue
+        body["elapsed"] = time.monotonic() - start
+        try:
+            client.post("/result", body)
+        except (urllib.error.URLError, OSError) as e:
+            # The lease will expire and the task be requeued.
+            print(f"[{agent}] Could not report {test} on {browser}: {e}")
+
+
+def run_agent(
+    coordinator_url: str,
+    browsers: list[str],
+    workers: int = 1,
+    batched: bool = False,
+    warm: bool = False,
+    screenshot_policy: str = "full",
+    token: str | None = None,
+    name: str | None = None,
+) -> None:
+    """Work for a coordinator until it reports the suite done.
+
+    Args:
+        coordinator_url: e.g. "http://10.0.0.5:8765".
+        browsers: Browsers this host can run.
+        workers: Worker threads (and so drivers) per browser; remote
+            browsers get at most their hub's capacity.
+        batched: Run commands through the page-side interpreter.
+        warm: Start tests in the already-loaded app where possible.
+        screenshot_policy: Which frames to keep (see screenshots.py); they
+            go to this host's artifact store under a manifest per browser.
+        token: Shared secret the coordinator expects, if any.
+        name: Agent name in the coordinator's logs (default hostname-pid).
+    """
+    agent = name or f"{socket.gethostname()}-{os.getpid()}"
+    client = _Client(coordinator_url, token)
+    status, info = client.get("/status")
+    if status != 200:
+        raise RuntimeError(f"Coordinator at {coordinator_url} answered {status}.")
+    root_url = info["root_url"]
+    store = ArtifactStore(ARTIFACTS_DIR)
+    pipelines = {
+        browser: ScreenshotPipeline(
+            RunManifest(
+                store, f"{agent}-{_safe_name(browser)}-{int(time.time())}", "test",
+                browser,
+                root_url,
+            ),
+            parse_policy(screenshot_policy),
+        )
+        for browser in browsers
+    }
+    # A hub bounds its own sessions, whatever this host could run.
+    counts = {
+        browser: min(workers, threads_for(browser)) if is_remote(browser) else workers
+        for browser in browsers
+    }
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(client, agent, browser, batched, warm, pipelines[browser]),
+            name=f"agent-{_safe_name(browser)}-{i}",
+        )
+        for browser in browsers
+        for i in range(counts[browser])
+    ]
+    print(f"Agent {agent}: {workers} worker(s) each for {', '.join(browsers)}")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for browser in browsers:
+        quit_all_drivers(browser)
+        pipelines[browser].close()
+        print_screenshot_stats(pipelines[browser], label=browser)
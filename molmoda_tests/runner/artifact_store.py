@@ -0,0 +1,222 @@
+"""
+Content-addressed store for test screenshots.
+
+Consecutive frames are often pixel-identical (e.g. across ``wait``
+commands), and every rerun used to wipe and rewrite a test's screenshot
+directory.  Frames are instead stored once per distinct image under
+``blobs/``, keyed by the SHA-256 of the browser's base64 PNG, and each run
+writes a manifest under ``runs/`` mapping every test's frames to blobs:
+
+    screenshot_store/
+        blobs/ab/ab12...ef.png
+        runs/<run_id>.json   {"run_id", "kind", "browser", "root_url",
+                              "started_at", "tests": {test: {frame: hash}}}
+
+Manifests are saved as soon as a run starts and again at most every
+MANIFEST_FLUSH_SECS as frames arrive (and at exit), so a crashed or
+interrupted run's failure screenshots can still be found.
+
+``gc`` keeps the newest N runs and deletes blobs no remaining manifest
+refers to, except blobs younger than GC_GRACE_SECS, which may belong to a
+run still in progress.  ``scripts/screenshot_store.py`` exposes listing, exporting and
+garbage collection on the command line.
+"""
+
+import atexit
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from typing import Any
+
+# Where blobs and manifests live, relative to the repo root.
+ARTIFACTS_DIR = "./screenshot_store"
+
+# Seconds between manifest saves while frames are being added.
+MANIFEST_FLUSH_SECS = 2.0
+
+# Blobs younger than this are never garbage-collected: a running suite's
+# manifest may not list them yet.
+GC_GRACE_SECS = 3600.0
+
+# Manifests not yet closed; saved once more at exit.
+_open_manifests: "weakref.WeakSet[RunManifest]" = weakref.WeakSet()
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write via a temp file in the same directory, then rename into place."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+class ArtifactStore:
+    """Blob storage plus run manifests under one root directory."""
+
+    def __init__(self, root: str = ARTIFACTS_DIR):
+        self.root = root
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.runs_dir = os.path.join(root, "runs")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.runs_dir, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        """Path of the PNG stored under ``digest``."""
+        return os.path.join(self.blobs_dir, digest[:2], f"{digest}.png")
+
+    def put_base64(self, data: str) -> tuple[str, int]:
+        """Store a base64-encoded PNG unless an identical one exists.
+
+        Returns:
+            (digest, bytes written); bytes written is 0 for a duplicate,
+            which also skips decoding.
+        """
+        digest = hashlib.sha256(data.encode("ascii")).hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        png = base64.b64decode(data)
+        _atomic_write(path, png)
+        return digest, len(png)
+
+    def manifests(self) -> list[dict[str, Any]]:
+        """All readable run manifests, oldest first."""
+        runs = []
+        for name in os.listdir(self.runs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.runs_dir, name)) as f:
+                    runs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(runs, key=lambda m: m.get("started_at", ""))
+
+    def gc(
+        self, keep: int, grace_secs: float = GC_GRACE_SECS
+    ) -> tuple[int, int, int]:
+        """Keep the newest ``keep`` runs and drop unreferenced blobs.
+
+        Blobs modified within ``grace_secs`` are kept even when unreferenced.
+
+        Returns:
+            (runs removed, blobs removed, bytes freed).
+        """
+        runs = self.manifests()
+        doomed = runs[:max(len(runs) - keep, 0)]
+        for manifest in doomed:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.runs_dir, f"{manifest['run_id']}.json"))
+
+        live = {
+            digest
+            for manifest in runs[len(doomed):]
+            for frames in manifest.get("tests", {}).values()
+            for digest in frames.values()
+        }
+        cutoff = time.time() - grace_secs
+        blobs_removed = bytes_freed = 0
+        for dirpath, _, filenames in os.walk(self.blobs_dir):
+            for name in filenames:
+                if name.endswith(".png") and name[:-4] in live:
+                    continue
+                path = os.path.join(dirpath, name)
+                with contextlib.suppress(OSError):
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    blobs_removed += 1
+                    bytes_freed += size
+            if dirpath != self.blobs_dir:
+                with contextlib.suppress(OSError):
+                    os.rmdir(dirpath)  # Only succeeds once empty.
+        return len(doomed), blobs_removed, bytes_freed
+
+
+class RunManifest:
+    """Thread-safe frame -> blob mapping for one run, saved as JSON."""
+
+    def __init__(
+        self,
+        store: ArtifactStore,
+        run_id: str,
+        kind: str,
+        browser: str,
+        root_url: str,
+    ):
+        self.store = store
+        self.path = os.path.join(store.runs_dir, f"{run_id}.json")
+        self._lock = threading.Lock()
+        self._attempts: dict[str, int] = {}
+        self._data: dict[str, Any] = {
+            "run_id": run_id,
+            "kind": kind,
+            "browser": browser,
+            "root_url": root_url,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+            "tests": {},
+        }
+        self._last_save = 0.0
+        self.save()
+        _open_manifests.add(self)
+
+    def reset_test(self, test: str) -> int:
+        """Forget a test's frames (a new attempt replaces them).
+
+        Returns:
+            The new attempt's number, to pass to ``add``.
+        """
+        with self._lock:
+            self._data["tests"].pop(test, None)
+            self._attempts[test] = self._attempts.get(test, 0) + 1
+            return self._attempts[test]
+
+    def add(self, test: str, frame: str, digest: str, attempt: int) -> None:
+        """Record that ``test``'s frame ``frame`` is stored as ``digest``.
+
+        Frames from an attempt that has since been replaced are ignored.
+        """
+        with self._lock:
+            if self._attempts.get(test) == attempt:
+                self._data["tests"].setdefault(test, {})[frame] = digest
+            due = time.monotonic() - self._last_save >= MANIFEST_FLUSH_SECS
+        if due:
+            with contextlib.suppress(OSError):
+                self.save()
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        with self._lock:
+            self._last_save = time.monotonic()
+            data = json.dumps(self._data, indent=1).encode()
+        _atomic_write(self.path, data)
+
+    def close(self) -> None:
+        """Mark the run finished and save the manifest a last time."""
+        with self._lock:
+            self._data["finished_at"] = datetime.now(timezone.utc).isoformat()
+        _open_manifests.discard(self)
+        self.save()
+
+
+@atexit.register
+def _save_open_manifests() -> None:
+    """Save manifests of runs cut short (Ctrl+C, an exception)."""
+    for manifest in list(_open_manifests):
+        with contextlib.suppress(OSError):
+            manifest.save()
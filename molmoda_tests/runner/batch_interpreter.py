@@ -0,0 +1,246 @@
+"""
+Page-side interpreter for running a test's command list in one round trip.
+
+``dispatch_command`` costs several WebDriver round trips per command (el
+lookup, the action, the error check).  In batched mode the whole run of
+commands is sent to the page at once and executed there: click, text,
+wait, waitUntilRegex, waitUntilNotRegex and checkBox run natively in JS,
+checking the #test-error channel after each action, and the page returns
+a per-command timing trace.
+
+Commands that need real input events stay in Python: ``upload`` (file
+inputs can only be filled through WebDriver) and shift-clicks (the
+modifier must come from a real key press).  The interpreter also hands a
+command back to Python when it can't faithfully run it, e.g. text entry
+into something other than an <input>/<textarea>, or a regex that only
+Python understands.
+
+Before clicking, setting text or toggling a checkbox, the interpreter
+checks what Selenium would: the element is rendered and visible, not
+disabled, and (for clicks) is what sits on top at its centre once
+scrolled into view (``getBoundingClientRect`` plus ``elementFromPoint``).
+An element failing a check is handed back to Python, so el raises the
+same "not clickable" error batched or not.
+
+The actions themselves still aren't real input, which can matter to
+handlers that listen for more than the end result:
+
+- A click is ``HTMLElement.click()``: only a ``click`` event, with no
+  pointerdown/mousedown/mouseup before it, no hover and no focus change.
+- Text is set through the native value setter, followed by one ``input``
+  and one ``change`` event: no key events, no per-character input events,
+  and ``maxlength`` and input masks that act on key presses don't apply.
+"""
+
+from typing import Any, TypedDict
+
+from ..elements.page_wait import ensure_script_timeout
+from .command_dispatch import ITestCommand
+
+# Seconds each element lookup or regex wait may take, matching el's default.
+ELEMENT_TIMEOUT_SECS = 50
+
+# Commands that must always go through Selenium.
+NATIVE_ONLY_CMDS = {"upload"}
+
+# arguments: cmds, element timeout secs.  Resolves with
+# {trace: [{ms}], error: string|null, yielded: index|null}.  ``trace``
+# has one entry per completed command; ``yielded`` is the index of a
+# command the page declined to run, which Python must dispatch itself.
+_INTERPRETER_JS = r"""
+const [cmds, timeoutSecs] = arguments;
+const done = arguments[arguments.length - 1];
+const timeoutMs = timeoutSecs * 1000;
+const trace = [];
+class Yield extends Error {}
+
+// html.unescape() equivalent, as dispatch_command applies to text/regex.
+function unescape(s) {
+    const t = document.createElement('textarea');
+    t.innerHTML = s;
+    return t.value;
+}
+function text(e) {
+    const v = e.value;
+    return (v === undefined || v === null || v === '') ? e.innerHTML : String(v);
+}
+function waitFor(pred) {
+    return new Promise(resolve => {
+        let finished = false, observer = null, timer = null;
+        const finish = v => {
+            if (finished) return;
+            finished = true;
+            if (observer) observer.disconnect();
+            clearTimeout(timer);
+            resolve(v);
+        };
+        const check = () => {
+            if (finished) return;
+            let v = null;
+            try { v = pred(); } catch (e) { v = null; }
+            if (v) finish(v);
+        };
+        check();
+        if (finished) return;
+        observer = new MutationObserver(check);
+        observer.observe(document.documentElement, {
+            childList: true, subtree: true, characterData: true, attributes: true,
+        });
+        const frame = () => { check(); if (!finished) requestAnimationFrame(frame); };
+        requestAnimationFrame(frame);
+        timer = setTimeout(() => finish(null), timeoutMs);
+    });
+}
+async function find(sel) {
+    const e = await waitFor(() => document.querySelector(sel));
+    if (!e) throw new Error(sel + ' not found after ' + timeoutSecs + ' seconds.');
+    return e;
+}
+function regexOf(pattern) {
+    try { return new RegExp(unescape(pattern)); }
+    catch (e) { throw new Yield(); }
+}
+function checkErrors() {
+    const ch = window.__molmodaErrorChannel;
+    if (!ch) return;
+    const errors = ch.read();
+    if (errors.length) throw new Error(errors[errors.length - 1]);
+}
+// Selenium's interactability checks; failing elements go back to Python,
+// whose real click or send_keys raises the usual error.
+function interactable(e) {
+    if (e.matches(':disabled') || e.getClientRects().length === 0) return false;
+    const r = e.getBoundingClientRect();
+    if (r.width === 0 || r.height === 0) return false;
+    const style = getComputedStyle(e);
+    return style.visibility === 'visible' && style.display !== 'none';
+}
+function clickable(e) {
+    if (!interactable(e)) return false;
+    let r = e.getBoundingClientRect();
+    const inView = r.top >= 0 && r.left >= 0 &&
+        r.bottom <= window.innerHeight && r.right <= window.innerWidth;
+    if (!inView) {
+        e.scrollIntoView({block: 'center', inline: 'center'});
+        r = e.getBoundingClientRect();
+    }
+    const hit = document.elementFromPoint(r.left + r.width / 2, r.top + r.height / 2);
+    return !!hit && (hit === e || e.contains(hit));
+}
+function click(e) {
+    if (!clickable(e)) throw new Yield();
+    e.click();
+}
+function setValue(e, value) {
+    let proto = null;
+    if (e instanceof HTMLInputElement) proto = HTMLInputElement.prototype;
+    else if (e instanceof HTMLTextAreaElement) proto = HTMLTextAreaElement.prototype;
+    else throw new Yield();
+    if (!interactable(e) || e.readOnly) throw new Yield();
+    e.focus();
+    // el.text clears the field first, so BACKSPACE leaves it empty.
+    const next = value === 'BACKSPACE' ? '' : unescape(String(value));
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(e, next);
+    e.dispatchEvent(new Event('input', {bubbles: true}));
+    e.dispatchEvent(new Event('change', {bubbles: true}));
+}
+
+async function runOne(cmd) {
+    const name = cmd.cmd;
+    if (name === 'click') {
+        if (cmd.data) throw new Yield();  // shift-click
+        click(await find(cmd.selector));
+        checkErrors();
+    } else if (name === 'text') {
+        setValue(await find(cmd.selector), cmd.data);
+        checkErrors();
+    } else if (name === 'wait') {
+        await new Promise(r => setTimeout(r, cmd.data * 1000));
+    } else if (name === 'waitUntilRegex' || name === 'waitUntilNotRegex') {
+        const e = await find(cmd.selector);
+        const re = regexOf(cmd.data);
+        const want = name === 'waitUntilRegex';
+        if (!(await waitFor(() => re.test(text(e)) === want))) {
+            throw new Error(want
+                ? cmd.selector + ' does not contain [[' + re.source + ']] after ' +
+                  timeoutSecs + ' seconds; Actual text: [[' + text(e) + ']].'
+                : cmd.selector + ' still contains [[' + re.source + ']] after ' +
+                  timeoutSecs + ' seconds.');
+        }
+    } else if (name === 'checkBox') {
+        const e = await find(cmd.selector);
+        if (!!cmd.data !== e.checked) click(e);
+    } else {
+        throw new Yield();
+    }
+}
+
+(async () => {
+    for (let i = 0; i < cmds.length; i++) {
+        const start = performance.now();
+        try {
+            await runOne(cmds[i]);
+        } catch (e) {
+            if (e instanceof Yield) { done({trace, error: null, yielded: i}); return; }
+            done({trace, error: String(e && e.message || e), yielded: null});
+            return;
+        }
+        trace.push({ms: performance.now() - start});
+    }
+    done({trace, error: null, yielded: null});
+})();
+"""
+
+
+class IBatchResult(TypedDict):
+    """Outcome of one interpreter call.
+
+    ``durations`` has one entry (seconds) per command that completed.
+    ``error`` is set when the command after them failed; ``yielded`` is
+    the index of a command handed back to Python.
+    """
+    durations: list[float]
+    error: str | None
+    yielded: int | None
+
+
+def is_native_command(cmd: ITestCommand) -> bool:
+    """Whether a command must be dispatched through Selenium."""
+    return cmd["cmd"] in NATIVE_ONLY_CMDS or (
+        cmd["cmd"] == "click" and bool(cmd.get("data", False))
+    )
+
+
+def _budget_secs(cmds: list[ITestCommand]) -> float:
+    """Upper bound on how long a batch can legitimately run."""
+    total = 0.0
+    for cmd in cmds:
+        if cmd["cmd"] == "wait":
+            total += float(cmd.get("data", 0))  # type: ignore[arg-type]
+        elif cmd["cmd"] in ("waitUntilRegex", "waitUntilNotRegex"):
+            total += 2 * ELEMENT_TIMEOUT_SECS
+        else:
+            total += ELEMENT_TIMEOUT_SECS
+    return total + 10
+
+
+def run_command_batch(driver: Any, cmds: list[ITestCommand]) -> IBatchResult:
+    """Run consecutive commands in the page with a single async script.
+
+    Args:
+        driver: The active WebDriver, already on the test page (with the
+            #test-error channel installed).
+        cmds: Commands to run, none of which satisfy is_native_command.
+
+    Returns:
+        Per-command durations and where (and why) execution stopped.
+    """
+    ensure_script_timeout(driver, _budget_secs(cmds))
+    result = driver.execute_async_script(
+        _INTERPRETER_JS, cmds, ELEMENT_TIMEOUT_SECS
+    )
+    return {
+        "durations": [t["ms"] / 1000 for t in result["trace"]],
+        "error": result["error"],
+        "yielded": result["yielded"],
+    }
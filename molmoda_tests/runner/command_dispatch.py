@@ -2,6 +2,7 @@ import time
 from typing import Any, TypedDict
 from selenium.webdriver.remote.webelement import WebElement
 from ..elements import el
+from ..tracing import span
 
 
 class ITestCommand(TypedDict, total=False):
@@ -28,6 +29,12 @@ def dispatch_command(driver: Any, cmd: ITestCommand) -> None:
     Raises:
         Exception: Propagates whatever the underlying element helpers raise.
     """
+    with span(cmd["cmd"], "dispatch", selector=cmd.get("selector", "")):
+        _dispatch(driver, cmd)
+
+
+def _dispatch(driver: Any, cmd: ITestCommand) -> None:
+    """Run one command (the body of dispatch_command)."""
     name = cmd["cmd"]
     if name == "click":
         el(cmd["selector"], driver).click(cmd.get("data", False))
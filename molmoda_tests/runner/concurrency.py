@@ -0,0 +1,259 @@
+"""
+Adaptive worker concurrency for the work queue.
+
+``allowed_threads`` is a fixed table, which leaves big CI machines idle and
+overloads laptops.  A ConcurrencyController instead starts at a
+conservative worker count and, every ADJUST_INTERVAL_SECS, moves it one
+step up or down within user-set bounds, based on:
+
+* host CPU load (1-minute load average per core, or psutil's CPU percent
+  when psutil is installed),
+* free memory (psutil, or /proc/meminfo on Linux), and
+* latency inflation: how much slower tests are currently running than
+  their historical durations (median ratio over the recent completions).
+
+Every decision, including holding steady, is logged.
+"""
+
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from ..drivers import is_remote, threads_for
+
+try:
+    import psutil
+except ImportError:  # Optional; falls back to os.getloadavg/proc.
+    psutil = None
+
+# Seconds between decisions.
+ADJUST_INTERVAL_SECS = 10.0
+
+# Scale down above any of these...
+CPU_HIGH = 0.90
+MEMORY_FREE_LOW = 0.15
+INFLATION_HIGH = 1.5
+
+# ...and up only when all of these hold (and work is waiting).
+CPU_LOW = 0.65
+MEMORY_FREE_OK = 0.30
+INFLATION_OK = 1.2
+
+# Recent completions used to measure latency inflation.
+LATENCY_WINDOW = 8
+
+# The controller starts at no more than this share of its upper bound, and
+# only grows once the host has shown it has headroom.
+START_FRACTION = 0.5
+
+# Browsers whose driver supports only one session at a time.
+_SINGLE_SESSION_BROWSERS = {"safari"}
+
+
+def cpu_load() -> float | None:
+    """Host CPU load as a fraction of capacity, or None if unknown."""
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None) / 100
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def memory_free() -> float | None:
+    """Fraction of physical memory available, or None if unknown."""
+    if psutil is not None:
+        mem = psutil.virtual_memory()
+        return mem.available / mem.total
+    try:
+        with open("/proc/meminfo") as f:
+            info = {
+                line.split(":")[0]: int(line.split()[1]) for line in f if ":" in line
+            }
+        return info["MemAvailable"] / info["MemTotal"]
+    except (OSError, KeyError, ValueError, IndexError):
+        return None
+
+
+def _fmt(value: float | None, fmt: str) -> str:
+    return "n/a" if value is None else format(value, fmt)
+
+
+class ConcurrencyController:
+    """Chooses how many tasks the work queue may run at once.
+
+    The work queue sizes its thread pool for ``max_workers`` but only keeps
+    ``limit`` tasks in flight; it reports each completion through
+    ``observe`` and asks for a new decision through ``adjust``.  CPU and
+    memory readings are host-wide, so a run over several browsers shares
+    one controller rather than having each react to the same readings.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        min_workers: int,
+        max_workers: int,
+        start_workers: int,
+        expected_secs: Callable[[Any], float | None] = lambda task: None,
+    ):
+        """
+        Args:
+            label: Prefix for log lines (e.g. the browser name).
+            min_workers: Never run fewer tasks than this at once.
+            max_workers: Never run more tasks than this at once.
+            start_workers: Initial limit, clamped to the bounds and to
+                START_FRACTION of max_workers.
+            expected_secs: Historical duration of a task, or None if unseen;
+                used to measure latency inflation.
+        """
+        self.label = label
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        conservative = max(1, int(self.max_workers * START_FRACTION))
+        self.limit = min(max(min(start_workers, conservative), self.min_workers),
+                         self.max_workers)
+        self._expected_secs = expected_secs
+        self._expected: dict[Any, float | None] = {}
+        self._ratios: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._next_decision = time.monotonic() + ADJUST_INTERVAL_SECS
+        self._lock = threading.Lock()
+        if psutil is not None:
+            # The first reading covers no interval and is always 0.0.
+            psutil.cpu_percent(interval=None)
+        print(
+            f"[{self.label} concurrency] starting with {self.limit} worker(s) "
+            f"(bounds {self.min_workers}-{self.max_workers})"
+        )
+
+    def observe(self, task: Any, elapsed: float) -> None:
+        """Record a finished task's wall time.
+
+        Call before the task's duration is written back to the history, so
+        the comparison is against earlier runs.
+        """
+        with self._lock:
+            if task not in self._expected:
+                self._expected[task] = self._expected_secs(task)
+            expected = self._expected[task]
+            if expected:
+                self._ratios.append(elapsed / expected)
+
+    def inflation(self) -> float | None:
+        """Median ratio of recent durations to historical ones."""
+        with self._lock:
+            return statistics.median(self._ratios) if self._ratios else None
+
+    def adjust(self, backlog: int) -> int:
+        """Move the limit one step if the interval has passed; return it.
+
+        Args:
+            backlog: Tasks waiting to start.  The limit only grows when
+                there is work for the extra slot.
+        """
+        now = time.monotonic()
+        if now < self._next_decision:
+            return self.limit
+        self._next_decision = now + ADJUST_INTERVAL_SECS
+
+        cpu, free, inflation = cpu_load(), memory_free(), self.inflation()
+        old = self.limit
+        if cpu is not None and cpu > CPU_HIGH:
+            reason = "CPU overloaded"
+            self.limit = max(self.min_workers, old - 1)
+        elif free is not None and free < MEMORY_FREE_LOW:
+            reason = "memory low"
+            self.limit = max(self.min_workers, old - 1)
+        elif inflation is not None and inflation > INFLATION_HIGH:
+            reason = "tests slowing down"
+            self.limit = max(self.min_workers, old - 1)
+        elif backlog == 0:
+            reason = "no waiting work"
+        elif (
+            (cpu is None or cpu < CPU_LOW)
+            and (free is None or free > MEMORY_FREE_OK)
+            and (inflation is None or inflation < INFLATION_OK)
+        ):
+            reason = "headroom available"
+            self.limit = min(self.max_workers, old + 1)
+        else:
+            reason = "within target range"
+
+        moved = reason in ("CPU overloaded", "memory low", "tests slowing down",
+                           "headroom available")
+        if moved and self.limit == old:
+            reason += ", already at bound"
+        if self.limit != old:
+            # Latencies measured at the old level no longer apply.
+            with self._lock:
+                self._ratios.clear()
+        action = "hold" if self.limit == old else f"{old} -> {self.limit}"
+        print(
+            f"[{self.label} concurrency] {action} worker(s): {reason} "
+            f"(cpu {_fmt(cpu, '.0%')}, free mem {_fmt(free, '.0%')}, "
+            f"latency x{_fmt(inflation, '.2f')}, backlog {backlog})"
+        )
+        return self.limit
+
+
+def make_controller(
+    browser: str,
+    bounds: tuple[int, int],
+    start_workers: int,
+    expected_secs: Callable[[Any], float | None] = lambda task: None,
+) -> ConcurrencyController:
+    """Build a controller for a browser, respecting single-session drivers.
+
+    Args:
+        browser: Browser string, or a label for several browsers sharing
+            one controller (their per-browser caps then bound it instead).
+        bounds: User-set (min_workers, max_workers).
+        start_workers: Initial worker count (normally allowed_threads).
+        expected_secs: Historical duration lookup for latency inflation.
+    """
+    min_workers, max_workers = bounds
+    if browser in _SINGLE_SESSION_BROWSERS:
+        min_workers = max_workers = 1
+    elif is_remote(browser):
+        # The hub, not this host, bounds how many sessions can run.
+        max_workers = min(max_workers, threads_for(browser))
+        min_workers = min(min_workers, max_workers)
+    return ConcurrencyController(
+        browser, min_workers, max_workers, start_workers, expected_secs
+    )
+
+
+def parse_bounds(spec: str) -> tuple[int, int]:
+    """Parse a "MIN:MAX" worker range; empty means 1 up to the CPU count.
+
+    Raises:
+        ValueError: The range is malformed or MIN > MAX.
+    """
+    if spec == "":
+        return 1, os.cpu_count() or 1
+    low, _, high = spec.partition(":")
+    bounds = int(low), int(high or low)
+    if not 1 <= bounds[0] <= bounds[1]:
+        raise ValueError(f"Invalid worker range {spec!r}; expected MIN:MAX.")
+    return bounds
+
+
+def parse_caps(spec: str) -> dict[str, int]:
+    """Parse per-browser worker caps like "chrome-headless:6,safari:1".
+
+    The cap follows the last colon, as remote specs contain colons of
+    their own ("remote:chrome@http://hub:4444:4").
+
+    Raises:
+        ValueError: An entry is not BROWSER:N with N >= 1.
+    """
+    caps: dict[str, int] = {}
+    for entry in filter(None, spec.split(",")):
+        browser, _, n = entry.rpartition(":")
+        if not browser or not n.isdigit() or int(n) < 1:
+            raise ValueError(f"Invalid browser cap {entry!r}; expected BROWSER:N.")
+        caps[browser] = int(n)
+    return caps
@@ -0,0 +1,322 @@
+"""
+HTTP coordinator that hands a suite's work queue out to remote agents.
+
+``serve_work_queue`` is a drop-in for ``run_work_queue``: it takes the
+same tasks and ``on_done`` callback, but instead of running tasks on local
+threads it serves them over HTTP (stdlib only) to agents (see agent.py)
+on any number of hosts.  Agents pull a task whenever one of their workers
+is free, so fast hosts automatically take more of the suite than slow
+ones.
+
+Every handed-out task is leased for LEASE_SECS; agents extend the lease
+with heartbeats while the test runs.  A lease that runs out (the agent
+crashed, hung or lost the network) is reported to ``on_done`` as a failed
+attempt, so the orchestrator's usual retry logic puts the task back on
+the queue for another agent.  Results arriving for an expired lease are
+ignored.
+
+Endpoints (JSON bodies; all POST except /status):
+
+    /lease      {"agent", "browsers": [...]}
+                -> {"lease_id", "task": {"browser", "plugin_id", "index"},
+                    "root_url", "lease_secs"}
+                 | {"task": null, "wait": secs} | {"task": null, "done": true}
+    /heartbeat  {"lease_id"}                    -> 200, or 410 if lost
+    /result     {"lease_id", "elapsed", "result" | "add_tests" | "error"}
+    /status     -> root_url and queued, leased, delayed, completed counts
+
+With a token, requests must carry it in the X-Molmoda-Token header.
+"""
+
+import heapq
+import hmac
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from .work_queue import IQueueStats, Retry
+
+# Seconds a lease lasts without a heartbeat.
+LEASE_SECS = 120.0
+
+# Seconds an agent is told to wait when nothing it can run is queued.
+POLL_SECS = 2.0
+
+# Seconds to keep answering "done" after the queue drains, so idle agents
+# hear about it before the server stops.
+DONE_GRACE_SECS = 2 * POLL_SECS
+
+TOKEN_HEADER = "X-Molmoda-Token"
+
+
+def task_to_json(task: tuple[str, tuple[str, int | None]]) -> dict[str, Any]:
+    """Serialise a (browser, (plugin_id, index)) task."""
+    browser, (plugin_id, index) = task
+    return {"browser": browser, "plugin_id": plugin_id, "index": index}
+
+
+def task_from_json(data: dict[str, Any]) -> tuple[str, tuple[str, int | None]]:
+    """Inverse of task_to_json."""
+    return data["browser"], (data["plugin_id"], data["index"])
+
+
+class _Lease:
+    def __init__(self, task: Any, agent: str, lease_secs: float):
+        self.task = task
+        self.agent = agent
+        self.started = time.monotonic()
+        self.deadline = self.started + lease_secs
+
+
+class _Coordinator:
+    """Queue state shared by the HTTP handler threads."""
+
+    def __init__(
+        self,
+        tasks: list[Any],
+        on_done: Callable[[Any, Any, Exception | None, float], list[Any] | None],
+        root_url: str,
+        lease_secs: float,
+    ):
+        self.queue: list[Any] = list(tasks)
+        self.delayed: list[tuple[float, int, Any]] = []
+        self.leases: dict[str, _Lease] = {}
+        self.on_done = on_done
+        self.root_url = root_url
+        self.lease_secs = lease_secs
+        self.lock = threading.Lock()
+        # Serialises on_done calls, which run outside self.lock so a slow
+        # callback (result store, screenshots) never stalls leases and
+        # heartbeats.
+        self.done_lock = threading.Lock()
+        # Completions taken off the leases whose follow-ups aren't queued yet.
+        self.finishing = 0
+        self.seq = itertools.count()
+        self.completed = 0
+        self.busy_secs = 0.0
+        self.peak_leases = 0
+        self.agents: set[str] = set()
+        self.finished_at: float | None = None
+
+    def _finish(self, task: Any, result: Any, error: Exception | None,
+                elapsed: float) -> None:
+        """Feed a completion to on_done and queue its follow-ups.
+
+        Called without self.lock, after the caller counted the completion
+        in self.finishing (so the queue isn't taken for drained meanwhile).
+        """
+        try:
+            with self.done_lock:
+                follow_ups = self.on_done(task, result, error, elapsed) or []
+        finally:
+            with self.lock:
+                self.finishing -= 1
+                self.completed += 1
+                self.busy_secs += elapsed
+                immediate = []
+                for follow_up in follow_ups:
+                    if isinstance(follow_up, Retry):
+                        ready_at = time.monotonic() + follow_up.delay_secs
+                        heapq.heappush(
+                            self.delayed, (ready_at, next(self.seq), follow_up.task)
+                        )
+                    else:
+                        immediate.append(follow_up)
+                self.queue[:0] = immediate
+
+    def tick(self) -> None:
+        """Release backed-off retries and expire overdue leases."""
+        now = time.monotonic()
+        with self.lock:
+            while self.delayed and self.delayed[0][0] <= now:
+                self.queue.insert(0, heapq.heappop(self.delayed)[2])
+            expired = [
+                (lease_id, lease) for lease_id, lease in self.leases.items()
+                if lease.deadline <= now
+            ]
+            for lease_id, _ in expired:
+                del self.leases[lease_id]
+            self.finishing += len(expired)
+        for _, lease in expired:
+            print(f"Lease on {lease.task} by {lease.agent} expired; requeueing.")
+            self._finish(
+                lease.task, None,
+                Exception(f"Agent {lease.agent} stopped responding."),
+                now - lease.started,
+            )
+        with self.lock:
+            if self.finished_at is None and not (
+                self.queue or self.delayed or self.leases or self.finishing
+            ):
+                self.finished_at = time.monotonic()
+
+    def lease(self, agent: str, browsers: list[str]) -> dict[str, Any]:
+        with self.lock:
+            self.agents.add(agent)
+            if self.finished_at is not None:
+                return {"task": None, "done": True}
+            pick = next(
+                (i for i, t in enumerate(self.queue) if t[0] in browsers), None
+            )
+            if pick is None:
+                return {"task": None, "wait": POLL_SECS}
+            task = self.queue.pop(pick)
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = _Lease(task, agent, self.lease_secs)
+            self.peak_leases = max(self.peak_leases, len(self.leases))
+        return {
+            "lease_id": lease_id,
+            "task": task_to_json(task),
+            "root_url": self.root_url,
+            "lease_secs": self.lease_secs,
+        }
+
+    def heartbeat(self, lease_id: str) -> bool:
+        with self.lock:
+            lease = self.leases.get(lease_id)
+            if lease is None:
+                return False
+            lease.deadline = time.monotonic() + self.lease_secs
+            return True
+
+    def result(self, body: dict[str, Any]) -> bool:
+        if "error" in body:
+            result, error = None, Exception(body["error"])
+        elif "add_tests" in body:
+            result, error = [tuple(t) for t in body["add_tests"]], None
+        else:
+            result, error = body["result"], None
+        elapsed = float(body["elapsed"])
+        with self.lock:
+            lease = self.leases.pop(body["lease_id"], None)
+            if lease is None:
+                return False
+            self.finishing += 1
+        self._finish(lease.task, result, error, elapsed)
+        return True
+
+    def status(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "root_url": self.root_url,
+                "queued": len(self.queue),
+                "leased": len(self.leases),
+                "delayed": len(self.delayed),
+                "completed": self.completed,
+                "agents": sorted(self.agents),
+                "done": self.finished_at is not None,
+            }
+
+
+def _make_handler(coordinator: _Coordinator, token: str | None):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: dict[str, Any]) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            if token is not None and not hmac.compare_digest(
+                self.headers.get(TOKEN_HEADER, "").encode(), token.encode()
+            ):
+                self._reply(403, {"error": "bad token"})
+                return False
+            return True
+
+        def do_GET(self) -> None:
+            if not self._authorized():
+                return
+            if self.path == "/status":
+                self._reply(200, coordinator.status())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if not self._authorized():
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/lease":
+                    self._reply(200, coordinator.lease(body["agent"], body["browsers"]))
+                elif self.path == "/heartbeat":
+                    ok = coordinator.heartbeat(body["lease_id"])
+                    self._reply(200 if ok else 410, {"ok": ok})
+                elif self.path == "/result":
+                    ok = coordinator.result(body)
+                    self._reply(200 if ok else 410, {"ok": ok})
+                else:
+                    self._reply(404, {"error": "not found"})
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"error": f"bad request: {e}"})
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass  # One line per poll would drown the suite's output.
+
+    return Handler
+
+
+def serve_work_queue(
+    tasks: list[Any],
+    on_done: Callable[[Any, Any, Exception | None, float], list[Any] | None],
+    root_url: str,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    lease_secs: float = LEASE_SECS,
+    token: str | None = None,
+) -> IQueueStats:
+    """Serve tasks to remote agents until every one (and its follow-ups) is done.
+
+    Args:
+        tasks: Initial (browser, (plugin_id, index)) tasks, in start order.
+        on_done: As for run_work_queue; called for agents' results and for
+            expired leases (with an error), one call at a time.
+        root_url: Root URL agents should test.
+        host: Interface to listen on ("0.0.0.0" for other hosts).
+        port: Port to listen on.
+        lease_secs: Lease length; agents heartbeat well within it.
+        token: Shared secret agents must send, or None.
+
+    Returns:
+        Queue statistics; ``workers`` is the most tasks leased at once.
+    """
+    coordinator = _Coordinator(tasks, on_done, root_url, lease_secs)
+    server = ThreadingHTTPServer((host, port), _make_handler(coordinator, token))
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="coordinator", daemon=True
+    )
+    thread.start()
+    print(
+        f"Coordinator serving {len(tasks)} task(s) on http://{host}:{port} "
+        f"(lease {lease_secs:.0f}s)"
+    )
+    start = time.monotonic()
+    try:
+        while True:
+            coordinator.tick()
+            finished_at = coordinator.finished_at
+            if finished_at is not None and time.monotonic() - finished_at >= DONE_GRACE_SECS:
+                break
+            time.sleep(0.5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    wall_secs = time.monotonic() - start
+    capacity = coordinator.peak_leases * wall_secs
+    print(f"Agents that took part: {', '.join(sorted(coordinator.agents)) or 'none'}")
+    return {
+        "workers": coordinator.peak_leases,
+        "tasks": coordinator.completed,
+        "wall_secs": wall_secs,
+        "busy_secs": coordinator.busy_secs,
+        "utilization": coordinator.busy_secs / capacity if capacity > 0 else 0.0,
+    }
@@ -12,7 +12,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from ..elements import el
-from ..drivers import make_driver
+from ..drivers import make_driver, quit_driver
 from ..discovery.tours import plugin_has_tour
 from .command_dispatch import dispatch_command
 from .plugin_metadata import extract_plugin_info, IPluginInfo
@@ -161,7 +161,7 @@ def quit_all_capture_drivers(browser: str) -> None:
     with _drivers_lock:
         for driver in _drivers.values():
             try:
-                driver.quit()
+                quit_driver(browser, driver)
             except Exception:
                 pass
         _drivers.clear()
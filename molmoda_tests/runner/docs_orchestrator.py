@@ -1,7 +1,9 @@
-import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from ..drivers import allowed_threads
+from ..drivers import print_driver_readiness, print_session_latency, threads_for
+from .concurrency import make_controller
 from .docs_capture import capture_plugin_widget, quit_all_capture_drivers
+from .result_store import ResultStore
+from .timings import TimingHistory, schedule_by_history
+from .work_queue import Retry, backoff_delay, print_queue_stats, run_work_queue
 
 
 def run_docs_capture_suite(
@@ -10,15 +12,31 @@ def run_docs_capture_suite(
     root_url: str,
     out_root: str,
     max_retries: int = 2,
+    retry_backoff_secs: float = 0.0,
+    result_store: ResultStore | None = None,
+    concurrency: tuple[int, int] | None = None,
 ) -> tuple[list[dict], list[dict]]:
     """Capture widget screenshots for every plugin, with retry and threading.
 
+    Failed captures go straight back on the live queue (after an optional
+    backoff) rather than waiting for a retry round; drivers stay alive
+    across attempts.  Captures are started longest-first using wall times
+    from earlier runs.  Every attempt is written to the SQLite result
+    store.
+
     Args:
         plugin_ids: List of (plugin_id, sub_index) tuples to capture.
         browser: Browser identifier (chrome recommended for consistency).
         root_url: Root URL of the MolModa instance.
         out_root: Resolved output root directory.
-        max_retries: Maximum retry rounds for failing captures.
+        max_retries: Maximum attempts per capture.
+        retry_backoff_secs: Delay before a capture's first retry, doubled
+            on each subsequent retry.  0 retries immediately.
+        result_store: Store to record results in.  A private one is opened
+            (and closed) when omitted.
+        concurrency: (min_workers, max_workers) to adapt the worker count
+            to host load within, starting from allowed_threads.  None keeps
+            allowed_threads fixed.
 
     Returns:
         (succeeded, failed): Two lists of result dicts, each containing
@@ -31,74 +49,94 @@ def run_docs_capture_suite(
     # plugin under (id, None) when it was originally enqueued.  Track which
     # plugin ids have produced a successful capture so we skip retries.
     captured_plugins: set[str] = set()
-    remaining = plugin_ids.copy()
-    for try_idx in range(max_retries):
-        failed_this_round: list[tuple[str, int | None]] = []
-        random.shuffle(remaining)
-        with ThreadPoolExecutor(max_workers=allowed_threads[browser]) as executor:
-            futures_map: dict = {}
-            while remaining or futures_map:
-                while remaining:
-                    target = remaining.pop()
-                    # Skip if we've already captured this plugin in this run.
-                    # Happens when (id, None) and (id, 0) both end up queued.
-                    if target[0] in captured_plugins:
-                        continue
-                    future = executor.submit(
-                        capture_plugin_widget,
-                        target, browser, root_url, out_root,
-                    )
-                    futures_map[future] = target
-                for future in as_completed(futures_map):
-                    target = futures_map[future]
-                    try:
-                        result = future.result()
-                        # addTests now returns a single (id, 0) tuple; the
-                        # orchestrator re-queues it for the actual capture.
-                        if isinstance(result, list):
-                            remaining = result + remaining
-                            continue
-                        enriched = {
-                            **result,
-                            "try": try_idx + 1,
-                            "browser": browser,
-                        }
-                        print(
-                            f"{result['status'][:1].upper()}{result['status'][1:]}: "
-                            f"{result['test']} {result['error']}"
-                        )
-                        if result["status"] == "passed":
-                            succeeded.append(enriched)
-                            captured_plugins.add(target[0])
-                        else:
-                            failed_this_round.append(target)
-                            failed.append(enriched)
-                    except Exception as e:
-                        label = (
-                            f"{target[0]}"
-                            f"{f'.{target[1]}' if target[1] is not None else ''}"
-                        )
-                        print(f"Capture {target} raised: {e}")
-                        failed_this_round.append(target)
-                        failed.append({
-                            "status": "failed",
-                            "test": label,
-                            "error": str(e),
-                            "image_path": "",
-                            "try": try_idx + 1,
-                            "browser": browser,
-                        })
-                    finally:
-                        del futures_map[future]
-        quit_all_capture_drivers(browser)
-        remaining = sorted(failed_this_round)
-        if not remaining:
-            break
-        ids_str = ", ".join(
-            i[0] if i[1] is None else f"{i[0]}.{i[1]}"
-            for i in remaining
+    attempts: dict[tuple[str, int | None], int] = {}
+    history = TimingHistory("docs")
+    controller = None
+    if concurrency is not None:
+        controller = make_controller(
+            browser, concurrency, threads_for(browser),
+            lambda t: history.get(t[0], t[1], browser),
+        )
+    remaining = schedule_by_history(
+        plugin_ids, history, browser,
+        controller.limit if controller else threads_for(browser),
+    )
+    store = result_store or ResultStore()
+    run_id = store.start_run("docs", root_url, browser)
+
+    def run(target: tuple[str, int | None]) -> dict | list:
+        # Skip if we've already captured this plugin in this run.
+        # Happens when (id, None) and (id, 0) both end up queued.
+        if target[0] in captured_plugins:
+            return []
+        return capture_plugin_widget(target, browser, root_url, out_root)
+
+    def retry_or_give_up(target: tuple[str, int | None]) -> list:
+        if attempts[target] >= max_retries or target[0] in captured_plugins:
+            return []
+        label = target[0] if target[1] is None else f"{target[0]}.{target[1]}"
+        print(f"Will retry capture {label} (attempt {attempts[target] + 1}/{max_retries})")
+        return [Retry(target, backoff_delay(retry_backoff_secs, attempts[target]))]
+
+    def on_done(
+        target: tuple[str, int | None],
+        result,
+        error: Exception | None,
+        elapsed: float,
+    ) -> list:
+        attempts[target] = attempts.get(target, 0) + 1
+        # Skipped duplicates return [] instantly; don't let them overwrite
+        # the plugin's real capture time.
+        if not (result == [] and target[0] in captured_plugins):
+            history.record(target[0], target[1], browser, elapsed)
+        if error is not None:
+            label = (
+                f"{target[0]}"
+                f"{f'.{target[1]}' if target[1] is not None else ''}"
+            )
+            print(f"Capture {target} raised: {error}")
+            failure = {
+                "status": "failed",
+                "test": label,
+                "error": str(error),
+                "image_path": "",
+                "try": attempts[target],
+                "browser": browser,
+            }
+            failed.append(failure)
+            store.record_result(run_id, target, failure, elapsed)
+            return retry_or_give_up(target)
+        # addTests now returns a single (id, 0) tuple; the orchestrator
+        # re-queues it for the actual capture.
+        if isinstance(result, list):
+            return result
+        enriched = {
+            **result,
+            "try": attempts[target],
+            "browser": browser,
+        }
+        store.record_result(run_id, target, enriched, elapsed)
+        print(
+            f"{result['status'][:1].upper()}{result['status'][1:]}: "
+            f"{result['test']} {result['error']}"
         )
-        print(f"Will retry the following captures: {ids_str}")
+        if result["status"] == "passed":
+            succeeded.append(enriched)
+            captured_plugins.add(target[0])
+            return []
+        failed.append(enriched)
+        return retry_or_give_up(target)
+
+    stats = run_work_queue(
+        remaining, run, on_done, threads_for(browser), controller
+    )
+    quit_all_capture_drivers(browser)
+    history.save()
+    if result_store is None:
+        store.close()
+    print_queue_stats(stats, label=browser)
+    print_driver_readiness(browser)
+    print_session_latency()
     return succeeded, failed
 
 
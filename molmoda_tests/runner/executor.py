@@ -8,91 +8,326 @@ import os
 import shutil
 import threading
 import time
-from typing import Any
+import weakref
+from typing import Any, Callable
+
+from selenium.common.exceptions import WebDriverException
 
 from ..elements import el
-from ..drivers import make_driver
-from .command_dispatch import dispatch_command
+from ..elements.error_channel import install_error_channel, read_page_errors
+from ..elements.page_wait import ensure_script_timeout
+from ..drivers import make_driver, quit_driver
+from ..drivers.log_collector import attach_log_collector
+from ..tracing import span, trace_context
+from .batch_interpreter import is_native_command, run_command_batch
+from .command_dispatch import ITestCommand, dispatch_command
+from .leak_check import LeakTracker
+from .log_filter import IRule, console_filter
+from .perf_metrics import finish_perf_sample, start_perf_sample
+from .result_store import ICommandTiming
+from .screenshots import ScreenshotPipeline
 
 
-# Thread-local driver registry: maps thread id -> WebDriver instance.
-_drivers: dict[int, Any] = {}
+# Thread-local driver registry: maps (thread id, browser) -> WebDriver
+# instance, so suites for several browsers can run side by side.
+_drivers: dict[tuple[int, str], Any] = {}
 _drivers_lock = threading.Lock()
 
+# Registry keys of drivers currently running a test (never trimmed).
+_busy: set[tuple[int, str]] = set()
+
+# Drivers whose page has the app loaded and finished its last test cleanly,
+# so warm mode may start the next test there without a reload.
+_warm_drivers: "weakref.WeakSet[Any]" = weakref.WeakSet()
 
-def do_logs_have_errors(driver, browser: str) -> str | bool:
+# Seconds the page's warm-start hook may take (it regenerates the test
+# commands, which can await plugin-specific setup).
+WARM_START_TIMEOUT_SECS = 30
+
+# arguments: plugin id, index or null.  Resolves with
+# {clean: bool, reason?: string, cmds?: string} from window.__molmodaStartTest.
+_WARM_START_JS = r"""
+const [pluginId, index] = arguments;
+const done = arguments[arguments.length - 1];
+if (!window.__molmodaStartTest) {
+    done({clean: false, reason: 'the page has no warm-start hook'});
+    return;
+}
+window.__molmodaStartTest(pluginId, index === null ? undefined : index).then(
+    done, e => done({clean: false, reason: String(e && e.message || e)})
+);
+"""
+
+
+def do_logs_have_errors(driver, browser: str, sweep: bool = True) -> str | bool:
     """
-    Inspect the browser console for SEVERE/ERROR entries (Chrome only).
+    Inspect the browser console for SEVERE/ERROR entries logged since the
+    last check.
+
+    Console messages and exceptions are streamed into the driver's log
+    collector as they happen (Chrome and Firefox over WebDriver BiDi).
+    With ``sweep`` (the default) Chrome's get_log() is drained as well,
+    for the network errors BiDi doesn't carry; without it, streaming
+    drivers only read the local buffer.  Chrome without BiDi always drains
+    get_log().  Entries an "ignore" rule in console_rules.json matches are
+    dropped.
 
     Returns the joined error messages as a string, or False if none found.
-    Firefox drivers lack get_log(), so always returns False for Firefox.
     """
-    if "firefox" in browser.lower():
+    reportable = _classify_logs(driver, browser, sweep)
+    if not reportable:
         return False
+    return " ".join(message for message, _ in reportable)
 
-    logs = driver.get_log("browser")
-    logs_to_keep = [l for l in logs if l["level"] in ["SEVERE", "ERROR"]]
-    logs_to_keep = [
-        l for l in logs_to_keep
-        if "message" in l
-        and "status of 404" not in l["message"]
-        and "status code 404" not in l["message"]
-        and "status of 400" not in l["message"]
-        and "404 (Not Found)" not in l["message"]
-        and not (
-            "https://www.ebi.ac.uk/" in l["message"]
-            and "blocked by CORS policy" in l["message"]
-        )
-        and not (
-            "https://www.ebi.ac.uk/" in l["message"]
-            and "Failed to load resource" in l["message"]
-        )
-    ]
 
-    if not logs_to_keep:
-        return False
-    return " ".join(l["message"] for l in logs_to_keep)
+def _classify_logs(
+    driver, browser: str, sweep: bool = False
+) -> list[tuple[str, IRule]]:
+    """New console errors paired with the rule each matched, minus ignored ones."""
+    rules = console_filter()
+    classified = [
+        (entry["message"], rules.classify(entry["message"]))
+        for entry in attach_log_collector(driver, browser).drain(sweep)
+    ]
+    return [(m, rule) for m, rule in classified if rule.severity != "ignore"]
 
 
-def check_errors(driver, browser: str) -> str | bool:
+def check_errors(driver, browser: str, sweep: bool = False) -> str | bool:
     """
     Check for JS console errors and raise if any critical ones are found.
-    'user gesture' errors are printed but not raised.
+    Entries matching a "warn" rule (e.g. 'user gesture' errors) are printed
+    but not raised.
+
+    Cheap after each command on streaming drivers; pass ``sweep`` (once
+    per test) to also pick up Chrome's network errors from get_log().
     """
-    js_errs = do_logs_have_errors(driver, browser)
-    if js_errs is not False:
-        if "user gesture" in js_errs:
-            print(f"Ignored JavaScript error: {js_errs} (ignored, user gesture)")
-        else:
-            raise Exception(f"Critical JavaScript error: {js_errs}")
-    return js_errs
+    with span("console", "check_errors"):
+        reportable = _classify_logs(driver, browser, sweep)
+    if not reportable:
+        return False
+    errors = [m for m, rule in reportable if rule.severity == "error"]
+    for message, rule in reportable:
+        if rule.severity == "warn":
+            print(f"Ignored JavaScript error: {message} (ignored, {rule.name})")
+    if errors:
+        raise Exception(f"Critical JavaScript error: {' '.join(errors)}")
+    return " ".join(m for m, _ in reportable)
 
 
 def get_or_create_driver(browser: str, root_url: str):
     """
-    Return the WebDriver for the current thread, creating it if needed.
-    Thread-safe via a simple lock around the registry.
+    Return the current thread's WebDriver for ``browser``, creating it if
+    needed (or if the kept one's session has died).  Thread-safe via a
+    simple lock around the registry.
+    """
+    key = (threading.get_ident(), browser)
+    with _drivers_lock:
+        driver = _drivers.get(key)
+    if driver is not None and not _is_alive(driver):
+        print(f"{browser} session on this worker is gone; starting a new one.")
+        discard_driver(browser, driver)
+        driver = None
+    if driver is None:
+        driver = make_driver(browser, root_url)
+        with _drivers_lock:
+            _drivers[key] = driver
+    return driver
+
+
+def trim_idle_drivers(keep: int) -> None:
+    """Quit idle workers' drivers until at most ``keep`` remain.
+
+    The adaptive worker limit only stops tasks from being dispatched; an
+    idle pool thread would otherwise hold its browser (and its memory)
+    until the suite ends.
+    """
+    with _drivers_lock:
+        idle = [key for key in _drivers if key not in _busy]
+        excess = [
+            (key[1], _drivers.pop(key))
+            for key in idle[:max(len(_drivers) - keep, 0)]
+        ]
+    for browser, driver in excess:
+        _warm_drivers.discard(driver)
+        _quit(browser, driver)
+    if excess:
+        print(f"Quit {len(excess)} idle driver(s) to match {keep} worker(s).")
+
+
+def _is_alive(driver) -> bool:
+    """Whether a kept driver's session still answers."""
+    try:
+        driver.title
+        return True
+    except WebDriverException:
+        return False
+
+
+def _quit(browser: str, driver) -> None:
+    """Quit a driver, ignoring errors, and make sure Safari is really gone.
+
+    safaridriver allows a single session, so a Safari left behind would
+    block the next driver.
+    """
+    with contextlib.suppress(Exception):
+        quit_driver(browser, driver)
+    if browser == "safari":
+        time.sleep(1)
+        os.system("pkill -9 Safari > /dev/null 2>&1")
+        time.sleep(1)
+
+
+def discard_driver(browser: str, driver) -> None:
+    """Quit one driver and drop it from the registry.
+
+    Called when a driver's session has died or can't be reset after a
+    failed test; the worker gets a fresh driver next time.
     """
-    key = threading.get_ident()
     with _drivers_lock:
-        if key not in _drivers:
-            _drivers[key] = make_driver(browser, root_url)
-    return _drivers[key]
+        for key in [k for k, d in _drivers.items() if d is driver]:
+            del _drivers[key]
+    _warm_drivers.discard(driver)
+    _quit(browser, driver)
+
+
+def _reset_after_failure(browser: str, driver) -> None:
+    """Leave a failed test's page so the retry starts clean, on the same driver.
+
+    A session that can't even load about:blank has crashed or wedged and
+    is discarded instead.
+    """
+    _warm_drivers.discard(driver)
+    try:
+        driver.get("about:blank")
+    except Exception:
+        print(f"{browser} session did not recover from a failed test; replacing it.")
+        discard_driver(browser, driver)
+
+
+def abandon_test(thread_id: int, browser: str) -> None:
+    """End the session another worker thread is running a test on.
+
+    The test then fails at its next command instead of running to the end,
+    and its failure handling replaces the driver as usual.  Used by agents
+    whose lease on the test was lost.
+    """
+    with _drivers_lock:
+        driver = _drivers.get((thread_id, browser))
+    if driver is not None:
+        with contextlib.suppress(Exception):
+            driver.quit()
 
 
 def quit_all_drivers(browser: str):
-    """Quit every driver in the registry and clear it."""
+    """Quit every ``browser`` driver in the registry and remove it."""
     with _drivers_lock:
-        for driver in _drivers.values():
+        keys = [key for key in _drivers if key[1] == browser]
+        for key in keys:
+            _quit(browser, _drivers.pop(key))
+
+
+def _start_warm(driver, test_lbl: str, plugin_name: str, plugin_idx: int | None):
+    """Switch the already-loaded page to another test without reloading.
+
+    Returns:
+        The new test's command list, or None if the page reported it could
+        not be reset cleanly (the caller then reloads).
+    """
+    ensure_script_timeout(driver, WARM_START_TIMEOUT_SECS)
+    try:
+        result = driver.execute_async_script(_WARM_START_JS, plugin_name, plugin_idx)
+    except WebDriverException as e:
+        reason = e.msg
+    else:
+        reason = result.get("reason", "")
+        if result.get("clean"):
             try:
-                driver.quit()
-            except Exception:
-                pass
-            if browser == "safari":
-                time.sleep(1)
-                os.system("pkill -9 Safari > /dev/null 2>&1")
-                time.sleep(1)
-        _drivers.clear()
+                return json.loads(result.get("cmds") or "")
+            except ValueError:
+                reason = "no commands after reset"
+    print(f"Warm start of {test_lbl} not clean ({reason}); reloading.")
+    return None
+
+
+def _run_commands(
+    driver,
+    browser: str,
+    cmds: list[ITestCommand],
+    screenshot: Callable[[int], None],
+) -> list[ICommandTiming]:
+    """Dispatch commands one at a time, screenshotting and checking after each.
+
+    ``screenshot`` is called with each command's index after it runs.
+    """
+    cmd_timings: list[ICommandTiming] = []
+    for cmd_idx, cmd in enumerate(cmds):
+        cmd_start = time.monotonic()
+        with trace_context(cmd_index=cmd_idx):
+            dispatch_command(driver, cmd)
+            screenshot(cmd_idx)
+            check_errors(driver, browser)
+        cmd_timings.append({
+            "cmd": cmd["cmd"],
+            "selector": cmd.get("selector", ""),
+            "secs": time.monotonic() - cmd_start,
+        })
+    return cmd_timings
+
+
+def _run_commands_batched(
+    driver,
+    browser: str,
+    cmds: list[ITestCommand],
+    screenshot: Callable[[int], None],
+) -> list[ICommandTiming]:
+    """Run commands through the page-side interpreter where possible.
+
+    Consecutive interpretable commands go to the page in one call; native
+    ones (uploads, shift-clicks, and anything the page hands back) are
+    dispatched through Selenium in between.  Screenshots and console-log
+    checks happen once per segment instead of once per command.
+    """
+    cmd_timings: list[ICommandTiming] = []
+
+    def timing(cmd: ITestCommand, secs: float) -> ICommandTiming:
+        return {"cmd": cmd["cmd"], "selector": cmd.get("selector", ""), "secs": secs}
+
+    force_native: set[int] = set()
+    idx = 0
+    while idx < len(cmds):
+        if idx in force_native or is_native_command(cmds[idx]):
+            cmd_start = time.monotonic()
+            with trace_context(cmd_index=idx):
+                dispatch_command(driver, cmds[idx])
+                screenshot(idx)
+                check_errors(driver, browser)
+            cmd_timings.append(timing(cmds[idx], time.monotonic() - cmd_start))
+            idx += 1
+            continue
+
+        end = idx
+        while end < len(cmds) and not is_native_command(cmds[end]):
+            end += 1
+        with trace_context(cmd_index=idx), span(
+            "batch", "dispatch", commands=end - idx
+        ):
+            batch = run_command_batch(driver, cmds[idx:end])
+        for offset, secs in enumerate(batch["durations"]):
+            cmd_timings.append(timing(cmds[idx + offset], secs))
+        last_idx = idx + max(len(batch["durations"]) - 1, 0)
+        with trace_context(cmd_index=last_idx):
+            screenshot(last_idx)
+            if batch["error"] is not None:
+                msg = batch["error"]
+                raise Exception(msg if msg.endswith(".") else f"{msg}.")
+            check_errors(driver, browser)
+
+        if batch["yielded"] is not None:
+            idx += batch["yielded"]
+            force_native.add(idx)
+        else:
+            idx = end
+    return cmd_timings
 
 
 def run_test(
@@ -100,63 +335,195 @@ def run_test(
     browser: str,
     root_url: str,
     is_single_test_run: bool = False,
+    batched: bool = False,
+    warm: bool = False,
+    screenshots: ScreenshotPipeline | None = None,
+    leak_tracker: LeakTracker | None = None,
 ) -> dict | list:
     """
     Execute a single plugin test identified by (plugin_name, plugin_idx).
 
+    With ``batched``, runs of commands are executed by the page-side
+    interpreter (see batch_interpreter.py) instead of one WebDriver call
+    per action, and screenshots are taken per segment rather than per
+    command.
+
+    With ``warm``, a driver whose previous test finished cleanly keeps its
+    loaded app: the page's ``window.__molmodaStartTest`` hook resets the
+    state and generates the new test's commands.  The page is fully
+    reloaded for a driver's first test, after a failure, and whenever the
+    hook reports that the reset wasn't clean.
+
+    With ``screenshots``, frames are captured on the worker according to
+    the pipeline's policy and handed to its background writers, which store
+    them in the run's artifact manifest; otherwise every frame is saved to
+    ./screenshots/{test} in place.
+
+    With ``leak_tracker``, the driver's retained JS heap is sampled after
+    the test, whatever its outcome (see leak_check.py).
+
+    Drivers stay alive across attempts: after a failed test the page is
+    reset to about:blank, and only a session that no longer responds is
+    quit and replaced (here, or by get_or_create_driver's health check).
+
     Returns either:
-      - A result dict with keys: status, test, error
+      - A result dict with keys: status, test, error, cmd_timings, startup
+        ("warm" or "cold"), startup_secs (time until the commands were
+        ready) and perf (in-app metrics from perf_metrics.py, or None
+        where the browser has no CDP)
       - A list of (plugin_name, index) tuples when the test signals addTests
+
+    Navigation, command dispatch, element waits, error checks and
+    screenshots are recorded as tracing spans tagged with the test and
+    command index.
     """
-    driver = get_or_create_driver(browser, root_url)
+    plugin_name, plugin_idx = plugin_id_tuple
+    test_lbl = (
+        f"{plugin_name}"
+        f"{f'.{plugin_idx}' if plugin_idx is not None else ''}"
+    )
+    with trace_context(plugin=test_lbl), span(test_lbl, "test"):
+        return _run_test(
+            plugin_id_tuple, browser, root_url, is_single_test_run, batched,
+            warm, screenshots, leak_tracker,
+        )
 
+
+def _run_test(
+    plugin_id_tuple: tuple[str, int | None],
+    browser: str,
+    root_url: str,
+    is_single_test_run: bool,
+    batched: bool,
+    warm: bool,
+    screenshots: ScreenshotPipeline | None,
+    leak_tracker: LeakTracker | None,
+) -> dict | list:
+    """Body of run_test, run inside its tracing span."""
+    key = (threading.get_ident(), browser)
+    with _drivers_lock:
+        _busy.add(key)
     try:
-        plugin_name, plugin_idx = plugin_id_tuple
-        test_lbl = (
-            f"{plugin_name}"
-            f"{f'.{plugin_idx}' if plugin_idx is not None else ''}"
+        return _run_test_on_driver(
+            plugin_id_tuple, browser, root_url, is_single_test_run, batched,
+            warm, screenshots, leak_tracker,
         )
+    finally:
+        with _drivers_lock:
+            _busy.discard(key)
 
-        url = f"{root_url}/?test={plugin_name}"
-        if plugin_idx is not None:
-            url += f"&index={plugin_idx}"
-        driver.get(url)
 
-        # Parse the command list from the page.
+def _run_test_on_driver(
+    plugin_id_tuple: tuple[str, int | None],
+    browser: str,
+    root_url: str,
+    is_single_test_run: bool,
+    batched: bool,
+    warm: bool,
+    screenshots: ScreenshotPipeline | None,
+    leak_tracker: LeakTracker | None,
+) -> dict | list:
+    """Run a test on this worker's driver (marked busy by the caller)."""
+    driver = get_or_create_driver(browser, root_url)
+    session = None
+    failed = False
+    plugin_name, plugin_idx = plugin_id_tuple
+    test_lbl = (
+        f"{plugin_name}"
+        f"{f'.{plugin_idx}' if plugin_idx is not None else ''}"
+    )
+
+    startup = "cold"
+    try:
+        startup_start = time.monotonic()
         cmds = None
-        cmds_str = None
-        for _ in range(4):
-            cmds_str = el("#cmds-element", driver).text
-            try:
-                cmds = json.loads(cmds_str)
-                break
-            except Exception:
-                time.sleep(0.25)
+        if warm and driver in _warm_drivers:
+            _warm_drivers.discard(driver)
+            with span("warm start", "navigate"):
+                cmds = _start_warm(driver, test_lbl, plugin_name, plugin_idx)
+            if cmds is not None:
+                startup = "warm"
 
         if cmds is None:
-            raise Exception(
-                "No commands found. Are you sure you specified an actual plugin id?"
-            )
+            url = f"{root_url}/?test={plugin_name}"
+            if plugin_idx is not None:
+                url += f"&index={plugin_idx}"
+            with span(url, "navigate"):
+                driver.get(url)
+            install_error_channel(driver)
 
-        # Set up screenshot directory.
-        screenshot_dir = f"./screenshots/{test_lbl}"
-        if os.path.exists(screenshot_dir):
-            shutil.rmtree(screenshot_dir)
-        os.makedirs("./screenshots", exist_ok=True)
-        os.makedirs(screenshot_dir, exist_ok=True)
-
-        # Execute commands one by one.
-        for cmd_idx, cmd in enumerate(cmds):
-            # addTests is a meta-instruction handled here, not dispatched.
-            if cmd["cmd"] == "addTests":
-                return [(plugin_name, i) for i in range(cmd["data"])]
-            dispatch_command(driver, cmd)
-            driver.save_screenshot(f"{screenshot_dir}/{test_lbl}_{cmd_idx}.png")
-            check_errors(driver, browser)
+            # Parse the command list from the page.
+            cmds_str = None
+            for _ in range(4):
+                cmds_str = el("#cmds-element", driver).text
+                try:
+                    cmds = json.loads(cmds_str)
+                    break
+                except Exception:
+                    time.sleep(0.25)
+
+            if cmds is None:
+                raise Exception(
+                    "No commands found. Are you sure you specified an actual plugin id?"
+                )
+        startup_secs = time.monotonic() - startup_start
+        perf_start = start_perf_sample(driver, browser)
+
+        if screenshots is not None:
+            session = screenshots.session(test_lbl)
+        else:
+            # Set up screenshot directory.
+            screenshot_dir = f"./screenshots/{test_lbl}"
+            if os.path.exists(screenshot_dir):
+                shutil.rmtree(screenshot_dir)
+            os.makedirs("./screenshots", exist_ok=True)
+            os.makedirs(screenshot_dir, exist_ok=True)
+
+        def screenshot(idx: int) -> None:
+            with span("screenshot", "screenshot"):
+                if session is None:
+                    driver.save_screenshot(f"{screenshot_dir}/{test_lbl}_{idx}.png")
+                else:
+                    session.capture(driver, idx)
+
+        # addTests is a meta-instruction handled here, not dispatched.
+        # Commands before it (if any) still run.
+        add_tests_idx = next(
+            (i for i, c in enumerate(cmds) if c["cmd"] == "addTests"), None
+        )
+        to_run = cmds if add_tests_idx is None else cmds[:add_tests_idx]
+        run_commands = _run_commands_batched if batched else _run_commands
+        cmd_timings = run_commands(driver, browser, to_run, screenshot)
+        # Network errors (failed loads) aren't streamed; sweep for them once.
+        check_errors(driver, browser, sweep=True)
+        if add_tests_idx is not None:
+            _warm_drivers.add(driver)
+            return [
+                (plugin_name, i) for i in range(cmds[add_tests_idx]["data"])
+            ]
+
+        # Errors raised after the last checked action (e.g. during the
+        # trailing waits) are still in the page-side buffer.
+        page_errors = read_page_errors(driver)
+        if page_errors:
+            raise Exception(page_errors[-1])
 
-        return {"status": "passed", "test": test_lbl, "error": ""}
+        perf = finish_perf_sample(driver, perf_start, navigated=startup == "cold")
+        _warm_drivers.add(driver)
+        return {
+            "status": "passed",
+            "test": test_lbl,
+            "error": "",
+            "cmd_timings": cmd_timings,
+            "startup": startup,
+            "startup_secs": startup_secs,
+            "perf": perf,
+        }
 
     except Exception as e:
+        failed = True
+        if session is not None:
+            session.fail(driver)
         if is_single_test_run:
             print(f"\nAn error occurred during test '{plugin_id_tuple[0]}'.")
             print(f"Error details: {e}")
@@ -168,3 +535,8 @@ def run_test(
             driver.execute_script(
                 "window.localStorage.clear(); window.sessionStorage.clear();"
             )
+        if leak_tracker is not None:
+            with span("heap", "leak_check"):
+                leak_tracker.sample(driver, test_lbl, same_page=startup == "warm")
+        if failed:
+            _reset_after_failure(browser, driver)
@@ -0,0 +1,221 @@
+"""
+Opt-in JS heap leak detection across the tests a driver runs.
+
+Drivers are reused for many tests and only web storage is cleared between
+them, so memory the app fails to release accumulates.  With leak checking
+on, after every test on a Chrome driver the harness forces a full garbage
+collection (CDP ``HeapProfiler.collectGarbage``) and samples
+``JSHeapUsedSize``: what remains is the retained heap.  Per driver this
+gives a series, from which the report derives
+
+* the growth trend (least-squares slope, bytes per test), and
+* the plugins after which the retained heap jumps by more than
+  JUMP_BYTES, averaged over their runs.
+
+Optionally, whenever a test produces the largest jump seen so far, a heap
+snapshot is written to HEAP_SNAPSHOT_DIR (overwriting the previous one),
+so by the end it holds the worst offender's heap, ready to load in
+DevTools' Memory panel.  Snapshots need Selenium's CDP connection, which
+uses trio.
+
+Cold starts reload the page and thereby drop its heap, so comparing a
+test's sample with the one before it only means something when both ran
+on the same page.  The suite therefore turns on warm starts with leak
+checking, and a sample taken after a reload (the driver's first test, a
+failed warm reset) starts a new series instead of continuing the last.
+"""
+
+import contextlib
+import os
+import statistics
+import tempfile
+import threading
+from typing import Any
+
+from .perf_metrics import cdp_metrics
+
+try:
+    import trio
+except ImportError:  # Optional; only needed for heap snapshots.
+    trio = None
+
+# A retained-heap increase over one test larger than this is reported.
+JUMP_BYTES = 5_000_000
+
+# Where the worst offender's heap snapshot is saved, relative to the repo root.
+HEAP_SNAPSHOT_DIR = "./heap_snapshots"
+
+# Snapshot chunks buffered while the snapshot is taken.
+_SNAPSHOT_BUFFER = 1_000_000
+
+
+async def _take_heap_snapshot(driver: Any, path: str) -> None:
+    async with driver.bidi_connection() as conn:
+        heap = conn.devtools.heap_profiler
+        # Chunks arrive as events before the command returns.
+        chunks = conn.session.listen(
+            heap.AddHeapSnapshotChunk, buffer_size=_SNAPSHOT_BUFFER
+        )
+        await conn.session.execute(heap.take_heap_snapshot(report_progress=False))
+        with open(path, "w") as f:
+            while True:
+                try:
+                    f.write(chunks.receive_nowait().chunk)
+                except trio.WouldBlock:
+                    break
+
+
+def save_heap_snapshot(driver: Any, path: str) -> bool:
+    """Write a Chrome driver's page heap snapshot to ``path``.
+
+    Returns:
+        Whether the snapshot was saved.
+    """
+    if trio is None:
+        print("Heap snapshots need trio (pip install trio); skipped.")
+        return False
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Written beside the target and renamed, so a reader never sees half.
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        trio.run(_take_heap_snapshot, driver, tmp)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"Could not save heap snapshot {path}: {e}")
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        return False
+    return True
+
+
+def _slope(values: list[float]) -> float:
+    """Least-squares slope of values against their index."""
+    n = len(values)
+    mean_x, mean_y = (n - 1) / 2, sum(values) / n
+    var = sum((x - mean_x) ** 2 for x in range(n))
+    return sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / var
+
+
+class LeakTracker:
+    """Retained-heap samples of every driver in one suite.
+
+    ``sample`` is called by run_test (from worker threads) after each test.
+    """
+
+    def __init__(self, browser: str, snapshots: bool = False):
+        """
+        Args:
+            browser: Browser string; only Chrome drivers are sampled.
+            snapshots: Save a heap snapshot of the worst jump so far.
+        """
+        self.browser = browser
+        self.enabled = browser.startswith("chrome")
+        self.snapshot_path = (
+            os.path.join(HEAP_SNAPSHOT_DIR, f"{browser}-worst.heapsnapshot")
+            if snapshots else None
+        )
+        self.snapshot_of: tuple[str, float] | None = None
+        self._lock = threading.Lock()
+        # Workers share one snapshot path; saves take turns.
+        self._snapshot_lock = threading.Lock()
+        # Series of (test, retained bytes) samples, one per page instance.
+        self._series: list[list[tuple[str, float]]] = []
+        self._current: dict[str, list[tuple[str, float]]] = {}
+        self._worst = JUMP_BYTES
+        self._saved_jump = 0.0
+        if not self.enabled:
+            print(f"Leak check needs CDP; not available on {browser}.")
+
+    def sample(self, driver: Any, test: str, same_page: bool = True) -> None:
+        """Collect garbage and record the retained heap after ``test``.
+
+        Args:
+            driver: The driver the test ran on.
+            test: Test label.
+            same_page: Whether the test ran on the page the driver's
+                previous test left (a warm start); False starts a new
+                series, as the reload dropped the old page's heap.
+        """
+        if not self.enabled:
+            return
+        try:
+            driver.execute_cdp_cmd("HeapProfiler.collectGarbage", {})
+            used = cdp_metrics(driver)["JSHeapUsedSize"]
+        except Exception as e:
+            print(f"Could not sample heap after {test}: {e}")
+            return
+
+        with self._lock:
+            series = self._current.get(driver.session_id)
+            if series is None or not same_page:
+                series = self._current[driver.session_id] = []
+                self._series.append(series)
+            jump = used - series[-1][1] if series else 0.0
+            series.append((test, used))
+            worst = self.snapshot_path is not None and jump > self._worst
+            if worst:
+                self._worst = jump
+        if not worst:
+            return
+        # Outside self._lock: snapshots take seconds and only block this
+        # worker.  A bigger jump saved meanwhile by another worker wins.
+        with self._snapshot_lock:
+            if jump > self._saved_jump and save_heap_snapshot(
+                driver, self.snapshot_path
+            ):
+                self._saved_jump = jump
+                self.snapshot_of = (test, jump)
+
+    def trends(self) -> list[float]:
+        """Retained-heap growth per test (bytes) of each page with 2+ samples."""
+        with self._lock:
+            return [
+                _slope([used for _, used in series])
+                for series in self._series
+                if len(series) > 1
+            ]
+
+    def jumps(self) -> list[tuple[str, float, int]]:
+        """Tests after which retained heap grew by more than JUMP_BYTES.
+
+        Returns:
+            (test, mean jump in bytes, times it jumped) tuples, largest first.
+        """
+        by_test: dict[str, list[float]] = {}
+        with self._lock:
+            for series in self._series:
+                for (_, before), (test, after) in zip(series, series[1:]):
+                    if after - before > JUMP_BYTES:
+                        by_test.setdefault(test, []).append(after - before)
+        return sorted(
+            ((test, statistics.mean(js), len(js)) for test, js in by_test.items()),
+            key=lambda item: -item[1],
+        )
+
+
+def print_leak_report(tracker: LeakTracker, label: str) -> None:
+    """Print the heap growth trend and the tests after which heap jumped."""
+    if not tracker.enabled:
+        return
+    trends = tracker.trends()
+    if not trends:
+        print(f"{label} leak check: not enough samples for a trend")
+        return
+    per_page = ", ".join(f"{t / 1e6:+.2f}" for t in trends)
+    print(
+        f"{label} retained heap trend: median {statistics.median(trends) / 1e6:+.2f} "
+        f"MB/test over {len(trends)} page(s) ({per_page})"
+    )
+    jumps = tracker.jumps()
+    if not jumps:
+        print(f"   No test grew the retained heap by more than {JUMP_BYTES / 1e6:.0f} MB")
+    for test, mean_jump, count in jumps:
+        print(f"   Heap jumped after {test}: +{mean_jump / 1e6:.1f} MB ({count}x)")
+    if tracker.snapshot_of is not None:
+        test, jump = tracker.snapshot_of
+        print(
+            f"   Heap snapshot after {test} (+{jump / 1e6:.1f} MB): "
+            f"{tracker.snapshot_path}"
+        )
@@ -0,0 +1,115 @@
+"""
+Declarative console-entry filter used by check_errors.
+
+Rules live in console_rules.json (see the comment at its top) and are
+compiled once into a single regular expression: one alternative per rule,
+each a set of lookaheads anchored at the start of the message, with a
+named group identifying the rule.  Classifying an entry is then one
+``match`` call, however many rules there are.  Every rule counts its
+hits, so rules that never fire can be pruned (print_rule_hits).
+"""
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, NamedTuple
+
+# Rule file shipped next to this module.
+CONSOLE_RULES_PATH = os.path.join(os.path.dirname(__file__), "console_rules.json")
+
+SEVERITIES = ("ignore", "warn", "error")
+
+# Counted for entries no rule matches (which are errors).
+UNMATCHED = "(no rule)"
+
+
+class IRule(NamedTuple):
+    """One rule from the rule file."""
+    name: str
+    severity: str
+
+
+def _rule_pattern(rule: dict[str, Any]) -> str:
+    """Lookaheads that all hold when every matcher of ``rule`` matches."""
+    parts = []
+    if "contains" in rule:
+        parts.append(re.escape(rule["contains"]))
+    if "regex" in rule:
+        re.compile(rule["regex"])  # Report a bad pattern against its rule.
+        parts.append(f"(?:{rule['regex']})")
+    if "url_prefix" in rule:
+        parts.append(r"(?<![\w/.:-])" + re.escape(rule["url_prefix"]))
+    if not parts:
+        raise ValueError(f"Console rule {rule.get('name')!r} has no matcher.")
+    return "".join(f"(?=[\\s\\S]*?{p})" for p in parts)
+
+
+class ConsoleFilter:
+    """Compiled rule set with thread-safe per-rule hit counters."""
+
+    def __init__(self, rules: list[dict[str, Any]]):
+        self.rules: list[IRule] = []
+        alternatives = []
+        for i, rule in enumerate(rules):
+            severity = rule.get("severity", "error")
+            if severity not in SEVERITIES:
+                raise ValueError(
+                    f"Console rule {rule.get('name')!r}: unknown severity {severity!r}."
+                )
+            if any(r.name == rule["name"] for r in self.rules):
+                raise ValueError(f"Duplicate console rule name {rule['name']!r}.")
+            self.rules.append(IRule(rule["name"], severity))
+            alternatives.append(f"(?P<r{i}>{_rule_pattern(rule)})")
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+        self._hits: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def classify(self, message: str) -> IRule:
+        """Return the first rule matching ``message`` (counting the hit).
+
+        Messages no rule matches get an "error" rule named UNMATCHED.
+        """
+        m = self._regex.match(message) if self._regex else None
+        rule = (
+            self.rules[int(m.lastgroup[1:])] if m and m.lastgroup
+            else IRule(UNMATCHED, "error")
+        )
+        with self._lock:
+            self._hits[rule.name] += 1
+        return rule
+
+    def hits(self) -> dict[str, int]:
+        """Hit count per rule name, in rule-file order (then UNMATCHED)."""
+        with self._lock:
+            counts = {r.name: self._hits[r.name] for r in self.rules}
+            counts[UNMATCHED] = self._hits[UNMATCHED]
+        return counts
+
+
+def load_console_filter(path: str = CONSOLE_RULES_PATH) -> ConsoleFilter:
+    """Compile the rules in a rule file."""
+    with open(path) as f:
+        return ConsoleFilter(json.load(f)["rules"])
+
+
+_filter: ConsoleFilter | None = None
+_filter_lock = threading.Lock()
+
+
+def console_filter() -> ConsoleFilter:
+    """The shared filter, compiled from CONSOLE_RULES_PATH on first use."""
+    global _filter
+    with _filter_lock:
+        if _filter is None:
+            _filter = load_console_filter()
+        return _filter
+
+
+def print_rule_hits() -> None:
+    """Print how often each console rule fired (rules that never did too)."""
+    print("\nConsole rule hits:")
+    for name, count in console_filter().hits().items():
+        note = " (never fired)" if count == 0 and name != UNMATCHED else ""
+        print(f"   {name}: {count}{note}")
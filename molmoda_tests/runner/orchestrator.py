@@ -2,13 +2,28 @@
 High-level test orchestration: threaded execution, retry logic, and reporting.
 """
 
-import random
-import time
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import itertools
+import json
 
-from ..drivers import allowed_threads
-from .executor import run_test, quit_all_drivers
+from ..drivers import (
+    is_remote,
+    print_driver_readiness,
+    print_session_latency,
+    threads_for,
+)
+from ..drivers.remote import remote_pool
+from ..tracing import print_phase_summary
+from .artifact_store import ARTIFACTS_DIR, ArtifactStore, RunManifest
+from .concurrency import make_controller
+from .coordinator import serve_work_queue
+from .executor import quit_all_drivers, run_test, trim_idle_drivers
+from .leak_check import LeakTracker, print_leak_report
+from .log_filter import print_rule_hits
+from .perf_metrics import REGRESSION_THRESHOLD, PerfBaseline, format_perf
+from .result_store import ResultStore
+from .screenshots import ScreenshotPipeline, parse_policy, print_screenshot_stats
+from .timings import TIMINGS_PATH, TimingHistory, schedule_by_history
+from .work_queue import Retry, backoff_delay, print_queue_stats, run_work_queue
 
 
 def run_browser_suite(
@@ -16,102 +31,425 @@ def run_browser_suite(
     browser: str,
     root_url: str,
     max_retries: int = 4,
+    retry_backoff_secs: float = 0.0,
+    result_store: ResultStore | None = None,
+    batched: bool = False,
+    warm: bool = False,
+    concurrency: tuple[int, int] | None = None,
+    screenshot_policy: str = "full",
+    perf_threshold: float = REGRESSION_THRESHOLD,
+    update_perf_baseline: bool = False,
+    leak_check: str | None = None,
 ) -> tuple[list[dict], list[dict]]:
     """
     Run all tests for a single browser with retry logic and threading.
 
+    Equivalent to run_multi_browser_suite with one browser; see there for
+    the arguments.
+    """
+    return run_multi_browser_suite(
+        plugin_ids, [browser], root_url, max_retries, retry_backoff_secs,
+        result_store, batched, warm, concurrency, screenshot_policy,
+        perf_threshold, update_perf_baseline, leak_check,
+    )
+
+
+class _BrowserRun:
+    """Per-browser state of a (possibly multi-browser) suite run."""
+
+    def __init__(
+        self,
+        browser: str,
+        root_url: str,
+        store: ResultStore,
+        screenshot_policy: str,
+        leak_check: str | None,
+        artifacts_dir: str,
+    ):
+        self.browser = browser
+        self.run_id = store.start_run("test", root_url, browser)
+        self.screenshots = ScreenshotPipeline(
+            RunManifest(
+                ArtifactStore(artifacts_dir), self.run_id, "test", browser, root_url
+            ),
+            parse_policy(screenshot_policy),
+        )
+        self.leak_tracker = (
+            LeakTracker(browser, snapshots=leak_check == "snapshot")
+            if leak_check else None
+        )
+        self.startup_secs: dict[str, list[float]] = {"cold": [], "warm": []}
+
+    def finish(self) -> None:
+        """Quit the browser's drivers and print its summaries."""
+        quit_all_drivers(self.browser)
+        self.screenshots.close()
+        print_driver_readiness(self.browser)
+        print_startup_benchmark(self.startup_secs, label=self.browser)
+        print_screenshot_stats(self.screenshots, label=self.browser)
+        if self.leak_tracker is not None:
+            print_leak_report(self.leak_tracker, label=self.browser)
+
+
+def run_multi_browser_suite(
+    plugin_ids: list[tuple[str, int | None]],
+    browsers: list[str],
+    root_url: str,
+    max_retries: int = 4,
+    retry_backoff_secs: float = 0.0,
+    result_store: ResultStore | None = None,
+    batched: bool = False,
+    warm: bool = False,
+    concurrency: tuple[int, int] | None = None,
+    screenshot_policy: str = "full",
+    perf_threshold: float = REGRESSION_THRESHOLD,
+    update_perf_baseline: bool = False,
+    leak_check: str | None = None,
+    browser_caps: dict[str, int] | None = None,
+    interactive: bool = True,
+    artifacts_dir: str = ARTIFACTS_DIR,
+    timings_path: str = TIMINGS_PATH,
+    coordinator: tuple[str, int] | None = None,
+    coordinator_token: str | None = None,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Run all tests on several browsers at once, with retry logic and threading.
+
+    Every (browser, test) pair goes into one shared queue; each browser has
+    its own worker slots (allowed_threads, or ``browser_caps``), so e.g.
+    Safari runs one test at a time while Chrome runs several alongside it,
+    and the run takes as long as the slowest browser rather than the sum.
+
+    Failed tests are put straight back on the live queue (after an optional
+    exponential backoff) and rerun on whichever worker frees up next, so a
+    single straggler never holds up the retries of everything else.
+    Drivers stay alive across attempts (a failed test only resets the
+    page; a session that stopped responding is replaced) and are
+    otherwise quit once the whole suite is done.  Tests are started longest-first using wall times
+    saved from earlier runs.  Every attempt is written to the SQLite
+    result store, and screenshots go (in the background) to the
+    deduplicating artifact store under a manifest for the run.  Passing
+    tests' in-app performance metrics are compared with the stored
+    baseline (see perf_metrics.py).
+
     Args:
         plugin_ids:  List of (plugin_name, plugin_idx) tuples.
-        browser:     Browser string (e.g. 'chrome-headless').
+        browsers:    Browser strings (e.g. ['chrome-headless', 'safari']).
         root_url:    Root URL being tested.
-        max_retries: Maximum retry rounds for failing tests.
+        max_retries: Maximum attempts per test.
+        retry_backoff_secs: Delay before a test's first retry, doubled on
+                     each subsequent retry.  0 retries immediately.
+        result_store: Store to record results in.  A private one is opened
+                     (and closed) when omitted.
+        batched:     Run commands through the page-side interpreter (see
+                     run_test).
+        warm:        Start tests in the already-loaded app where possible
+                     instead of reloading it (see run_test).  Startup times
+                     are summarised either way.
+        concurrency: (min_workers, max_workers) to adapt the total worker
+                     count (over all browsers, each still within its cap)
+                     to host load within.  Idle workers' browsers are quit
+                     when it drops.  None keeps the caps fixed.
+        screenshot_policy: Which frames to keep: "full", "every:N",
+                     "ring:K" or "off" (see screenshots.py).
+        perf_threshold: Fractional increase over a test's baseline metrics
+                     that counts as a performance regression.
+        update_perf_baseline: Store passing tests' metrics as the new
+                     baseline instead of only comparing against it.
+        leak_check:  None (off), "on" to sample each driver's retained JS
+                     heap after every test and report growth, or
+                     "snapshot" to also save a heap snapshot of the worst
+                     jump (see leak_check.py).  Turns on ``warm``, as
+                     samples only compare across tests on one page.
+        browser_caps: Worker slots per browser, overriding allowed_threads
+                     (remote browsers are held to their hub's capacity).
+        interactive: When running a single test, keep the browser open for
+                     inspection after a failure until Enter is pressed.
+        artifacts_dir: Root of the screenshot artifact store.
+        timings_path: Timing history file used for ordering (and updated).
+        coordinator: (host, port) to serve the queue on to remote agents
+                     (see coordinator.py) instead of running tests on local
+                     threads.  Caps, concurrency, batched, warm, leak_check
+                     and screenshots are then up to the agents.
+        coordinator_token: Shared secret agents must present.
 
     Returns:
-        (passed_tests, failed_tests): Two lists of result dicts, each with
-        keys: status, test, error, try, browser.
+        (passed_tests, failed_tests): Two lists of result dicts over all
+        browsers, each with keys: status, test, error, try, browser,
+        plugin_id and plugin_index.
+        Passed tests with metrics also have perf, perf_deltas and
+        perf_regressions.
     """
-    is_single = len(plugin_ids) == 1
+    if leak_check and not warm:
+        # Cold starts reload the page, so heap samples would compare
+        # unrelated pages and every jump and trend would be noise.
+        print("Leak checking compares tests on one page; turning on warm starts.")
+        warm = True
+    is_single = len(plugin_ids) == 1 and interactive
     passed_tests: list[dict] = []
     failed_tests: list[dict] = []
+    attempts: dict[tuple, int] = {}
+
+    history = TimingHistory("test", timings_path)
+    store = result_store or ResultStore()
+    perf_baseline = PerfBaseline()
+    runs = {
+        b: _BrowserRun(
+            b, root_url, store, screenshot_policy, leak_check, artifacts_dir
+        )
+        for b in browsers
+    }
+
+    caps = {b: (browser_caps or {}).get(b, threads_for(b)) for b in browsers}
+    for b in browsers:
+        if is_remote(b):
+            # Never ask a hub for more sessions than it can host, and start
+            # them all now rather than one per worker as tests begin.
+            caps[b] = min(caps[b], threads_for(b))
+            if coordinator is None:
+                remote_pool(b).prestart(caps[b])
+    # One controller for all browsers: host load is shared, and separate
+    # controllers would all back off (or grow) on the same readings.
+    controller = None
+    if concurrency is not None:
+        total = sum(caps.values())
+        controller = make_controller(
+            " + ".join(browsers),
+            (min(concurrency[0], total), min(concurrency[1], total)),
+            total,
+            lambda task: history.get(task[1][0], task[1][1], task[0]),
+        )
+    per_browser = [
+        [
+            (b, test) for test in schedule_by_history(
+                plugin_ids, history, b,
+                min(caps[b], controller.limit) if controller else caps[b],
+            )
+        ]
+        for b in browsers
+    ]
+    # Interleave the browsers' longest-first orders.
+    remaining = [
+        task
+        for tasks in itertools.zip_longest(*per_browser)
+        for task in tasks if task is not None
+    ]
+
+    def run(task: tuple) -> dict | list:
+        browser, test = task
+        r = runs[browser]
+        return run_test(
+            test, browser, root_url, is_single, batched, warm, r.screenshots,
+            r.leak_tracker,
+        )
 
-    remaining = plugin_ids.copy()
-
-    for try_idx in range(max_retries):
-        failed_this_round: list[tuple] = []
-        random.shuffle(remaining)
-
-        with ThreadPoolExecutor(max_workers=allowed_threads[browser]) as executor:
-            futures_map: dict = {}
-
-            while remaining or futures_map:
-                while remaining:
-                    test = remaining.pop()
-                    future = executor.submit(run_test, test, browser, root_url, is_single)
-                    futures_map[future] = test
-
-                for future in as_completed(futures_map):
-                    test = futures_map[future]
-                    try:
-                        result = future.result()
-
-                        if isinstance(result, list):
-                            # addTests: expand sub-tests into the queue.
-                            remaining = result + remaining
-                            continue
-
-                        print(
-                            f"{result['status'][:1].upper()}{result['status'][1:]}: "
-                            f"{result['test']} {result['error']}"
-                        )
-
-                        enriched = {**result, "try": try_idx + 1, "browser": browser}
-                        if result["status"] == "passed":
-                            passed_tests.append(enriched)
-                        else:
-                            failed_this_round.append(test)
-                            failed_tests.append(enriched)
-
-                    except Exception as e:
-                        label = (
-                            f"{test[0]}"
-                            f"{f' #{test[1] + 1}' if test[1] is not None else ''}"
-                        )
-                        print(f"Test {test} raised an exception: {e}")
-                        failed_this_round.append(test)
-                        failed_tests.append({
-                            "status": "failed",
-                            "test": label,
-                            "error": str(e),
-                            "try": try_idx + 1,
-                            "browser": browser,
-                        })
-                    finally:
-                        del futures_map[future]
-
-        quit_all_drivers(browser)
-
-        remaining = sorted(failed_this_round)
-        if not remaining:
-            break
-
-        ids_str = ", ".join(
-            i[0] if i[1] is None else f"{i[0]} #{i[1] + 1}"
-            for i in remaining
+    def retry_or_give_up(task: tuple) -> list:
+        if attempts[task] >= max_retries:
+            return []
+        browser, test = task
+        label = test[0] if test[1] is None else f"{test[0]} #{test[1] + 1}"
+        print(
+            f"Will retry {label} on {browser} "
+            f"(attempt {attempts[task] + 1}/{max_retries})"
         )
-        print(f"Will retry the following tests: {ids_str}")
+        return [Retry(task, backoff_delay(retry_backoff_secs, attempts[task]))]
+
+    def on_done(
+        task: tuple, result, error: Exception | None, elapsed: float,
+    ) -> list:
+        browser, test = task
+        r = runs[browser]
+        attempts[task] = attempts.get(task, 0) + 1
+        history.record(test[0], test[1], browser, elapsed)
+        try_num = attempts[task]
+
+        if error is not None:
+            label = (
+                f"{test[0]}"
+                f"{f' #{test[1] + 1}' if test[1] is not None else ''}"
+            )
+            print(f"Test {test} on {browser} raised an exception: {error}")
+            failure = {
+                "status": "failed",
+                "test": label,
+                "error": str(error),
+                "try": try_num,
+                "browser": browser,
+                "plugin_id": test[0],
+                "plugin_index": test[1],
+            }
+            failed_tests.append(failure)
+            store.record_result(r.run_id, test, failure, elapsed)
+            return retry_or_give_up(task)
+
+        if isinstance(result, list):
+            # addTests: fan the sub-tests out to idle workers right away.
+            return [(browser, sub_test) for sub_test in result]
+
+        print(
+            f"{result['status'][:1].upper()}{result['status'][1:]}: "
+            f"{result['test']} ({browser}) {result['error']}"
+        )
+
+        if "startup" in result:
+            r.startup_secs[result["startup"]].append(result["startup_secs"])
+        enriched = {
+            **result, "try": try_num, "browser": browser,
+            "plugin_id": test[0], "plugin_index": test[1],
+        }
+        if result.get("perf"):
+            deltas, regressions = perf_baseline.compare(
+                browser, result["test"], result["perf"], perf_threshold
+            )
+            enriched["perf_deltas"] = deltas
+            enriched["perf_regressions"] = [] if update_perf_baseline else regressions
+            if update_perf_baseline:
+                perf_baseline.update(browser, result["test"], result["perf"])
+            for regression in enriched["perf_regressions"]:
+                print(
+                    f"Performance regression in {result['test']} ({browser}): "
+                    f"{regression}"
+                )
+        store.record_result(r.run_id, test, enriched, elapsed)
+        if result["status"] == "passed":
+            passed_tests.append(enriched)
+            return []
+        failed_tests.append(enriched)
+        return retry_or_give_up(task)
+
+    if coordinator is not None:
+        stats = serve_work_queue(
+            remaining, on_done, root_url, *coordinator, token=coordinator_token
+        )
+    else:
+        stats = run_work_queue(
+            remaining, run, on_done, sum(caps.values()), controller,
+            group_of=lambda task: task[0], group_limits=caps,
+            trim=trim_idle_drivers,
+        )
+    for r in runs.values():
+        r.finish()
+    history.save()
+    perf_baseline.save()
+    if result_store is None:
+        store.close()
+    print_queue_stats(stats, label=" + ".join(browsers))
+    print_session_latency()
+    print_rule_hits()
 
     return passed_tests, failed_tests
 
 
+def final_failures(passed_tests: list[dict], failed_tests: list[dict]) -> list[dict]:
+    """Failed attempts of tests that never passed, one (the last) per test."""
+    passed = {(r["plugin_id"], r["plugin_index"], r["browser"]) for r in passed_tests}
+    return list({
+        (r["plugin_id"], r["plugin_index"], r["browser"]): r
+        for r in failed_tests
+        if (r["plugin_id"], r["plugin_index"], r["browser"]) not in passed
+    }.values())
+
+
+def save_report(
+    path: str,
+    passed_tests: list[dict],
+    failed_tests: list[dict],
+    root_url: str,
+    shard: tuple[int, int] | None = None,
+) -> None:
+    """Write a suite's results as JSON, for tooling and later merging.
+
+    Args:
+        path: Output file.
+        passed_tests: Passed results, as returned by the suite.
+        failed_tests: Failed results, as returned by the suite.
+        root_url: Root URL that was tested.
+        shard: (i, N) when this run was shard i of N.
+    """
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "root_url": root_url,
+                "shard": list(shard) if shard else None,
+                "passed": passed_tests,
+                "failed": failed_tests,
+            },
+            f, indent=1,
+        )
+
+
+def merge_reports(paths: list[str]) -> tuple[list[dict], list[dict], str]:
+    """Combine reports written by save_report (e.g. one per shard).
+
+    Warns about shards missing from a sharded set, and about reports for
+    different root URLs.
+
+    Returns:
+        (passed_tests, failed_tests, root_url) over all reports.
+
+    Raises:
+        OSError, ValueError: A report can't be read.
+    """
+    passed: list[dict] = []
+    failed: list[dict] = []
+    root_urls: list[str] = []
+    shards: dict[int, set[int]] = {}
+    for path in paths:
+        with open(path) as f:
+            report = json.load(f)
+        passed.extend(report["passed"])
+        failed.extend(report["failed"])
+        root_urls.append(report["root_url"])
+        if report.get("shard"):
+            index, count = report["shard"]
+            shards.setdefault(count, set()).add(index)
+
+    if len(set(root_urls)) > 1:
+        print(f"Warning: merging reports for different URLs: {sorted(set(root_urls))}")
+    for count, seen in shards.items():
+        missing = sorted(set(range(1, count + 1)) - seen)
+        if missing:
+            print(
+                f"Warning: missing shard(s) {', '.join(map(str, missing))} "
+                f"of {count}"
+            )
+    return passed, failed, root_urls[0] if root_urls else ""
+
+
+def print_startup_benchmark(startup_secs: dict[str, list[float]], label: str) -> None:
+    """Print mean/median time-to-commands for cold and warm test starts."""
+    for mode in ("cold", "warm"):
+        samples = sorted(startup_secs.get(mode, []))
+        if not samples:
+            continue
+        mean = sum(samples) / len(samples)
+        median = samples[len(samples) // 2]
+        print(
+            f"{label} {mode} startup: mean {mean:.2f}s, median {median:.2f}s "
+            f"over {len(samples)} test(s)"
+        )
+
+
 def print_report(
     passed_tests: list[dict],
     failed_tests: list[dict],
     root_url: str,
 ):
-    """Print a human-readable summary of test results."""
+    """Print a human-readable summary of test results, including each
+    passing test's performance metrics and regressions, then the time spent
+    in each traced phase."""
     print("\nTests that passed:")
     for r in passed_tests:
         print(f"   {r['test']}-{r['browser']} (try {r['try']})")
+        if r.get("perf"):
+            print(f"      {format_perf(r['perf'], r.get('perf_deltas', {}))}")
+
+    regressed = [r for r in passed_tests if r.get("perf_regressions")]
+    if regressed:
+        print("\nPerformance regressions:")
+        for r in regressed:
+            for regression in r["perf_regressions"]:
+                print(f"   {r['test']}-{r['browser']}: {regression}")
 
     print("\nTests that failed:")
     unique_failed = {f"{t['test']}-{t['browser']}": t for t in failed_tests}.values()
@@ -145,3 +483,5 @@ def print_report(
                 run_again_parts.append(f"{name}({indices_str})")
 
         print(f" RUN AGAIN (FAILED)?: {' '.join(run_again_parts)}")
+
+    print_phase_summary()
@@ -0,0 +1,229 @@
+"""
+Per-test in-app performance metrics, compared against a stored baseline.
+
+After each plugin test on Chrome the harness records:
+
+* CDP ``Performance.getMetrics``: JSHeapUsedSize (at the end of the test)
+  and ScriptDuration, LayoutDuration and TaskDuration (seconds spent
+  during the test),
+* long tasks (count and total ms) from an injected PerformanceObserver,
+* navigation timing (DOMContentLoaded and load, in ms) when the test
+  started with a fresh page load.
+
+Samples are compared with ``perf_baseline.json``.  A metric regresses when
+it exceeds its baseline by more than the threshold fraction *and* by more
+than a small absolute floor (so near-zero metrics don't flap); regressions
+fail the run.  ``--update-perf-baseline`` on run_tests.py stores the
+current samples as the new baseline.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from typing import Any
+
+# Where the baseline is stored, relative to the repo root.
+PERF_BASELINE_PATH = "./perf_baseline.json"
+
+# Fractional increase over the baseline that counts as a regression.
+REGRESSION_THRESHOLD = 0.25
+
+# CDP metrics kept; all but JSHeapUsedSize are cumulative and reported as
+# the increase over the test.
+CDP_METRICS = ("JSHeapUsedSize", "ScriptDuration", "LayoutDuration", "TaskDuration")
+
+# Increases smaller than this never count as regressions.
+MIN_INCREASE = {
+    "JSHeapUsedSize": 2_000_000,
+    "ScriptDuration": 0.05,
+    "LayoutDuration": 0.05,
+    "TaskDuration": 0.1,
+    "long_tasks": 2,
+    "long_task_ms": 100,
+    "dom_content_loaded_ms": 100,
+    "load_ms": 100,
+}
+
+# Installs the long-task counter (idempotently; buffered so tasks during
+# the page load count too) and returns the running totals plus navigation
+# timing.
+_SAMPLE_JS = r"""
+if (!window.__molmodaLongTasks) {
+    const c = window.__molmodaLongTasks = {count: 0, ms: 0};
+    try {
+        new PerformanceObserver(list => {
+            for (const e of list.getEntries()) { c.count++; c.ms += e.duration; }
+        }).observe({type: 'longtask', buffered: true});
+    } catch (e) { /* longtask unsupported */ }
+}
+const nav = performance.getEntriesByType('navigation')[0];
+return {
+    long_tasks: window.__molmodaLongTasks.count,
+    long_task_ms: window.__molmodaLongTasks.ms,
+    dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd : null,
+    load_ms: nav ? nav.loadEventEnd : null,
+};
+"""
+
+_enabled: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def cdp_metrics(driver: Any) -> dict[str, float]:
+    """Current CDP_METRICS of a Chrome driver's page, by name."""
+    if driver not in _enabled:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        _enabled.add(driver)
+    metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    return {m["name"]: m["value"] for m in metrics if m["name"] in CDP_METRICS}
+
+
+def _sample(driver: Any) -> dict[str, float]:
+    sample = cdp_metrics(driver)
+    sample.update(driver.execute_script(_SAMPLE_JS))
+    return sample
+
+
+def start_perf_sample(driver: Any, browser: str) -> dict[str, float] | None:
+    """Snapshot the counters at the start of a test (Chrome only).
+
+    Returns:
+        The snapshot, or None when the browser has no CDP or sampling fails.
+    """
+    if not browser.startswith("chrome"):
+        return None
+    try:
+        return _sample(driver)
+    except Exception as e:
+        print(f"Could not sample performance metrics: {e}")
+        return None
+
+
+def finish_perf_sample(
+    driver: Any, start: dict[str, float] | None, navigated: bool,
+) -> dict[str, float] | None:
+    """Return the test's metrics, given the snapshot from its start.
+
+    Args:
+        driver: The driver the test ran on.
+        start: Result of start_perf_sample (None skips sampling).
+        navigated: Whether the test began with a page load, i.e. whether
+            navigation timing belongs to it.
+    """
+    if start is None:
+        return None
+    try:
+        end = _sample(driver)
+    except Exception as e:
+        print(f"Could not sample performance metrics: {e}")
+        return None
+    perf = {"JSHeapUsedSize": end.get("JSHeapUsedSize", 0.0)}
+    for name in ("ScriptDuration", "LayoutDuration", "TaskDuration",
+                 "long_tasks", "long_task_ms"):
+        perf[name] = end.get(name, 0.0) - start.get(name, 0.0)
+    if navigated:
+        for name in ("dom_content_loaded_ms", "load_ms"):
+            if end.get(name) is not None:
+                perf[name] = end[name]
+    return perf
+
+
+class PerfBaseline:
+    """Baseline metrics per browser and test, stored as JSON.
+
+    File layout: ``{browser: {test: {metric: value}}}``.
+    """
+
+    def __init__(self, path: str = PERF_BASELINE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._updates: dict[str, dict[str, dict[str, float]]] = {}
+        try:
+            with open(path) as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+
+    def get(self, browser: str, test: str) -> dict[str, float] | None:
+        """Baseline metrics for a test, or None if it has none."""
+        return self._data.get(browser, {}).get(test)
+
+    def compare(
+        self,
+        browser: str,
+        test: str,
+        perf: dict[str, float],
+        threshold: float = REGRESSION_THRESHOLD,
+    ) -> tuple[dict[str, float], list[str]]:
+        """Compare a sample with the baseline.
+
+        Returns:
+            (fractional delta per metric with a baseline, descriptions of
+            the metrics that regressed).
+        """
+        base = self.get(browser, test) or {}
+        deltas: dict[str, float] = {}
+        regressions: list[str] = []
+        for name, value in perf.items():
+            if name not in base:
+                continue
+            old = base[name]
+            deltas[name] = (value - old) / old if old else 0.0
+            if value - old > MIN_INCREASE.get(name, 0) and value > old * (1 + threshold):
+                regressions.append(
+                    f"{name} {_fmt(name, value)} vs baseline {_fmt(name, old)} "
+                    f"(+{deltas[name] * 100:.0f}%)" if old else
+                    f"{name} {_fmt(name, value)} vs baseline 0"
+                )
+        return deltas, regressions
+
+    def update(self, browser: str, test: str, perf: dict[str, float]) -> None:
+        """Stage a sample to become the test's baseline on save()."""
+        with self._lock:
+            self._updates.setdefault(browser, {})[test] = perf
+
+    def save(self) -> None:
+        """Merge staged samples into the baseline file atomically."""
+        with self._lock:
+            if not self._updates:
+                return
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            for browser, tests in self._updates.items():
+                data.setdefault(browser, {}).update(tests)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, indent=2, sort_keys=True)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"Could not save performance baseline {self.path}: {e}")
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+            self._data = data
+            self._updates = {}
+
+
+def _fmt(name: str, value: float) -> str:
+    if name == "JSHeapUsedSize":
+        return f"{value / 1e6:.1f} MB"
+    if name.endswith("Duration"):
+        return f"{value:.2f}s"
+    if name.endswith("_ms"):
+        return f"{value:.0f} ms"
+    return f"{value:.0f}"
+
+
+def format_perf(perf: dict[str, float], deltas: dict[str, float]) -> str:
+    """One-line summary of a test's metrics, with deltas where known."""
+    parts = []
+    for name, value in perf.items():
+        delta = f" ({deltas[name] * 100:+.0f}%)" if name in deltas else ""
+        parts.append(f"{name} {_fmt(name, value)}{delta}")
+    return ", ".join(parts)
@@ -0,0 +1,332 @@
+"""
+Persistent SQLite store for test, tour and docs-capture results.
+
+Every suite run gets a row in ``runs`` (root URL, browser, git revision)
+and every attempt of every test a row in ``results``, with per-command
+timings in ``command_timings`` and in-app performance metrics in
+``perf_metrics`` when the runner reports them.  The history
+feeds the query helpers at the bottom of this module (slowest tests,
+flakiest tests, duration trend), exposed on the command line by
+``scripts/query_results.py``.
+
+Writes come from the orchestrators' callbacks and are handed to a single
+background writer thread, which commits them in batches.  The database
+uses WAL mode so readers (e.g. the query CLI during a run) never block the
+writer.
+"""
+
+import contextlib
+import queue
+import sqlite3
+import subprocess
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, TypedDict
+
+# Where results are stored, relative to the repo root.
+RESULTS_DB_PATH = "./test_results.sqlite"
+
+# Writer flushes once this many rows are queued, or after FLUSH_SECS.
+BATCH_SIZE = 50
+FLUSH_SECS = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    root_url TEXT NOT NULL,
+    browser TEXT NOT NULL,
+    git_rev TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs(id),
+    plugin_id TEXT NOT NULL,
+    plugin_index INTEGER,
+    test TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    error TEXT,
+    duration_secs REAL,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS command_timings (
+    result_id INTEGER NOT NULL REFERENCES results(id),
+    cmd_index INTEGER NOT NULL,
+    cmd TEXT NOT NULL,
+    selector TEXT,
+    duration_secs REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS perf_metrics (
+    result_id INTEGER NOT NULL REFERENCES results(id),
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_plugin ON results(plugin_id, plugin_index);
+CREATE INDEX IF NOT EXISTS results_run ON results(run_id);
+"""
+
+# A result's test label rebuilt from its id (see test_label), so reports
+# group older rows, whose label depends on the outcome, correctly too.
+_TEST_LABEL_SQL = "r.plugin_id || COALESCE('.' || r.plugin_index, '')"
+
+
+class ICommandTiming(TypedDict):
+    """Wall time of one dispatched test command, as reported by run_test."""
+    cmd: str
+    selector: str
+    secs: float
+
+
+def test_label(plugin_id: str, plugin_index: int | None) -> str:
+    """A test's stored label, as run_test names it ("X" or "X.n")."""
+    return plugin_id if plugin_index is None else f"{plugin_id}.{plugin_index}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _git_revision() -> str | None:
+    """Return the short git revision of the working tree, if available."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def connect(path: str = RESULTS_DB_PATH) -> sqlite3.Connection:
+    """Open the results database in WAL mode, creating tables if needed."""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class ResultStore:
+    """Batched, thread-safe writer for one or more suite runs.
+
+    ``start_run`` and ``record_result`` may be called from any thread; they
+    only enqueue work.  Call ``close`` once the suite is done to flush the
+    remaining rows and stamp the runs' finish times.
+    """
+
+    def __init__(self, path: str = RESULTS_DB_PATH):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self._run_ids: list[str] = []
+        self._writer = threading.Thread(
+            target=self._write_loop, name="result-store-writer", daemon=True
+        )
+        self._writer.start()
+
+    def start_run(self, kind: str, root_url: str, browser: str) -> str:
+        """Register a new run and return its id.
+
+        Args:
+            kind: Suite kind ("test", "tour" or "docs").
+            root_url: Root URL being tested.
+            browser: Browser string.
+
+        Returns:
+            The new run's id, to pass to ``record_result``.
+        """
+        run_id = uuid.uuid4().hex
+        self._run_ids.append(run_id)
+        self._queue.put((
+            "INSERT INTO runs (id, kind, root_url, browser, git_rev, started_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, kind, root_url, browser, _git_revision(), _now()),
+            None,
+            None,
+        ))
+        return run_id
+
+    def record_result(
+        self,
+        run_id: str,
+        test_id: tuple[str, int | None],
+        result: dict,
+        duration_secs: float | None,
+    ) -> None:
+        """Queue one attempt's outcome for writing.
+
+        Args:
+            run_id: Id returned by ``start_run``.
+            test_id: The (plugin_id, index) pair that ran.
+            result: Enriched result dict (status, test, error, try, and
+                optionally cmd_timings and perf).
+            duration_secs: Wall time of the attempt.
+        """
+        # Failures are reported as "X #n+1" and passes as "X.n", so the
+        # label is rebuilt from the test id to keep one name per test.
+        self._queue.put((
+            "INSERT INTO results (run_id, plugin_id, plugin_index, test, "
+            "status, attempt, error, duration_secs, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id, test_id[0], test_id[1], test_label(*test_id),
+                result["status"], int(result["try"]), result.get("error", ""),
+                duration_secs, _now(),
+            ),
+            result.get("cmd_timings"),
+            result.get("perf"),
+        ))
+
+    def close(self) -> None:
+        """Stamp finish times, flush everything and stop the writer."""
+        finished = _now()
+        for run_id in self._run_ids:
+            self._queue.put((
+                "UPDATE runs SET finished_at = ? WHERE id = ?",
+                (finished, run_id),
+                None,
+                None,
+            ))
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self) -> None:
+        """Drain the queue in batches, one transaction per batch."""
+        try:
+            conn = connect(self.path)
+        except sqlite3.Error as e:
+            print(f"Could not open result store {self.path}: {e}")
+            # Keep draining so producers and close() never block.
+            while self._queue.get() is not None:
+                pass
+            return
+
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=FLUSH_SECS))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            try:
+                with conn:
+                    for sql, params, cmd_timings, perf in batch:
+                        cur = conn.execute(sql, params)
+                        if cmd_timings:
+                            conn.executemany(
+                                "INSERT INTO command_timings (result_id, "
+                                "cmd_index, cmd, selector, duration_secs) "
+                                "VALUES (?, ?, ?, ?, ?)",
+                                [
+                                    (cur.lastrowid, i, t["cmd"], t["selector"], t["secs"])
+                                    for i, t in enumerate(cmd_timings)
+                                ],
+                            )
+                        if perf:
+                            conn.executemany(
+                                "INSERT INTO perf_metrics (result_id, metric, value) "
+                                "VALUES (?, ?, ?)",
+                                [(cur.lastrowid, k, v) for k, v in perf.items()],
+                            )
+            except sqlite3.Error as e:
+                print(f"Could not write {len(batch)} row(s) to result store: {e}")
+        with contextlib.suppress(sqlite3.Error):
+            conn.close()
+
+
+def slowest_tests(
+    conn: sqlite3.Connection,
+    limit: int = 20,
+    kind: str = "test",
+    browser: str | None = None,
+) -> list[tuple[Any, ...]]:
+    """Tests with the highest average duration across passing attempts.
+
+    Returns:
+        Rows of (test, browser, runs, avg_secs, max_secs).
+    """
+    return conn.execute(
+        f"""
+        SELECT {_TEST_LABEL_SQL}, u.browser, COUNT(*), AVG(r.duration_secs),
+               MAX(r.duration_secs)
+        FROM results r JOIN runs u ON u.id = r.run_id
+        WHERE u.kind = ? AND r.status = 'passed'
+              AND (? IS NULL OR u.browser = ?)
+        GROUP BY r.plugin_id, r.plugin_index, u.browser
+        ORDER BY AVG(r.duration_secs) DESC
+        LIMIT ?
+        """,
+        (kind, browser, browser, limit),
+    ).fetchall()
+
+
+def flakiest_tests(
+    conn: sqlite3.Connection,
+    limit: int = 20,
+    kind: str = "test",
+    browser: str | None = None,
+) -> list[tuple[Any, ...]]:
+    """Tests that most often needed a retry or failed within a run.
+
+    A test counts as flaky in a run when at least one of its attempts
+    failed; ``flake_rate`` is the share of its runs where that happened,
+    and ``passed_eventually`` how many of those runs still ended passing.
+
+    Returns:
+        Rows of (test, browser, runs, flaky_runs, passed_eventually,
+        flake_rate).
+    """
+    return conn.execute(
+        f"""
+        WITH per_run AS (
+            SELECT {_TEST_LABEL_SQL} AS test, u.browser, r.run_id,
+                   SUM(r.status != 'passed') AS failures,
+                   SUM(r.status = 'passed') AS passes
+            FROM results r JOIN runs u ON u.id = r.run_id
+            WHERE u.kind = ? AND (? IS NULL OR u.browser = ?)
+            GROUP BY r.plugin_id, r.plugin_index, u.browser, r.run_id
+        )
+        SELECT test, browser, COUNT(*),
+               SUM(failures > 0),
+               SUM(failures > 0 AND passes > 0),
+               1.0 * SUM(failures > 0) / COUNT(*) AS flake_rate
+        FROM per_run
+        GROUP BY test, browser
+        HAVING SUM(failures > 0) > 0
+        ORDER BY flake_rate DESC, SUM(failures > 0) DESC
+        LIMIT ?
+        """,
+        (kind, browser, browser, limit),
+    ).fetchall()
+
+
+def duration_trend(
+    conn: sqlite3.Connection,
+    plugin_id: str,
+    kind: str = "test",
+    browser: str | None = None,
+) -> list[tuple[Any, ...]]:
+    """Per-run durations of one plugin's passing attempts, oldest first.
+
+    Returns:
+        Rows of (started_at, git_rev, browser, test, duration_secs).
+    """
+    return conn.execute(
+        f"""
+        SELECT u.started_at, u.git_rev, u.browser, {_TEST_LABEL_SQL},
+               r.duration_secs
+        FROM results r JOIN runs u ON u.id = r.run_id
+        WHERE u.kind = ? AND r.plugin_id = ? AND r.status = 'passed'
+              AND (? IS NULL OR u.browser = ?)
+        ORDER BY u.started_at, r.plugin_index
+        """,
+        (kind, plugin_id, browser, browser),
+    ).fetchall()
@@ -0,0 +1,206 @@
+"""
+Asynchronous screenshot pipeline for run_test.
+
+``driver.save_screenshot`` makes the worker decode the browser's base64
+PNG and write it to disk before it can dispatch the next command.  Here
+the worker only pays for the capture itself (``get_screenshot_as_base64``);
+decoding and writing happen on a small pool of background writer threads.
+The hand-off queue is bounded: when the writers fall behind, ``capture``
+blocks until a slot frees up, so memory stays bounded and the time lost
+to backpressure shows up in the stats.
+
+Frames go to the content-addressed artifact store (see artifact_store.py):
+a frame identical to one already stored costs neither a decode nor a
+write, only a manifest entry.
+
+What gets captured is set by a policy (see parse_policy):
+
+* ``full``: every frame, as run_test always did.
+* ``every:N``: every Nth frame, plus one at the point of failure.
+* ``ring:K``: the last K frames are kept in memory per test and written
+  (with one at the point of failure) only if the test fails.
+* ``off``: nothing.
+"""
+
+import contextlib
+import queue
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from .artifact_store import RunManifest
+
+# Background threads decoding and writing PNGs.
+WRITER_THREADS = 2
+
+# Captured frames that may wait for a writer before capture() blocks.
+MAX_PENDING = 16
+
+
+class ScreenshotPolicy(NamedTuple):
+    """Which frames to keep; ``n`` is N for every:N and K for ring:K."""
+    mode: str
+    n: int = 0
+
+    def __str__(self) -> str:
+        return self.mode if self.mode in ("off", "full") else f"{self.mode}:{self.n}"
+
+
+def parse_policy(spec: str) -> ScreenshotPolicy:
+    """Parse "off", "full", "every:N" or "ring:K".
+
+    Raises:
+        ValueError: The spec is not one of the above (with N, K >= 1).
+    """
+    mode, _, n = spec.partition(":")
+    if mode in ("off", "full") and not n:
+        return ScreenshotPolicy(mode)
+    if mode in ("every", "ring") and n.isdigit() and int(n) >= 1:
+        return ScreenshotPolicy(mode, int(n))
+    raise ValueError(
+        f"Invalid screenshot policy {spec!r}; expected off, full, every:N or ring:K."
+    )
+
+
+class ScreenshotPipeline:
+    """Bounded background writer for screenshots, shared by all workers.
+
+    Tests capture through a per-attempt ``session``, which applies the
+    policy; ``capture`` may be called from any worker thread.  Call
+    ``close`` once the suite is done to finish pending writes and save the
+    run's manifest.
+    """
+
+    def __init__(
+        self,
+        manifest: RunManifest,
+        policy: ScreenshotPolicy = ScreenshotPolicy("full"),
+        threads: int = WRITER_THREADS,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.manifest = manifest
+        self.policy = policy
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.capture_secs = 0.0
+        self.blocked_secs = 0.0
+        self.write_secs = 0.0
+        self.bytes_written = 0
+        self.duplicates = 0
+        self._writers = [
+            threading.Thread(
+                target=self._write_loop, name=f"screenshot-writer-{i}", daemon=True
+            )
+            for i in range(threads)
+        ]
+        for writer in self._writers:
+            writer.start()
+
+    def session(self, test: str) -> "ScreenshotSession":
+        """Start capturing one attempt of ``test``, replacing earlier ones."""
+        return ScreenshotSession(self, test, self.manifest.reset_test(test))
+
+    def grab(self, driver) -> str:
+        """Capture the viewport as base64 PNG, counting the time it took."""
+        start = time.monotonic()
+        data = driver.get_screenshot_as_base64()
+        with self._lock:
+            self.frames += 1
+            self.capture_secs += time.monotonic() - start
+        return data
+
+    def write(self, test: str, attempt: int, frame: str, data: str) -> None:
+        """Queue a captured frame to be stored; blocks while the queue is full."""
+        start = time.monotonic()
+        self._queue.put((test, attempt, frame, data))
+        with self._lock:
+            self.blocked_secs += time.monotonic() - start
+
+    def capture(self, driver, test: str, attempt: int, frame: str) -> None:
+        """Grab the viewport and queue it as ``test``'s frame ``frame``."""
+        self.write(test, attempt, frame, self.grab(driver))
+
+    def close(self) -> None:
+        """Write pending frames, stop the writer threads, save the manifest."""
+        for _ in self._writers:
+            self._queue.put(None)
+        for writer in self._writers:
+            writer.join()
+        try:
+            self.manifest.close()
+        except OSError as e:
+            print(f"Could not save screenshot manifest {self.manifest.path}: {e}")
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                test, attempt, frame, data = item
+                start = time.monotonic()
+                digest, written = self.manifest.store.put_base64(data)
+                self.manifest.add(test, frame, digest, attempt)
+                with self._lock:
+                    self.write_secs += time.monotonic() - start
+                    self.bytes_written += written
+                    self.duplicates += written == 0
+            except (OSError, ValueError) as e:
+                print(f"Could not store screenshot {item[0]} #{item[2]}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class ScreenshotSession:
+    """One test attempt's frames, filtered by the pipeline's policy."""
+
+    def __init__(self, pipeline: ScreenshotPipeline, test: str, attempt: int):
+        self._pipeline = pipeline
+        self._test = test
+        self._attempt = attempt
+        policy = pipeline.policy
+        self._ring: deque | None = (
+            deque(maxlen=policy.n) if policy.mode == "ring" else None
+        )
+
+    def capture(self, driver, idx: int) -> None:
+        """Take frame ``idx`` if the policy keeps it."""
+        policy = self._pipeline.policy
+        if policy.mode == "full" or (policy.mode == "every" and idx % policy.n == 0):
+            self._pipeline.capture(driver, self._test, self._attempt, str(idx))
+        elif self._ring is not None:
+            self._ring.append(
+                (self._test, self._attempt, str(idx), self._pipeline.grab(driver))
+            )
+
+    def fail(self, driver) -> None:
+        """Write what the policy keeps for a failed attempt.
+
+        For ring and every modes that is the buffered frames plus one of
+        the page as it was when the test failed.
+        """
+        policy = self._pipeline.policy
+        if policy.mode not in ("ring", "every"):
+            return
+        while self._ring:
+            self._pipeline.write(*self._ring.popleft())
+        with contextlib.suppress(Exception):
+            self._pipeline.capture(driver, self._test, self._attempt, "failure")
+
+
+def print_screenshot_stats(pipeline: ScreenshotPipeline, label: str) -> None:
+    """Print how much the suite's screenshots cost."""
+    if pipeline.frames == 0:
+        print(f"{label} screenshots ({pipeline.policy}): none captured")
+        return
+    per_frame = pipeline.capture_secs / pipeline.frames * 1000
+    print(
+        f"{label} screenshots ({pipeline.policy}): {pipeline.frames} frames, "
+        f"{pipeline.duplicates} already stored, "
+        f"{pipeline.bytes_written / 1e6:.1f} MB written in {pipeline.write_secs:.1f}s, "
+        f"{pipeline.capture_secs:.1f}s capturing ({per_frame:.0f} ms/frame), "
+        f"{pipeline.blocked_secs:.1f}s waiting on writers"
+    )
+    print(f"   Manifest: {pipeline.manifest.path}")
@@ -0,0 +1,319 @@
+"""
+Historical per-test wall times and duration-aware (LPT) scheduling.
+
+Each orchestrator records how long every (plugin_id, index, browser) took
+and saves it to a small JSON file.  On the next run the queue is ordered
+longest-first, so a multi-minute docking test starts at the beginning of
+the run instead of setting its end time.  Tests with no history are
+slotted in at the median known duration, in random order among
+themselves.  The same estimates split a suite into balanced shards for
+running on several machines (see shard_plugin_ids).
+"""
+
+import contextlib
+import heapq
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Callable
+
+# Where timing history is stored, relative to the repo root (the same
+# working directory the scripts already assume for ./src and ./screenshots).
+TIMINGS_PATH = "./test_timings.json"
+
+# Weight given to the newest sample when updating a stored duration.  A
+# moving average keeps one unusually slow or fast run from reordering the
+# whole suite.
+SMOOTHING = 0.5
+
+# Duration assumed for unseen tests when nothing at all is known yet.
+DEFAULT_DURATION_SECS = 30.0
+
+
+def _key(plugin_id: str, index: int | None) -> str:
+    """Serialise a (plugin_id, index) pair as a JSON object key."""
+    return plugin_id if index is None else f"{plugin_id}.{index}"
+
+
+class TimingHistory:
+    """Thread-safe store of smoothed wall times for one kind of suite.
+
+    ``kind`` namespaces the file ("test", "tour", "docs") because the same
+    plugin takes very different amounts of time to test, tour and capture.
+    """
+
+    def __init__(self, kind: str, path: str = TIMINGS_PATH):
+        self.kind = kind
+        self.path = path
+        self._lock = threading.Lock()
+        self._all = self._load()
+        self._data: dict[str, dict[str, float]] = self._all.setdefault(kind, {})
+
+    def _load(self) -> dict[str, Any]:
+        """Read the history file, returning an empty history if unusable."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, plugin_id: str, index: int | None, browser: str) -> float | None:
+        """Return the stored duration for one test, or None if never seen."""
+        with self._lock:
+            return self._data.get(browser, {}).get(_key(plugin_id, index))
+
+    def sub_test_indices(self, plugin_id: str, browser: str) -> list[int]:
+        """Return the sub-test indices seen for a plugin that uses addTests."""
+        prefix = f"{plugin_id}."
+        with self._lock:
+            keys = list(self._data.get(browser, {}))
+        indices = []
+        for k in keys:
+            if k.startswith(prefix):
+                with contextlib.suppress(ValueError):
+                    indices.append(int(k[len(prefix):]))
+        return sorted(indices)
+
+    def estimate(self, plugin_id: str, index: int | None, browser: str) -> float | None:
+        """Total expected work for a queued test, or None if never seen.
+
+        For an un-indexed plugin that fans out via addTests, the estimate
+        includes every known sub-test, since queuing it implies queuing
+        them too.
+        """
+        own = self.get(plugin_id, index, browser)
+        if own is None or index is not None:
+            return own
+        return own + sum(
+            self.get(plugin_id, i, browser) or 0.0
+            for i in self.sub_test_indices(plugin_id, browser)
+        )
+
+    def known_durations(self, browser: str) -> list[float]:
+        """All stored durations for a browser."""
+        with self._lock:
+            return list(self._data.get(browser, {}).values())
+
+    def record(
+        self, plugin_id: str, index: int | None, browser: str, secs: float,
+    ) -> None:
+        """Fold a new wall-time sample into the history."""
+        key = _key(plugin_id, index)
+        with self._lock:
+            per_browser = self._data.setdefault(browser, {})
+            old = per_browser.get(key)
+            per_browser[key] = (
+                secs if old is None else SMOOTHING * secs + (1 - SMOOTHING) * old
+            )
+
+    def save(self) -> None:
+        """Merge this suite's timings into the file on disk, atomically.
+
+        Other kinds (and other browsers) written by earlier runs are kept.
+        """
+        with self._lock:
+            on_disk = self._load()
+            merged = on_disk.setdefault(self.kind, {})
+            for browser, entries in self._data.items():
+                merged.setdefault(browser, {}).update(entries)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(on_disk, f, indent=2, sort_keys=True)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"Could not save test timings to {self.path}: {e}")
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+
+
+def order_longest_first(
+    tasks: list[Any],
+    estimate: Callable[[Any], float | None],
+    fallback_secs: float,
+) -> list[Any]:
+    """Order tasks longest-processing-time first.
+
+    Unseen tasks (``estimate`` returns None) are placed as if they took
+    ``fallback_secs``; they are shuffled first so ties among them, and
+    among each other, are broken randomly.
+
+    Args:
+        tasks: Tasks to order.  Not modified.
+        estimate: Returns the expected duration of a task, or None.
+        fallback_secs: Duration assumed for unseen tasks.
+
+    Returns:
+        A new list in the order the tasks should be started.
+    """
+    shuffled = tasks.copy()
+    random.shuffle(shuffled)
+    # sort() is stable, so the shuffle decides the order within ties.
+    shuffled.sort(
+        key=lambda t: e if (e := estimate(t)) is not None else fallback_secs,
+        reverse=True,
+    )
+    return shuffled
+
+
+def simulate_makespan(
+    tasks: list[Any],
+    estimate: Callable[[Any], float],
+    sub_tasks: Callable[[Any], list[Any]],
+    workers: int,
+) -> float:
+    """Estimate wall time by replaying the queue on ``workers`` simulated slots.
+
+    Mirrors ``run_work_queue``: tasks start in order on the earliest free
+    slot, and sub-tasks (known addTests fan-out) become available when
+    their parent finishes and jump to the front of the queue.
+
+    Args:
+        tasks: Tasks in the order they will be started.
+        estimate: Expected duration of a single task (excluding sub-tasks).
+        sub_tasks: Follow-up tasks a task is expected to spawn.
+        workers: Number of worker slots.
+
+    Returns:
+        Simulated seconds from the first start to the last finish.
+    """
+    free_at = [0.0] * max(workers, 1)
+    heapq.heapify(free_at)
+    pending: deque = deque((t, 0.0) for t in tasks)
+    makespan = 0.0
+    while pending:
+        slot_free = heapq.heappop(free_at)
+        # Prefer the first task that's already available; otherwise idle
+        # until the earliest one is released.
+        pick = next(
+            (i for i, (_, ready) in enumerate(pending) if ready <= slot_free),
+            min(range(len(pending)), key=lambda i: pending[i][1]),
+        )
+        task, ready = pending[pick]
+        del pending[pick]
+        finish = max(slot_free, ready) + estimate(task)
+        makespan = max(makespan, finish)
+        heapq.heappush(free_at, finish)
+        pending.extendleft((s, finish) for s in reversed(sub_tasks(task)))
+    return makespan
+
+
+def schedule_by_history(
+    plugin_ids: list[tuple[str, int | None]],
+    history: TimingHistory,
+    browser: str,
+    workers: int,
+) -> list[tuple[str, int | None]]:
+    """Order a suite longest-first and print the simulated makespan.
+
+    Args:
+        plugin_ids: (plugin_id, index) pairs to run.
+        history: Timing history for this kind of suite.
+        browser: Browser the suite runs on.
+        workers: Number of parallel worker slots.
+
+    Returns:
+        The pairs in the order they should be queued.
+    """
+    known = history.known_durations(browser)
+    fallback = statistics.median(known) if known else DEFAULT_DURATION_SECS
+
+    ordered = order_longest_first(
+        plugin_ids,
+        lambda t: history.estimate(t[0], t[1], browser),
+        fallback,
+    )
+
+    def own_estimate(t: tuple[str, int | None]) -> float:
+        secs = history.get(t[0], t[1], browser)
+        return fallback if secs is None else secs
+
+    def sub_tasks(t: tuple[str, int | None]) -> list[tuple[str, int | None]]:
+        if t[1] is not None:
+            return []
+        return [(t[0], i) for i in history.sub_test_indices(t[0], browser)]
+
+    unseen = sum(1 for t in plugin_ids if history.get(t[0], t[1], browser) is None)
+    makespan = simulate_makespan(ordered, own_estimate, sub_tasks, workers)
+    print(
+        f"Estimated makespan for {browser}: {makespan / 60:.1f} min on "
+        f"{workers} worker(s) ({len(plugin_ids) - unseen} with history, "
+        f"{unseen} unseen at {fallback:.0f}s each)"
+    )
+    return ordered
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parse an "i/N" shard spec (1-based i).
+
+    Raises:
+        ValueError: The spec is malformed or i is not in 1..N.
+    """
+    index, _, count = spec.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}; expected i/N.") from None
+    if not 1 <= shard[0] <= shard[1]:
+        raise ValueError(f"Invalid shard {spec!r}; i must be between 1 and N.")
+    return shard
+
+
+def shard_plugin_ids(
+    plugin_ids: list[tuple[str, int | None]],
+    history: TimingHistory,
+    browsers: list[str],
+    shard: int,
+    shards: int,
+) -> list[tuple[str, int | None]]:
+    """Return shard ``shard`` (1-based) of ``shards`` balanced partitions.
+
+    Tests are dealt longest-first to the currently lightest shard, where a
+    test's weight is its expected work summed over ``browsers`` (unseen
+    tests count at the browser's median).  Ties are broken by test id and
+    shard number, never randomly, so every node computes the same
+    partition as long as they all read the same timing history.
+
+    Args:
+        plugin_ids: (plugin_id, index) pairs of the whole suite.
+        history: Timing history shared by all shards.
+        browsers: Browsers each shard runs.
+        shard: This node's shard, 1..shards.
+        shards: Number of shards.
+
+    Returns:
+        This shard's pairs, in their original order.
+    """
+    fallbacks = {}
+    for browser in browsers:
+        known = history.known_durations(browser)
+        fallbacks[browser] = statistics.median(known) if known else DEFAULT_DURATION_SECS
+
+    def weight(t: tuple[str, int | None]) -> float:
+        return sum(
+            e if (e := history.estimate(t[0], t[1], browser)) is not None
+            else fallbacks[browser]
+            for browser in browsers
+        )
+
+    weights = {t: weight(t) for t in plugin_ids}
+    loads = [0.0] * shards
+    assigned: dict[tuple[str, int | None], int] = {}
+    for t in sorted(plugin_ids, key=lambda t: (-weights[t], t[0], -1 if t[1] is None else t[1])):
+        lightest = min(range(shards), key=lambda s: (loads[s], s))
+        loads[lightest] += weights[t]
+        assigned[t] = lightest + 1
+
+    mine = [t for t in plugin_ids if assigned[t] == shard]
+    print(
+        f"Shard {shard}/{shards}: {len(mine)} of {len(plugin_ids)} test(s), "
+        f"~{loads[shard - 1] / 60:.1f} of {sum(loads) / 60:.1f} min of work "
+        f"(shards {min(loads) / 60:.1f}-{max(loads) / 60:.1f} min)"
+    )
+    return mine
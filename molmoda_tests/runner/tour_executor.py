@@ -19,7 +19,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import Select
 
-from ..drivers import make_driver
+from ..drivers import make_driver, quit_driver
 from ..scripts.click_next import (
     find_active_button_to_click,
     find_active_element_to_click,
@@ -64,7 +64,7 @@ def quit_all_tour_drivers(browser: str) -> None:
     with _tour_drivers_lock:
         for driver in _tour_drivers.values():
             try:
-                driver.quit()
+                quit_driver(browser, driver)
             except Exception:
                 pass
             if browser == "safari":
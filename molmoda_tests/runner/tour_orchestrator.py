@@ -5,11 +5,12 @@ Mirrors the structure of ``runner/orchestrator.py`` but specialized for
 running guided tours via the click-loop approach.
 """
 
-import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from ..drivers import allowed_threads
+from ..drivers import print_driver_readiness, print_session_latency, threads_for
+from .concurrency import make_controller
+from .result_store import ResultStore
+from .timings import TimingHistory, schedule_by_history
 from .tour_executor import run_tour, quit_all_tour_drivers
+from .work_queue import Retry, backoff_delay, print_queue_stats, run_work_queue
 
 
 def run_tour_suite(
@@ -18,15 +19,30 @@ def run_tour_suite(
     root_url: str,
     max_retries: int = 2,
     serial: bool = False,
+    retry_backoff_secs: float = 0.0,
+    result_store: ResultStore | None = None,
+    concurrency: tuple[int, int] | None = None,
 ) -> tuple[list[dict[str, str]], list[dict[str, str]], list[dict[str, str]]]:
     """Run all tours for a single browser with retry logic and threading.
 
+    Failed tours are re-queued immediately (after an optional backoff) and
+    picked up by the next free worker; drivers stay alive across attempts.
+    Tours are started longest-first using wall times from earlier runs,
+    and every attempt is written to the SQLite result store.
+
     Args:
         plugin_ids: List of plugin ID strings to tour.
         browser: Browser string (e.g. 'chrome-headless').
         root_url: Root URL being tested.
-        max_retries: Maximum retry rounds for failing tours.
+        max_retries: Maximum attempts per tour.
         serial: When True, run tours one at a time instead of in parallel.
+        retry_backoff_secs: Delay before a tour's first retry, doubled on
+            each subsequent retry.  0 retries immediately.
+        result_store: Store to record results in.  A private one is opened
+            (and closed) when omitted.
+        concurrency: (min_workers, max_workers) to adapt the worker count
+            to host load within, starting from allowed_threads.  None (or
+            ``serial``) keeps the worker count fixed.
 
     Returns:
         A 3-tuple of (passed, failed, skipped) result-dict lists.  Each
@@ -35,60 +51,82 @@ def run_tour_suite(
     passed: list[dict[str, str]] = []
     failed: list[dict[str, str]] = []
     skipped: list[dict[str, str]] = []
-
-    remaining = plugin_ids.copy()
-    max_workers = 1 if serial else allowed_threads[browser]
-
-    for try_idx in range(max_retries):
-        failed_this_round: list[str] = []
-        random.shuffle(remaining)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_map: dict = {}
-            for pid in remaining:
-                future = executor.submit(run_tour, pid, browser, root_url)
-                future_map[future] = pid
-
-            for future in as_completed(future_map):
-                pid = future_map[future]
-                try:
-                    result = future.result()
-                    enriched = {
-                        **result,
-                        "try": str(try_idx + 1),
-                        "browser": browser,
-                    }
-                    status = result["status"]
-                    label = f"{status[0].upper()}{status[1:]}: {pid}"
-                    if result["error"]:
-                        label += f" ({result['error']})"
-                    print(label)
-
-                    if status == "passed":
-                        passed.append(enriched)
-                    elif status == "skipped":
-                        skipped.append(enriched)
-                    else:
-                        failed_this_round.append(pid)
-                        failed.append(enriched)
-                except Exception as e:
-                    print(f"Tour {pid} raised an exception: {e}")
-                    failed_this_round.append(pid)
-                    failed.append({
-                        "status": "failed",
-                        "test": pid,
-                        "error": str(e),
-                        "try": str(try_idx + 1),
-                        "browser": browser,
-                    })
-
-        quit_all_tour_drivers(browser)
-
-        remaining = sorted(failed_this_round)
-        if not remaining:
-            break
-
-        print(f"Will retry the following tours: {', '.join(remaining)}")
+    attempts: dict[str, int] = {}
+
+    max_workers = 1 if serial else threads_for(browser)
+    history = TimingHistory("tour")
+    controller = None
+    if concurrency is not None and not serial:
+        controller = make_controller(
+            browser, concurrency, max_workers,
+            lambda pid: history.get(pid, None, browser),
+        )
+        max_workers = controller.limit
+    remaining = [
+        pid for pid, _ in schedule_by_history(
+            [(pid, None) for pid in plugin_ids], history, browser, max_workers,
+        )
+    ]
+    store = result_store or ResultStore()
+    run_id = store.start_run("tour", root_url, browser)
+
+    def retry_or_give_up(pid: str) -> list:
+        if attempts[pid] >= max_retries:
+            return []
+        print(f"Will retry tour {pid} (attempt {attempts[pid] + 1}/{max_retries})")
+        return [Retry(pid, backoff_delay(retry_backoff_secs, attempts[pid]))]
+
+    def on_done(
+        pid: str, result, error: Exception | None, elapsed: float,
+    ) -> list:
+        attempts[pid] = attempts.get(pid, 0) + 1
+        history.record(pid, None, browser, elapsed)
+        try_num = str(attempts[pid])
+
+        if error is not None:
+            print(f"Tour {pid} raised an exception: {error}")
+            failure = {
+                "status": "failed",
+                "test": pid,
+                "error": str(error),
+                "try": try_num,
+                "browser": browser,
+            }
+            failed.append(failure)
+            store.record_result(run_id, (pid, None), failure, elapsed)
+            return retry_or_give_up(pid)
+
+        enriched = {**result, "try": try_num, "browser": browser}
+        store.record_result(run_id, (pid, None), enriched, elapsed)
+        status = result["status"]
+        label = f"{status[0].upper()}{status[1:]}: {pid}"
+        if result["error"]:
+            label += f" ({result['error']})"
+        print(label)
+
+        if status == "passed":
+            passed.append(enriched)
+        elif status == "skipped":
+            skipped.append(enriched)
+        else:
+            failed.append(enriched)
+            return retry_or_give_up(pid)
+        return []
+
+    stats = run_work_queue(
+        remaining,
+        lambda pid: run_tour(pid, browser, root_url),
+        on_done,
+        max_workers,
+        controller,
+    )
+    quit_all_tour_drivers(browser)
+    history.save()
+    if result_store is None:
+        store.close()
+    print_queue_stats(stats, label=browser)
+    print_driver_readiness(browser)
+    print_session_latency()
 
     return passed, failed, skipped
 
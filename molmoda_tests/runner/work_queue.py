@@ -0,0 +1,243 @@
+"""
+Work-queue scheduler shared by the suite orchestrators.
+
+Keeps every worker slot busy: as soon as any future completes, its result
+is handled and new work (including sub-tests discovered via addTests and
+retries of failed tests) is submitted immediately, rather than waiting for
+the rest of a batch.
+"""
+
+import contextlib
+import heapq
+import itertools
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, NamedTuple, TypedDict
+
+from .concurrency import ADJUST_INTERVAL_SECS, ConcurrencyController
+
+
+class Retry(NamedTuple):
+    """Follow-up returned from ``on_done`` to re-run a task after a delay.
+
+    The task is held back for ``delay_secs`` and then placed at the front
+    of the queue, so it runs on whichever worker frees up next.
+    """
+    task: Any
+    delay_secs: float = 0.0
+
+
+class IQueueStats(TypedDict):
+    """Slot-utilization summary for one run of the work queue.
+
+    ``utilization`` is busy slot-seconds divided by available slot-seconds
+    (``workers * wall_secs``, or the time-weighted worker limit when it is
+    adaptive), so 1.0 means no slot ever sat idle.  ``workers`` is the
+    largest number of slots that were available at once.
+    """
+    workers: int
+    tasks: int
+    wall_secs: float
+    busy_secs: float
+    utilization: float
+
+
+def backoff_delay(base_secs: float, attempt: int) -> float:
+    """Exponential backoff before retry number ``attempt`` (1-based).
+
+    Args:
+        base_secs: Delay before the first retry; 0 disables backoff.
+        attempt: The attempt that just failed (1 for the first try).
+
+    Returns:
+        Seconds to wait before re-queueing the task.
+    """
+    return base_secs * 2 ** (attempt - 1)
+
+
+def _timed(
+    run: Callable[[Any], Any], task: Any,
+) -> tuple[Any, Exception | None, float]:
+    """Run ``run(task)`` and return (result, error, elapsed seconds).
+
+    Timing happens inside the worker thread so queueing delays in the
+    executor are not counted as busy time.  Exceptions are returned rather
+    than raised so failed tasks still contribute their duration.
+    """
+    start = time.monotonic()
+    try:
+        return run(task), None, time.monotonic() - start
+    except Exception as e:
+        return None, e, time.monotonic() - start
+
+
+def run_work_queue(
+    tasks: list[Any],
+    run: Callable[[Any], Any],
+    on_done: Callable[[Any, Any, Exception | None, float], list[Any] | None],
+    max_workers: int,
+    controller: ConcurrencyController | None = None,
+    group_of: Callable[[Any], Any] | None = None,
+    group_limits: dict[Any, int] | None = None,
+    trim: Callable[[int], None] | None = None,
+) -> IQueueStats:
+    """Execute tasks on a thread pool, scheduling new work on every completion.
+
+    Tasks are started in list order.  Whenever a future finishes,
+    ``on_done`` is called with ``(task, result, error, elapsed_secs)``;
+    any tasks it returns are put at the front of the queue and dispatched
+    straight away to whichever slots are free.  Follow-ups wrapped in
+    ``Retry`` are held back for their delay first, without blocking the
+    rest of the queue.
+
+    With ``group_of`` and ``group_limits``, tasks share one queue but each
+    group (e.g. a browser) gets its own slots and its own thread pool, so a
+    group at its cap never holds back the others and a worker thread only
+    ever runs tasks of one group.  A task waits for a slot in its group
+    while later tasks of other groups start.
+
+    Args:
+        tasks: Initial tasks, in the order they should start.  Not modified.
+        run: Callable executed in a worker thread for each task.
+        on_done: Callback run on the calling thread for each completed task.
+            ``error`` is the exception raised by ``run`` (``result`` is then
+            None) and ``elapsed_secs`` the task's wall time in its worker.
+            Returns follow-up tasks (or ``Retry`` entries) to enqueue, or
+            None.
+        max_workers: Number of worker slots (ignored with group_limits).
+        controller: Adapts how many tasks may run at once, in total over
+            all groups, between its own bounds (``max_workers`` is then
+            ignored without groups).  Tasks already running when the limit
+            drops are allowed to finish.
+        group_of: Maps a task to its group key.
+        group_limits: Slots per group key.
+        trim: With a controller, called with its limit whenever fewer tasks
+            than there are pool threads may run, after the limit drops and
+            after each completion, so per-thread resources of idle workers
+            (e.g. their browsers) can be released.
+
+    Returns:
+        Slot-utilization statistics for the run (over all groups).
+    """
+    if group_of is None or group_limits is None:
+        def group_of(task: Any) -> Any:
+            return None
+        group_limits = {
+            None: controller.max_workers if controller is not None else max_workers
+        }
+    pool_total = sum(group_limits.values())
+
+    def total_limit() -> int:
+        if controller is None:
+            return pool_total
+        return min(controller.limit, pool_total)
+
+    queue: deque = deque(tasks)
+    # Min-heap of (ready_at, seq, task) for retries that are backing off.
+    # seq breaks ties so tasks themselves never need to be comparable.
+    delayed: list[tuple[float, int, Any]] = []
+    seq = itertools.count()
+    in_flight: dict[Future, Any] = {}
+    running = {g: 0 for g in group_limits}
+    busy_secs = 0.0
+    completed = 0
+    start = time.monotonic()
+    limit = total_limit()
+    peak_limit = limit
+    slot_secs = 0.0
+    last_tick = start
+
+    def maybe_trim() -> None:
+        if trim is not None and controller is not None and limit < pool_total:
+            trim(limit)
+
+    with contextlib.ExitStack() as stack:
+        executors = {
+            g: stack.enter_context(ThreadPoolExecutor(max_workers=cap))
+            for g, cap in group_limits.items()
+        }
+        while queue or in_flight or delayed:
+            # Release retries whose backoff has elapsed.
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                queue.appendleft(heapq.heappop(delayed)[2])
+
+            slot_secs += limit * (now - last_tick)
+            last_tick = now
+            if controller is not None:
+                old_limit = limit
+                controller.adjust(backlog=len(queue))
+                limit = total_limit()
+                if limit < old_limit:
+                    maybe_trim()
+            peak_limit = max(peak_limit, limit)
+
+            # Fill every idle slot before blocking, skipping (but keeping
+            # the place of) tasks whose group is full.
+            waiting: deque = deque()
+            while queue:
+                task = queue.popleft()
+                g = group_of(task)
+                if running[g] < group_limits[g] and len(in_flight) < limit:
+                    running[g] += 1
+                    in_flight[executors[g].submit(_timed, run, task)] = task
+                else:
+                    waiting.append(task)
+            queue = waiting
+
+            timeout = delayed[0][0] - now if delayed else None
+            if controller is not None:
+                timeout = (
+                    ADJUST_INTERVAL_SECS if timeout is None
+                    else min(timeout, ADJUST_INTERVAL_SECS)
+                )
+            if not in_flight:
+                time.sleep(max(timeout or 0.0, 0.0))
+                continue
+
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = in_flight.pop(future)
+                running[group_of(task)] -= 1
+                completed += 1
+                result, error, elapsed = future.result()
+                busy_secs += elapsed
+                if controller is not None:
+                    controller.observe(task, elapsed)
+
+                immediate = []
+                for follow_up in on_done(task, result, error, elapsed) or []:
+                    if isinstance(follow_up, Retry):
+                        ready_at = time.monotonic() + follow_up.delay_secs
+                        heapq.heappush(delayed, (ready_at, next(seq), follow_up.task))
+                    else:
+                        immediate.append(follow_up)
+                queue.extendleft(reversed(immediate))
+            if done:
+                maybe_trim()
+
+    end = time.monotonic()
+    wall_secs = end - start
+    capacity = slot_secs + limit * (end - last_tick)
+    return {
+        "workers": peak_limit,
+        "tasks": completed,
+        "wall_secs": wall_secs,
+        "busy_secs": busy_secs,
+        "utilization": busy_secs / capacity if capacity > 0 else 0.0,
+    }
+
+
+def print_queue_stats(stats: IQueueStats, label: str = "Worker") -> None:
+    """Print a one-line slot-utilization summary.
+
+    Args:
+        stats: Statistics returned by ``run_work_queue``.
+        label: Prefix for the printed line (e.g. the browser name).
+    """
+    print(
+        f"{label} slot utilization: {stats['utilization'] * 100:.1f}% "
+        f"({stats['tasks']} tasks, {stats['workers']} slots, "
+        f"{stats['busy_secs']:.1f}s busy / {stats['wall_secs']:.1f}s wall)"
+    )
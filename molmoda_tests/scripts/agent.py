@@ -0,0 +1,71 @@
+"""
+agent.py: Run MolModa plugin tests handed out by a coordinator.
+
+Usage:
+    python scripts/agent.py --coordinator http://host:8765 --browsers chrome-headless
+    python scripts/agent.py --coordinator http://host:8765 \\
+        --browsers chrome-headless,firefox --workers 4 --token s3cret
+
+The coordinator is run_tests.py started with --serve; it owns the queue,
+retries and the report.  Start as many agents, on as many hosts, as you
+like, before or during the run; each exits when the suite is done.
+"""
+
+import argparse
+import os
+
+from molmoda_tests.drivers import is_remote
+from molmoda_tests.runner.agent import run_agent
+from molmoda_tests.runner.screenshots import parse_policy
+from molmoda_tests.ui.menus import AVAILABLE_BROWSERS
+
+
+def main() -> None:
+    """Entry point for a worker agent."""
+    parser = argparse.ArgumentParser(description="Run tests for a coordinator.")
+    parser.add_argument(
+        "--coordinator", default=os.environ.get("MOLMODA_COORDINATOR"),
+        required="MOLMODA_COORDINATOR" not in os.environ,
+        help="Coordinator URL ($MOLMODA_COORDINATOR).",
+    )
+    parser.add_argument("--browsers", required=True,
+                        help="Comma-separated browsers this host can run.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=(
+                            "Worker threads (drivers) per browser (default 1); "
+                            "remote browsers are capped at their hub's capacity."
+                        ))
+    parser.add_argument("--batched", action="store_true",
+                        help="Run commands through the page-side interpreter.")
+    parser.add_argument("--warm", action="store_true",
+                        help="Reuse the loaded app between tests.")
+    parser.add_argument("--screenshots", default="full", metavar="POLICY",
+                        help="off, full (default), every:N or ring:K.")
+    parser.add_argument(
+        "--token", default=os.environ.get("MOLMODA_COORDINATOR_TOKEN"),
+        help="Secret the coordinator expects ($MOLMODA_COORDINATOR_TOKEN).",
+    )
+    parser.add_argument("--name", default=None,
+                        help="Name in the coordinator's logs (default hostname-pid).")
+    args = parser.parse_args()
+
+    browsers = [b.strip() for b in args.browsers.split(",") if b.strip()]
+    unknown = {
+        b for b in browsers if b not in AVAILABLE_BROWSERS and not is_remote(b)
+    }
+    if unknown or not browsers:
+        parser.error(f"Unknown or missing browsers: {', '.join(sorted(unknown))}")
+    try:
+        parse_policy(args.screenshots)
+    except ValueError as e:
+        parser.error(str(e))
+
+    run_agent(
+        args.coordinator, browsers, workers=args.workers, batched=args.batched,
+        warm=args.warm, screenshot_policy=args.screenshots, token=args.token,
+        name=args.name,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ from molmoda_tests.runner import (
     run_docs_capture_suite,
     print_docs_capture_report,
 )
+from molmoda_tests.runner.concurrency import parse_bounds
 from molmoda_tests.runner.docs_capture import resolve_docs_out_root
 
 
@@ -68,11 +69,23 @@ def main() -> None:
             "Default: ../molmoda-docs/docs/img/auto"
         ),
     )
+    parser.add_argument(
+        "--adaptive",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="MIN:MAX",
+        help=(
+            "Adapt the worker count to host load within MIN:MAX "
+            "(default 1 to the CPU count)."
+        ),
+    )
     args, _ = parser.parse_known_args()
-    # Strip --out-dir (and its value) from sys.argv so the discovery layer
-    # doesn't try to interpret them as plugin ids.
-    if args.out_dir is not None:
-        # Find and remove "--out-dir VALUE" or "--out-dir=VALUE".
+    # Strip --out-dir/--adaptive (and their values) from sys.argv so the
+    # discovery layer doesn't try to interpret them as plugin ids.
+    if args.out_dir is not None or args.adaptive is not None:
+        # Find and remove "--out-dir VALUE" or "--out-dir=VALUE", and
+        # "--adaptive[=MIN:MAX]".
         new_argv = [sys.argv[0]]
         skip_next = False
         for arg in sys.argv[1:]:
@@ -82,10 +95,11 @@ def main() -> None:
             if arg == "--out-dir":
                 skip_next = True
                 continue
-            if arg.startswith("--out-dir="):
+            if arg.startswith("--out-dir=") or arg.split("=")[0] == "--adaptive":
                 continue
             new_argv.append(arg)
         sys.argv = new_argv
+    concurrency = None if args.adaptive is None else parse_bounds(args.adaptive)
     out_root = resolve_docs_out_root(args.out_dir)
     root_url = select_root_url()
     # Force chrome for consistent rendering; ignore other selections.  We
@@ -114,7 +128,7 @@ def main() -> None:
     print(f"[debug] after filter_capturable_plugin_ids: {len(plugin_ids)}")
     print(f"Capturing {len(plugin_ids)} plugin widget(s)...\n")
     succeeded, failed = run_docs_capture_suite(
-        plugin_ids, browser, root_url, out_root,
+        plugin_ids, browser, root_url, out_root, concurrency=concurrency,
     )
     print_docs_capture_report(succeeded, failed, root_url)
 if __name__ == "__main__":
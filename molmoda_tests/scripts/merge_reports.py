@@ -0,0 +1,49 @@
+"""
+merge_reports.py: Combine per-shard run_tests.py results into one report.
+
+Usage:
+    python scripts/merge_reports.py test_report_1of4.json ... test_report_4of4.json
+    python scripts/merge_reports.py --out merged.json test_report_*of4.json
+
+Prints the same summary as run_tests.py (including a single "RUN AGAIN"
+line covering every shard) and exits with status 1 if any test failed on
+its last attempt, 4 if only performance regressions were found.
+"""
+
+import argparse
+import sys
+
+from molmoda_tests.runner import (
+    final_failures,
+    merge_reports,
+    print_report,
+    save_report,
+)
+
+
+def main() -> int:
+    """Merge the given reports; returns the process exit status."""
+    parser = argparse.ArgumentParser(description="Merge run_tests.py result files.")
+    parser.add_argument("reports", nargs="+", help="Files written by --report-json.")
+    parser.add_argument("--out", default=None, help="Also write the merged results.")
+    args = parser.parse_args()
+
+    try:
+        passed, failed, root_url = merge_reports(args.reports)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"Could not read reports: {e}")
+
+    print_report(passed, failed, root_url)
+    if args.out:
+        save_report(args.out, passed, failed, root_url)
+        print(f"Merged results: {args.out}")
+
+    if final_failures(passed, failed):
+        return 1
+    if any(r.get("perf_regressions") for r in passed):
+        return 4
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
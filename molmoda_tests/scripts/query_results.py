@@ -0,0 +1,90 @@
+"""
+query_results.py: Query the SQLite history written by the test runners.
+
+Usage:
+    python scripts/query_results.py slowest [--limit 20]
+    python scripts/query_results.py flakiest [--limit 20]
+    python scripts/query_results.py trend <plugin_id>
+
+Every subcommand accepts --kind (test, tour or docs; default test),
+--browser to restrict to one browser, and --db to point at another
+database file.
+"""
+
+import argparse
+
+from molmoda_tests.runner.result_store import (
+    RESULTS_DB_PATH,
+    connect,
+    duration_trend,
+    flakiest_tests,
+    slowest_tests,
+)
+
+
+def _print_table(headers: list[str], rows: list[tuple]) -> None:
+    """Print rows as left-aligned, space-padded columns."""
+    if not rows:
+        print("   None!")
+        return
+    cells = [
+        [f"{v:.1f}" if isinstance(v, float) else str(v) for v in row]
+        for row in rows
+    ]
+    widths = [
+        max(len(h), *(len(r[i]) for r in cells)) for i, h in enumerate(headers)
+    ]
+    print("   " + "  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for r in cells:
+        print("   " + "  ".join(c.ljust(w) for c, w in zip(r, widths)))
+
+
+def main() -> None:
+    """Entry point for the results query CLI."""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=RESULTS_DB_PATH, help="Database path.")
+    common.add_argument(
+        "--kind", default="test", choices=["test", "tour", "docs"],
+        help="Which suite's results to query.",
+    )
+    common.add_argument("--browser", default=None, help="Only this browser.")
+
+    parser = argparse.ArgumentParser(
+        description="Query historical MolModa test results."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    slowest = sub.add_parser(
+        "slowest", parents=[common], help="Slowest passing tests."
+    )
+    slowest.add_argument("--limit", type=int, default=20)
+    flakiest = sub.add_parser(
+        "flakiest", parents=[common], help="Tests that fail most often."
+    )
+    flakiest.add_argument("--limit", type=int, default=20)
+    trend = sub.add_parser(
+        "trend", parents=[common], help="Duration per run for one plugin."
+    )
+    trend.add_argument("plugin_id")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "slowest":
+        _print_table(
+            ["test", "browser", "runs", "avg secs", "max secs"],
+            slowest_tests(conn, args.limit, args.kind, args.browser),
+        )
+    elif args.command == "flakiest":
+        _print_table(
+            ["test", "browser", "runs", "flaky runs", "passed eventually", "flake rate"],
+            flakiest_tests(conn, args.limit, args.kind, args.browser),
+        )
+    elif args.command == "trend":
+        _print_table(
+            ["started", "git rev", "browser", "test", "secs"],
+            duration_trend(conn, args.plugin_id, args.kind, args.browser),
+        )
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,40 +5,316 @@ Usage:
     python scripts/run_tests.py                        # all plugins
     python scripts/run_tests.py <plugin_id>            # one plugin
     python scripts/run_tests.py <plugin_id> <index>    # one sub-test (1-based)
+    python scripts/run_tests.py --batched [...]        # page-side command interpreter
+    python scripts/run_tests.py --warm [...]           # reuse the loaded app between tests
+    python scripts/run_tests.py --adaptive[=MIN:MAX]   # adapt worker count to host load
+    python scripts/run_tests.py --screenshots=ring:5   # off, full (default), every:N, ring:K
+    python scripts/run_tests.py --perf-threshold=0.5   # allowed slowdown vs perf baseline
+    python scripts/run_tests.py --update-perf-baseline # store this run's metrics as baseline
+    python scripts/run_tests.py --leak-check[=snapshot] # track retained JS heap (Chrome)
+    python scripts/run_tests.py --caps=chrome:6,safari:1 # per-browser worker caps
+    python scripts/run_tests.py --browsers remote:chrome-headless@http://localhost:4444
+                                                       # sessions on a WebDriver hub
+    python scripts/run_tests.py --contexts[=FACTOR]    # Chrome workers share processes
+    python scripts/run_tests.py --own-chromedriver     # one chromedriver per Chrome driver
+    python scripts/run_tests.py --profile-templates    # start drivers from primed profiles
+
+All selected browsers run at the same time, from one shared queue, and
+jest runs alongside them (--no-jest skips it; with --shard, only shard 1
+runs it).
+
+Unattended runs:
+    python scripts/run_tests.py --non-interactive \\
+        --url http://localhost:8080 --browsers chrome-headless,firefox \\
+        --report-json results.json
+
+--url and --browsers (or $MOLMODA_URL and $MOLMODA_BROWSERS) skip the
+menus.  With --non-interactive ($MOLMODA_NONINTERACTIVE=1, or when stdin
+is not a terminal) nothing ever prompts: missing settings are an error and
+a failing single test doesn't wait for Enter.
+
+Split across CI nodes (each node needs the same timing history, e.g.
+restored from a cache, for the shards to line up):
+    python scripts/run_tests.py --non-interactive ... --shard 2/4
+    python scripts/merge_reports.py test_report_*of4.json
+
+Farm tests out to agents on other hosts (see scripts/agent.py), which pull
+work as they have capacity; a dead agent's tests are requeued once their
+leases expire:
+    python scripts/run_tests.py --non-interactive ... --serve 0.0.0.0:8765
+    python scripts/agent.py --coordinator http://<host>:8765 --browsers chrome-headless
+
+Exit status:
+    0  everything passed
+    1  at least one plugin test failed on its last attempt
+    2  bad arguments (from argparse)
+    3  jest failed
+    4  a test's performance metrics regressed past the threshold
+When several apply, the lowest non-zero status wins.
 """
 
+import argparse
 import os
+import subprocess
 import sys
+from typing import IO
 
 from molmoda_tests.ui import select_root_url, select_browsers
+from molmoda_tests.drivers import chromedriver_pool, contexts, is_remote, profiles
+from molmoda_tests.ui.menus import AVAILABLE_BROWSERS
 from molmoda_tests.discovery import find_plugin_ids, filter_plugin_ids
-from molmoda_tests.runner import run_browser_suite, print_report
+from molmoda_tests.runner import (
+    final_failures,
+    print_report,
+    run_multi_browser_suite,
+    save_report,
+)
+from molmoda_tests.runner.artifact_store import ARTIFACTS_DIR
+from molmoda_tests.runner.concurrency import parse_bounds, parse_caps
+from molmoda_tests.runner.perf_metrics import REGRESSION_THRESHOLD
+from molmoda_tests.runner.result_store import RESULTS_DB_PATH, ResultStore
+from molmoda_tests.runner.screenshots import parse_policy
+from molmoda_tests.runner.timings import (
+    TIMINGS_PATH,
+    TimingHistory,
+    parse_shard,
+    shard_plugin_ids,
+)
+from molmoda_tests.tracing import TRACE_PATH, export_chrome_trace
+
+EXIT_OK = 0
+EXIT_TESTS_FAILED = 1
+EXIT_JEST_FAILED = 3
+EXIT_PERF_REGRESSED = 4
+
+JEST_COMMAND = ["node_modules/.bin/jest"]
 
 
-def main():
-    root_url = select_root_url()
-    browsers = select_browsers()
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    """Parse run_tests.py's command line (see the module docstring)."""
+    parser = argparse.ArgumentParser(description="Run the MolModa plugin tests.")
+    parser.add_argument(
+        "plugins",
+        nargs="*",
+        help="Plugin ids to test, optionally followed by a 1-based sub-test index.",
+    )
+    parser.add_argument(
+        "--url",
+        default=os.environ.get("MOLMODA_URL"),
+        help="Root URL to test ($MOLMODA_URL).  Asked for when omitted.",
+    )
+    parser.add_argument(
+        "--browsers",
+        default=os.environ.get("MOLMODA_BROWSERS"),
+        help=(
+            "Comma-separated browsers ($MOLMODA_BROWSERS), from: "
+            f"{', '.join(AVAILABLE_BROWSERS)}, or remote:<template>@<hub url> "
+            "for a WebDriver hub.  Asked for when omitted."
+        ),
+    )
+    parser.add_argument(
+        "--non-interactive",
+        action="store_true",
+        default=(
+            os.environ.get("MOLMODA_NONINTERACTIVE", "") not in ("", "0")
+            or not sys.stdin.isatty()
+        ),
+        help="Never prompt ($MOLMODA_NONINTERACTIVE=1; implied without a terminal).",
+    )
+    parser.add_argument("--batched", action="store_true",
+                        help="Run commands through the page-side interpreter.")
+    parser.add_argument("--warm", action="store_true",
+                        help="Reuse the loaded app between tests.")
+    parser.add_argument(
+        "--adaptive", nargs="?", const="", default=None, metavar="MIN:MAX",
+        help=(
+            "Adapt the total worker count, over all browsers, to host load "
+            "within MIN:MAX (default 1 to the CPU count; starts at half the max)."
+        ),
+    )
+    parser.add_argument(
+        "--contexts", nargs="?", type=int, default=None,
+        const=contexts.CONTEXT_THREAD_FACTOR, metavar="FACTOR",
+        help=(
+            "Run Chrome workers as isolated browser contexts in a few shared "
+            "Chrome processes, with FACTOR times the workers per host "
+            f"(default {contexts.CONTEXT_THREAD_FACTOR}; --adaptive bounds "
+            "still apply)."
+        ),
+    )
+    parser.add_argument(
+        "--own-chromedriver", action="store_true",
+        help=(
+            "Start a chromedriver per Chrome driver instead of sharing a few "
+            "long-lived ones (to compare session-creation latency)."
+        ),
+    )
+    parser.add_argument(
+        "--profile-templates", action="store_true",
+        help=(
+            "Start Chrome and Firefox from a copy of a profile primed with "
+            "the app (rebuilt whenever the served build changes)."
+        ),
+    )
+    parser.add_argument("--caps", default="", metavar="BROWSER:N,...",
+                        help="Worker slots per browser, e.g. chrome:6,safari:1.")
+    parser.add_argument("--screenshots", default="full", metavar="POLICY",
+                        help="off, full (default), every:N or ring:K.")
+    parser.add_argument(
+        "--perf-threshold", type=float, default=REGRESSION_THRESHOLD,
+        metavar="FRACTION",
+        help=f"Allowed increase over the perf baseline (default {REGRESSION_THRESHOLD}).",
+    )
+    parser.add_argument("--update-perf-baseline", action="store_true",
+                        help="Store this run's metrics as the perf baseline.")
+    parser.add_argument(
+        "--leak-check", nargs="?", const="on", default=None,
+        choices=["on", "snapshot"],
+        help="Track retained JS heap (Chrome; implies --warm); =snapshot also "
+             "saves the worst heap.",
+    )
+    parser.add_argument(
+        "--shard", default=None, metavar="i/N",
+        help="Run only shard i of N, balanced by historical durations.",
+    )
+    parser.add_argument(
+        "--serve", default=None, metavar="HOST:PORT",
+        help="Hand tests out to remote agents from a coordinator on HOST:PORT.",
+    )
+    parser.add_argument(
+        "--token", default=os.environ.get("MOLMODA_COORDINATOR_TOKEN"),
+        help="Secret agents must send with --serve ($MOLMODA_COORDINATOR_TOKEN).",
+    )
+    parser.add_argument("--timings", default=TIMINGS_PATH,
+                        help=f"Timing history file (default {TIMINGS_PATH}).")
+    parser.add_argument("--no-jest", action="store_true",
+                        help="Don't run the jest unit tests.")
+    parser.add_argument("--results-db", default=RESULTS_DB_PATH,
+                        help=f"SQLite results database (default {RESULTS_DB_PATH}).")
+    parser.add_argument("--screenshot-store", default=ARTIFACTS_DIR,
+                        help=f"Screenshot artifact store (default {ARTIFACTS_DIR}).")
+    parser.add_argument("--trace", default=TRACE_PATH,
+                        help=f"Chrome trace JSON output (default {TRACE_PATH}).")
+    parser.add_argument(
+        "--report-json", default=None, metavar="PATH",
+        help=(
+            "Also write the passed/failed results as JSON (with --shard, "
+            "default ./test_report_<i>of<N>.json)."
+        ),
+    )
+    parser.add_argument("--jest-log", default="./jest_output.log",
+                        help="Where jest's output goes (default ./jest_output.log).")
+
+    args = parser.parse_args(argv)
+    try:
+        args.concurrency = (
+            parse_bounds(args.adaptive) if args.adaptive is not None else None
+        )
+        args.browser_caps = parse_caps(args.caps) or None
+        parse_policy(args.screenshots)  # Fail fast on a typo.
+        args.shard = parse_shard(args.shard) if args.shard else None
+        if args.serve is not None:
+            host, _, port = args.serve.rpartition(":")
+            args.serve = (host or "127.0.0.1", int(port))
+    except ValueError as e:
+        parser.error(str(e))
+    if args.browsers is not None:
+        args.browsers = [b.strip() for b in args.browsers.split(",") if b.strip()]
+        unknown = {
+            b for b in args.browsers
+            if b not in AVAILABLE_BROWSERS and not is_remote(b)
+        }
+        if unknown or not args.browsers:
+            parser.error(f"Unknown or missing browsers: {', '.join(sorted(unknown))}")
+    if args.shard and args.report_json is None:
+        args.report_json = f"./test_report_{args.shard[0]}of{args.shard[1]}.json"
+    if args.contexts is not None and args.contexts < 1:
+        parser.error("--contexts FACTOR must be at least 1.")
+    if args.non_interactive and (args.url is None or args.browsers is None):
+        parser.error("--non-interactive needs --url and --browsers.")
+    return args
+
+
+def _start_jest(log_path: str) -> tuple[subprocess.Popen, IO[str]] | None:
+    """Start jest in the background, writing its output to ``log_path``."""
+    log = open(log_path, "w")
+    try:
+        return subprocess.Popen(
+            JEST_COMMAND, stdout=log, stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+        ), log
+    except OSError as e:
+        print(f"Could not start jest: {e}")
+        log.close()
+        return None
+
+
+def main() -> int:
+    """Run the suite; returns the process exit status."""
+    args = _parse_args(sys.argv[1:])
+    contexts.SHARED_CONTEXTS = args.contexts is not None
+    if args.contexts is not None:
+        contexts.CONTEXT_THREAD_FACTOR = args.contexts
+    chromedriver_pool.SHARED_SERVICES = not args.own_chromedriver
+    profiles.PROFILE_TEMPLATES = args.profile_templates
+
+    root_url = args.url or select_root_url()
+    browsers = args.browsers or select_browsers()
 
     print(f"\nUsing root URL: {root_url}")
     print(f"Using browsers: {', '.join(browsers)}\n")
 
-    plugin_ids = find_plugin_ids()
+    plugin_ids = find_plugin_ids(argv=args.plugins)
     plugin_ids = filter_plugin_ids(plugin_ids, browsers)
+    if args.shard:
+        plugin_ids = shard_plugin_ids(
+            plugin_ids, TimingHistory("test", args.timings), browsers, *args.shard
+        )
 
-    all_passed: list[dict] = []
-    all_failed: list[dict] = []
+    # Jest doesn't depend on the shard, so only the first one runs it.
+    if args.shard and args.shard[0] != 1:
+        args.no_jest = True
+    jest = None if args.no_jest else _start_jest(args.jest_log)
 
-    for browser in browsers:
-        print(f"\nBrowser: {browser}\n")
-        passed, failed = run_browser_suite(plugin_ids, browser, root_url)
-        all_passed.extend(passed)
-        all_failed.extend(failed)
+    store = ResultStore(args.results_db)
+    try:
+        all_passed, all_failed = run_multi_browser_suite(
+            plugin_ids, browsers, root_url, result_store=store,
+            batched=args.batched, warm=args.warm, concurrency=args.concurrency,
+            screenshot_policy=args.screenshots, perf_threshold=args.perf_threshold,
+            update_perf_baseline=args.update_perf_baseline,
+            leak_check=args.leak_check, browser_caps=args.browser_caps,
+            interactive=not args.non_interactive,
+            artifacts_dir=args.screenshot_store, timings_path=args.timings,
+            coordinator=args.serve, coordinator_token=args.token,
+        )
+    finally:
+        store.close()
 
     print_report(all_passed, all_failed, root_url)
+    print(f"Trace (open in Perfetto): {export_chrome_trace(args.trace)}\n")
+    if args.report_json:
+        save_report(args.report_json, all_passed, all_failed, root_url, args.shard)
+        print(f"Results: {args.report_json}")
+
+    jest_status = 0
+    if jest is not None:
+        process, log = jest
+        jest_status = process.wait()
+        log.close()
+        print(
+            f"Jest {'passed' if jest_status == 0 else f'failed (exit {jest_status})'}"
+            f"; output in {args.jest_log}"
+        )
 
-    input("Press Enter to run all jest unit tests...")
-    os.system("node_modules/.bin/jest")
+    if final_failures(all_passed, all_failed):
+        return EXIT_TESTS_FAILED
+    if jest_status != 0 or (jest is None and not args.no_jest):
+        return EXIT_JEST_FAILED
+    if any(r.get("perf_regressions") for r in all_passed):
+        return EXIT_PERF_REGRESSED
+    return EXIT_OK
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
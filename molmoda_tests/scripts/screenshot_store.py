@@ -0,0 +1,91 @@
+"""
+screenshot_store.py: Inspect and prune the deduplicated screenshot store.
+
+Usage:
+    python scripts/screenshot_store.py runs                   # list stored runs
+    python scripts/screenshot_store.py export <test> [--run RUN_ID] [--out DIR]
+    python scripts/screenshot_store.py gc --keep 10           # keep the newest 10 runs
+    python scripts/screenshot_store.py gc --keep 10 --grace 0 # ...even with a run in progress
+
+``export`` copies one test's frames (from the newest run that has them,
+unless --run is given) to DIR/<test>/<test>_<frame>.png, the layout the
+runner used to write directly; DIR defaults to ./screenshots.  Every
+subcommand accepts --store to point at another store directory.
+"""
+
+import argparse
+import os
+import shutil
+
+from molmoda_tests.runner.artifact_store import (
+    ARTIFACTS_DIR,
+    GC_GRACE_SECS,
+    ArtifactStore,
+)
+
+
+def main() -> None:
+    """Entry point for the screenshot store CLI."""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--store", default=ARTIFACTS_DIR, help="Store directory.")
+
+    parser = argparse.ArgumentParser(
+        description="Inspect and prune the MolModa screenshot store."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("runs", parents=[common], help="List stored runs.")
+    export = sub.add_parser(
+        "export", parents=[common], help="Copy a test's frames out of the store."
+    )
+    export.add_argument("test")
+    export.add_argument("--run", default=None, help="Run id (default: newest).")
+    export.add_argument("--out", default="./screenshots", help="Output directory.")
+    gc = sub.add_parser(
+        "gc", parents=[common], help="Delete all but the newest runs."
+    )
+    gc.add_argument("--keep", type=int, required=True)
+    gc.add_argument(
+        "--grace", type=float, default=GC_GRACE_SECS, metavar="SECS",
+        help=(
+            "Keep unreferenced blobs younger than this, which may belong to "
+            f"a run in progress (default {GC_GRACE_SECS:.0f})."
+        ),
+    )
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.store)
+    if args.command == "runs":
+        runs = store.manifests()
+        if not runs:
+            print("   None!")
+        for m in runs:
+            frames = sum(len(f) for f in m.get("tests", {}).values())
+            print(
+                f"   {m['run_id']}  {m.get('started_at', '?')}  "
+                f"{m.get('kind', '?')}/{m.get('browser', '?')}  "
+                f"{len(m.get('tests', {}))} tests, {frames} frames"
+            )
+    elif args.command == "export":
+        runs = [
+            m for m in reversed(store.manifests())
+            if args.test in m.get("tests", {})
+            and (args.run is None or m["run_id"] == args.run)
+        ]
+        if not runs:
+            raise SystemExit(f"No stored frames for {args.test}.")
+        out_dir = os.path.join(args.out, args.test)
+        os.makedirs(out_dir, exist_ok=True)
+        frames = runs[0]["tests"][args.test]
+        for frame, digest in frames.items():
+            shutil.copyfile(
+                store.blob_path(digest),
+                os.path.join(out_dir, f"{args.test}_{frame}.png"),
+            )
+        print(f"Exported {len(frames)} frame(s) from run {runs[0]['run_id']} to {out_dir}")
+    elif args.command == "gc":
+        runs, blobs, freed = store.gc(args.keep, args.grace)
+        print(f"Removed {runs} run(s) and {blobs} blob(s), freeing {freed / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
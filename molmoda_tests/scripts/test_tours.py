@@ -10,21 +10,26 @@ Usage:
     python scripts/test_tours.py <plugin_id> ...     # specific plugin(s) only
     python scripts/test_tours.py --serial            # run one at a time
     python scripts/test_tours.py --serial <id> ...   # serial + specific plugins
+    python scripts/test_tours.py --adaptive[=MIN:MAX]  # adapt worker count to host load
 """
 
 import sys
 
 from molmoda_tests.ui import select_root_url, select_browsers
 from molmoda_tests.discovery.tours import find_tour_plugin_ids
+from molmoda_tests.runner.concurrency import parse_bounds
 from molmoda_tests.runner.tour_orchestrator import run_tour_suite, print_tour_report
 
 
 def main() -> None:
     """Entry point for the tour test runner."""
-    # Extract --serial flag before passing remaining args to discovery.
+    # Extract --serial/--adaptive flags before passing remaining args to
+    # discovery.
     raw_args = sys.argv[1:]
     serial = "--serial" in raw_args
-    plugin_args = [a for a in raw_args if a != "--serial"]
+    adaptive = [a for a in raw_args if a.split("=")[0] == "--adaptive"]
+    concurrency = parse_bounds(adaptive[-1][len("--adaptive="):]) if adaptive else None
+    plugin_args = [a for a in raw_args if a != "--serial" and a not in adaptive]
 
     root_url = select_root_url()
     browsers = select_browsers()
@@ -47,6 +52,7 @@ def main() -> None:
         print(f"\nBrowser: {browser}\n")
         passed, failed, skipped = run_tour_suite(
             plugin_ids, browser, root_url, serial=serial,
+            concurrency=concurrency,
         )
         all_passed.extend(passed)
         all_failed.extend(failed)
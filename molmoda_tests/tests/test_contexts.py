@@ -0,0 +1,59 @@
+"""
+Checks that workers sharing a host Chrome only see their own console errors.
+
+Needs Chrome and a chromedriver on PATH; skipped otherwise.
+"""
+
+import shutil
+import time
+
+import pytest
+
+from molmoda_tests.drivers import chromedriver_pool, contexts
+from molmoda_tests.drivers.factory import make_driver, quit_driver
+from molmoda_tests.drivers.log_collector import attach_log_collector
+
+BROWSER = "chrome-headless"
+
+
+def _page_logging(message: str) -> str:
+    return f"data:text/html,<script>console.error('{message}')</script>"
+
+
+def _errors(driver) -> str:
+    # Give the page's script a moment to run.
+    time.sleep(0.5)
+    return " ".join(e["message"] for e in attach_log_collector(driver, BROWSER).drain())
+
+
+@pytest.fixture
+def shared_host(monkeypatch):
+    chromedriver = shutil.which("chromedriver")
+    if chromedriver is None:
+        pytest.skip("chromedriver is not on PATH")
+    monkeypatch.setattr(chromedriver_pool, "CHROMEDRIVER_PATH", chromedriver)
+    monkeypatch.setattr(contexts, "SHARED_CONTEXTS", True)
+    monkeypatch.setattr(contexts, "CONTEXTS_PER_HOST", 2)
+    yield
+    contexts.close_context_hosts()
+    chromedriver_pool.stop_chromedrivers()
+
+
+def test_contexts_do_not_see_each_others_errors(shared_host):
+    first = make_driver(BROWSER, "about:blank")
+    second = make_driver(BROWSER, "about:blank")
+    try:
+        assert contexts._contexts[first][0] is contexts._contexts[second][0]
+
+        first.get(_page_logging("error-from-first"))
+        second.get(_page_logging("error-from-second"))
+
+        first_errors = _errors(first)
+        second_errors = _errors(second)
+        assert "error-from-first" in first_errors
+        assert "error-from-second" not in first_errors
+        assert "error-from-second" in second_errors
+        assert "error-from-first" not in second_errors
+    finally:
+        quit_driver(BROWSER, first)
+        quit_driver(BROWSER, second)
@@ -0,0 +1,83 @@
+"""
+Checks that shard_plugin_ids partitions a suite the same way on every node.
+"""
+
+import itertools
+import random
+
+import pytest
+
+from molmoda_tests.runner.timings import TimingHistory, shard_plugin_ids
+
+BROWSERS = ["chrome-headless", "firefox-headless"]
+
+
+@pytest.fixture
+def history(tmp_path) -> TimingHistory:
+    history = TimingHistory("test", str(tmp_path / "timings.json"))
+    for browser in BROWSERS:
+        history.record("Docking", None, browser, 300.0)
+        history.record("Align", None, browser, 45.0)
+        history.record("Multi", None, browser, 5.0)
+        for i in range(3):
+            history.record("Multi", i, browser, 20.0 + i)
+        for i, plugin in enumerate(["A", "B", "C", "D", "E", "F"]):
+            history.record(plugin, None, browser, 10.0 + 3 * i)
+    return history
+
+
+SUITE = (
+    [("Docking", None), ("Align", None), ("Multi", None)]
+    + [(p, None) for p in ["A", "B", "C", "D", "E", "F"]]
+    + [("Multi", i) for i in range(3)]
+    + [("NewPlugin", None), ("Other", None), ("Multi", 7)]  # no history
+)
+
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 5])
+def test_shards_cover_every_test_exactly_once(history, shards):
+    assigned = [
+        t for s in range(1, shards + 1)
+        for t in shard_plugin_ids(SUITE, history, BROWSERS, s, shards)
+    ]
+    assert sorted(assigned, key=repr) == sorted(SUITE, key=repr)
+
+
+@pytest.mark.parametrize("shards", [2, 3])
+def test_partition_does_not_depend_on_input_order(history, shards):
+    rng = random.Random(0)
+    expected = [
+        set(shard_plugin_ids(SUITE, history, BROWSERS, s, shards))
+        for s in range(1, shards + 1)
+    ]
+    for _ in range(10):
+        shuffled = rng.sample(SUITE, len(SUITE))
+        parts = [
+            shard_plugin_ids(shuffled, history, BROWSERS, s, shards)
+            for s in range(1, shards + 1)
+        ]
+        assert [set(p) for p in parts] == expected
+        # Each shard keeps its tests in the order they were given.
+        for part in parts:
+            assert part == [t for t in shuffled if t in part]
+
+
+def test_unseen_tests_weigh_the_median_known_duration(tmp_path):
+    history = TimingHistory("test", str(tmp_path / "timings.json"))
+    history.record("A", None, "chrome", 30.0)
+    history.record("B", None, "chrome", 10.0)
+    history.record("C", None, "chrome", 20.0)
+    suite = [("A", None), ("B", None), ("C", None), ("U", None)]
+
+    # With U at the median (20s), the deal is A, C (tie broken by id), U,
+    # B: shard 1 gets A and B, shard 2 C and U, 40s each.  Any other
+    # weight for U would deal it differently.
+    assert shard_plugin_ids(suite, history, ["chrome"], 1, 2) == [("A", None), ("B", None)]
+    assert shard_plugin_ids(suite, history, ["chrome"], 2, 2) == [("C", None), ("U", None)]
+
+
+def test_longest_test_gets_a_shard_to_itself(history):
+    # Docking outweighs any other shard's share of the rest.
+    parts = [set(shard_plugin_ids(SUITE, history, BROWSERS, s, 3)) for s in (1, 2, 3)]
+    assert {("Docking", None)} in parts
+    assert not any(a & b for a, b in itertools.combinations(parts, 2))
@@ -0,0 +1,8 @@
+from .spans import (
+    TRACE_PATH,
+    export_chrome_trace,
+    phase_summary,
+    print_phase_summary,
+    span,
+    trace_context,
+)
@@ -0,0 +1,135 @@
+"""
+Lightweight timing spans for the test harness.
+
+Instrumented code wraps its work in ``span(name, phase)``; each span
+records its wall time together with the worker thread, and the plugin and
+command index set by the enclosing ``trace_context``.  Spans nest per
+thread, so a span's self time (its duration minus its children's) is
+known too.
+
+The collected spans export as Chrome trace-event JSON (open it in Perfetto
+or chrome://tracing) and summarise per phase (see print_phase_summary),
+which shows whether a slow test was waiting on element lookups, error
+checks, screenshots, navigation or the app itself.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Iterator
+
+# Where run scripts export the trace, relative to the repo root.
+TRACE_PATH = "./test_trace.json"
+
+_local = threading.local()
+_events: list[dict[str, Any]] = []
+_self_secs: dict[str, list[float]] = {}
+_lock = threading.Lock()
+_epoch = time.perf_counter()
+
+
+def _context() -> dict[str, Any]:
+    if not hasattr(_local, "context"):
+        _local.context = {}
+        _local.stack = []
+    return _local.context
+
+
+@contextlib.contextmanager
+def trace_context(**fields: Any) -> Iterator[None]:
+    """Attach fields (e.g. plugin, cmd_index) to spans opened in the block."""
+    context = _context()
+    saved = dict(context)
+    context.update(fields)
+    try:
+        yield
+    finally:
+        context.clear()
+        context.update(saved)
+
+
+@contextlib.contextmanager
+def span(name: str, phase: str, **args: Any) -> Iterator[None]:
+    """Time the block as a span in ``phase`` (the summary's grouping).
+
+    Args:
+        name: What ran (e.g. the command name or selector).
+        phase: Category: "navigate", "dispatch", "el", "check_errors",
+            "screenshot", ...
+        **args: Extra fields shown with the span in the trace viewer.
+    """
+    context = _context()
+    stack: list[float] = _local.stack
+    stack.append(0.0)  # Children's total time.
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        duration = end - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += duration
+        event = {
+            "name": name,
+            "cat": phase,
+            "ph": "X",
+            "ts": (start - _epoch) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {**context, **args},
+        }
+        with _lock:
+            _events.append(event)
+            _self_secs.setdefault(phase, []).append(duration - children)
+
+
+def export_chrome_trace(path: str = TRACE_PATH) -> str:
+    """Write all spans so far as Chrome trace-event JSON; returns the path."""
+    with _lock:
+        events = list(_events)
+    names = {
+        t.ident: t.name for t in threading.enumerate() if t.ident is not None
+    }
+    metadata = [
+        {
+            "name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+            "args": {"name": names.get(tid, f"worker-{tid}")},
+        }
+        for tid in sorted({e["tid"] for e in events})
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def phase_summary() -> list[tuple[str, int, float, float, float]]:
+    """Per phase: (phase, spans, total secs, self secs, max secs).
+
+    Sorted by self time, the time not accounted for by nested spans.
+    """
+    with _lock:
+        totals: dict[str, list[float]] = {}
+        for e in _events:
+            totals.setdefault(e["cat"], []).append(e["dur"] / 1e6)
+        rows = [
+            (phase, len(durs), sum(durs), sum(_self_secs[phase]), max(durs))
+            for phase, durs in totals.items()
+        ]
+    return sorted(rows, key=lambda r: r[3], reverse=True)
+
+
+def print_phase_summary() -> None:
+    """Print where the harness spent its time, per phase."""
+    rows = phase_summary()
+    if not rows:
+        return
+    print("\nTime by phase (self = excluding nested phases):")
+    print(f"   {'phase':<14}{'spans':>8}{'total s':>10}{'self s':>10}{'max s':>9}")
+    for phase, count, total, self_secs, longest in rows:
+        print(
+            f"   {phase:<14}{count:>8}{total:>10.1f}{self_secs:>10.1f}{longest:>9.1f}"
+        )
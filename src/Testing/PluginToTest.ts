@@ -10,7 +10,7 @@ export let pluginTestIndex: number | undefined = undefined;
  */
 export function setPluginToTest(plugin: string, index?: number) {
     pluginToTest = plugin;
-    if (index !== undefined) {
-        pluginTestIndex = index;
-    }
+    // Always assign, so a warm switch to an un-indexed test doesn't inherit
+    // the previous test's index.
+    pluginTestIndex = index;
 }
\ No newline at end of file
@@ -3,6 +3,7 @@ import { getMoleculesFromStore, setStoreVar } from "@/Store/StoreExternalAccess"
 import { setPluginToTest } from "./PluginToTest";
 import { getUrlParam } from "@/Core/UrlParams";
 import { SelectedType } from "@/UI/Navigation/TreeView/TreeInterfaces";
+import { startTestWarm } from "./WarmStart";
 
 /**
  * If running a selenium test, this function will set things up.
@@ -46,6 +47,11 @@ export function setupTests() {
         msgs: "",
     });
 
+    // Lets the selenium harness switch to another test without reloading the
+    // page (warm reuse mode). Like __molmodaLoadedPlugins, only exposed when
+    // ?test= is present.
+    (window as any).__molmodaStartTest = startTestWarm;
+
     /* It's a test to see if the error handler works. */
     // setTimeout(() => {
     //     // eslint-disable-next-line @typescript-eslint/ban-ts-comment
@@ -136,6 +136,10 @@ function addTestDefaults(
  * appear in screen shots.
  */
 function makeFakeMouse() {
+    // Already made (the page is being reused for another test).
+    if (document.getElementById("customCursor") !== null) {
+        return;
+    }
     // Set body cursor to none
     // document.body.style.cursor = "none";
     // Add above CSS to the page
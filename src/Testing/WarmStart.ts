@@ -0,0 +1,72 @@
+import { loadedPlugins } from "@/Plugins/LoadedPlugins";
+import { store } from "@/Store";
+import { setStoreVar } from "@/Store/StoreExternalAccess";
+import { getQueueStore } from "@/Queue/QueueStore";
+import { newTreeNodeList } from "@/TreeNodes/TreeNodeMakers";
+import { setStoreIsDirty } from "@/Core/SaveOnClose/DirtyStore";
+import { setPluginToTest } from "./PluginToTest";
+import { createTestCmdsIfTestSpecified } from "./TestCmd";
+
+interface IWarmStartResult {
+    clean: boolean;
+    reason?: string;
+    cmds?: string;
+}
+
+/**
+ * Checks whether the page is in a state a new test can safely start from.
+ *
+ * @returns {string | null}  Why the page is not clean, or null if it is.
+ */
+function whyNotClean(): string | null {
+    if (store.state.test.error !== "") {
+        return "an error is still showing";
+    }
+    if (getQueueStore().running.length > 0) {
+        return "jobs are still running";
+    }
+    if (document.querySelector(".modal.show, body.modal-open") !== null) {
+        return "a modal is still open";
+    }
+    return null;
+}
+
+/**
+ * Resets the app to its freshly loaded state and starts another plugin test
+ * without reloading the page. Only used by the selenium test system (warm
+ * reuse mode), which falls back to a full reload whenever the result is not
+ * clean.
+ *
+ * @param  {string} pluginId  The id of the plugin to test.
+ * @param  {number} [index]   The index of the plugin test, if there are
+ *                            multiple for the specified plugin.
+ * @returns {Promise<IWarmStartResult>}  Whether the switch succeeded and, if
+ *     so, the new test's commands.
+ */
+export async function startTestWarm(
+    pluginId: string,
+    index?: number
+): Promise<IWarmStartResult> {
+    const plugin = loadedPlugins[pluginId];
+    if (plugin === undefined) {
+        return { clean: false, reason: `plugin ${pluginId} is not loaded` };
+    }
+    const reason = whyNotClean();
+    if (reason !== null) {
+        return { clean: false, reason };
+    }
+
+    // Same values setupVueXStore() starts with.
+    setStoreVar("molecules", newTreeNodeList([]));
+    setStoreVar("undoStack", [newTreeNodeList([])]);
+    setStoreVar("redoStack", []);
+    setStoreVar("log", []);
+    setStoreVar("projectTitle", "");
+    setStoreIsDirty(false);
+    setStoreVar("cmds", "", "test");
+    setStoreVar("msgs", "", "test");
+
+    setPluginToTest(pluginId, index);
+    await createTestCmdsIfTestSpecified(plugin);
+    return { clean: true, cmds: store.state.test.cmds };
+}